@@ -16,8 +16,87 @@ class Config:
     top_k_results: int = 5
     knowledge_base_dir: str = "./knowledge_base"
     faiss_index_path: str = "./faiss_index"
+    faiss_index_type: str = "flat"
+    faiss_nlist: int = 100
+    faiss_nprobe: int = 10
+    faiss_pq_m: int = 16
+    faiss_pq_nbits: int = 8
+    faiss_hnsw_m: int = 32
+    faiss_ef_construction: int = 40
+    faiss_ef_search: int = 64
+    index_compaction_segments: int = 8
+    index_load_mode: str = "memory"
+    embed_batch_size: int = 64
+    ingest_workers: int = 1
+    ingest_queue_size: int = 256
+    ingest_job_history: int = 200
+    max_zip_files: int = 100
+    max_zip_size_mb: int = 500
+    embedding_cache_size: int = 10000
+    embedding_cache_dir: str = "./embedding_cache"
+    query_batch_size: int = 32
+    query_batch_wait_ms: float = 5.0
+    batch_max_questions: int = 500
+    batch_llm_concurrency: int = 4
+    embedding_backend: str = "torch"
+    onnx_dir: str = ""
+    onnx_min_cosine: float = 0.99
+    hybrid_search: bool = True
+    bm25_budget_ms: float = 10.0
+    rrf_k: int = 60
+    hybrid_candidates: int = 20
+    context_packing: bool = True
+    context_max_tokens: int = 1500
+    context_duplicate_threshold: float = 0.85
+    reranker_enabled: bool = False
+    reranker_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_candidates: int = 50
+    rerank_top_n: int = 5
+    rerank_batch_size: int = 16
+    rerank_max_latency_ms: float = 250.0
+    rerank_cache_size: int = 20000
     api_host: str = "0.0.0.0"
     api_port: int = 8000
+    retrieval_workers: int = 4
+    index_workers: int = 1
+    ocr_workers: int = 1
+    stt_workers: int = 1
+    tts_workers: int = 1
+    worker_max_pending: int = 64
+    warmup_models: List[str] = field(default_factory=list)
+    model_memory_budget_mb: int = 0
+    model_idle_timeout_s: int = 0
+    answer_cache_enabled: bool = True
+    answer_cache_size: int = 1024
+    answer_cache_ttl_s: int = 3600
+    answer_cache_similarity: float = 0.95
+    session_backend: str = "memory"
+    session_db_path: str = "./sessions.sqlite"
+    session_history_tokens: int = 1000
+    session_summary_tokens: int = 250
+    session_ttl_s: int = 86400
+    session_max_sessions: int = 10000
+    session_memory_mb: int = 64
+    ocr_mode: str = "page"
+    ocr_batch_size: int = 16
+    ocr_line_max_tokens: int = 64
+    ocr_max_side: int = 1600
+    ocr_binarize: bool = False
+    ocr_cache_size: int = 256
+    ocr_cache_ttl_s: int = 86400
+    stt_batch_size: int = 8
+    stt_max_segment_s: float = 28.0
+    audio_store_size: int = 64
+    audio_store_mb: int = 64
+    audio_store_ttl_s: int = 600
+    stt_precision: str = "fp32"
+    tts_precision: str = "fp32"
+    ocr_precision: str = "fp32"
+    torch_threads: int = 0
+    torch_interop_threads: int = 0
+    precision_onnx_dir: str = "./models/onnx"
+    precision_max_wer_delta: float = 0.02
+    precision_max_cer_delta: float = 0.01
 
     @classmethod
     def from_env(cls) -> "Config":
@@ -30,8 +109,87 @@ class Config:
             chunk_overlap=int(os.getenv("CHUNK_OVERLAP", "200")),
             top_k_results=int(os.getenv("TOP_K_RESULTS", "5")),
             faiss_index_path = os.getenv("FAISS_INDEX_PATH", "./faiss_index"),
+            faiss_index_type=os.getenv("FAISS_INDEX_TYPE", "flat"),
+            faiss_nlist=int(os.getenv("FAISS_NLIST", "100")),
+            faiss_nprobe=int(os.getenv("FAISS_NPROBE", "10")),
+            faiss_pq_m=int(os.getenv("FAISS_PQ_M", "16")),
+            faiss_pq_nbits=int(os.getenv("FAISS_PQ_NBITS", "8")),
+            faiss_hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            faiss_ef_construction=int(os.getenv("FAISS_EF_CONSTRUCTION", "40")),
+            faiss_ef_search=int(os.getenv("FAISS_EF_SEARCH", "64")),
+            index_compaction_segments=int(os.getenv("INDEX_COMPACTION_SEGMENTS", "8")),
+            index_load_mode=os.getenv("INDEX_LOAD_MODE", "memory"),
+            embed_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64")),
+            ingest_workers=int(os.getenv("INGEST_WORKERS", "1")),
+            ingest_queue_size=int(os.getenv("INGEST_QUEUE_SIZE", "256")),
+            ingest_job_history=int(os.getenv("INGEST_JOB_HISTORY", "200")),
+            max_zip_files=int(os.getenv("MAX_ZIP_FILES", "100")),
+            max_zip_size_mb=int(os.getenv("MAX_ZIP_SIZE_MB", "500")),
+            embedding_cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "10000")),
+            embedding_cache_dir=os.getenv("EMBEDDING_CACHE_DIR", "./embedding_cache"),
+            query_batch_size=int(os.getenv("QUERY_BATCH_SIZE", "32")),
+            query_batch_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "5")),
+            batch_max_questions=int(os.getenv("BATCH_MAX_QUESTIONS", "500")),
+            batch_llm_concurrency=int(os.getenv("BATCH_LLM_CONCURRENCY", "4")),
+            embedding_backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            onnx_dir=os.getenv("ONNX_DIR", ""),
+            onnx_min_cosine=float(os.getenv("ONNX_MIN_COSINE", "0.99")),
+            hybrid_search=os.getenv("HYBRID_SEARCH", "true").lower() == "true",
+            bm25_budget_ms=float(os.getenv("BM25_BUDGET_MS", "10")),
+            rrf_k=int(os.getenv("RRF_K", "60")),
+            hybrid_candidates=int(os.getenv("HYBRID_CANDIDATES", "20")),
+            context_packing=os.getenv("CONTEXT_PACKING", "true").lower() == "true",
+            context_max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "1500")),
+            context_duplicate_threshold=float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.85")),
+            reranker_enabled=os.getenv("RERANKER_ENABLED", "false").lower() == "true",
+            reranker_model=os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+            rerank_candidates=int(os.getenv("RERANK_CANDIDATES", "50")),
+            rerank_top_n=int(os.getenv("RERANK_TOP_N", "5")),
+            rerank_batch_size=int(os.getenv("RERANK_BATCH_SIZE", "16")),
+            rerank_max_latency_ms=float(os.getenv("RERANK_MAX_LATENCY_MS", "250")),
+            rerank_cache_size=int(os.getenv("RERANK_CACHE_SIZE", "20000")),
             api_host=os.getenv("API_HOST", "0.0.0.0"),
             api_port=int(os.getenv("API_PORT", "8000")),
+            retrieval_workers=int(os.getenv("RETRIEVAL_WORKERS", "4")),
+            index_workers=int(os.getenv("INDEX_WORKERS", "1")),
+            ocr_workers=int(os.getenv("OCR_WORKERS", "1")),
+            stt_workers=int(os.getenv("STT_WORKERS", "1")),
+            tts_workers=int(os.getenv("TTS_WORKERS", "1")),
+            worker_max_pending=int(os.getenv("WORKER_MAX_PENDING", "64")),
+            warmup_models=[m.strip() for m in os.getenv("WARMUP_MODELS", "").split(",") if m.strip()],
+            model_memory_budget_mb=int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0")),
+            model_idle_timeout_s=int(os.getenv("MODEL_IDLE_TIMEOUT_S", "0")),
+            answer_cache_enabled=os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true",
+            answer_cache_size=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            answer_cache_ttl_s=int(os.getenv("ANSWER_CACHE_TTL_S", "3600")),
+            answer_cache_similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+            session_backend=os.getenv("SESSION_BACKEND", "memory"),
+            session_db_path=os.getenv("SESSION_DB_PATH", "./sessions.sqlite"),
+            session_history_tokens=int(os.getenv("SESSION_HISTORY_TOKENS", "1000")),
+            session_summary_tokens=int(os.getenv("SESSION_SUMMARY_TOKENS", "250")),
+            session_ttl_s=int(os.getenv("SESSION_TTL_S", "86400")),
+            session_max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            session_memory_mb=int(os.getenv("SESSION_MEMORY_MB", "64")),
+            ocr_mode=os.getenv("OCR_MODE", "page"),
+            ocr_batch_size=int(os.getenv("OCR_BATCH_SIZE", "16")),
+            ocr_line_max_tokens=int(os.getenv("OCR_LINE_MAX_TOKENS", "64")),
+            ocr_max_side=int(os.getenv("OCR_MAX_SIDE", "1600")),
+            ocr_binarize=os.getenv("OCR_BINARIZE", "false").lower() == "true",
+            ocr_cache_size=int(os.getenv("OCR_CACHE_SIZE", "256")),
+            ocr_cache_ttl_s=int(os.getenv("OCR_CACHE_TTL_S", "86400")),
+            stt_batch_size=int(os.getenv("STT_BATCH_SIZE", "8")),
+            stt_max_segment_s=float(os.getenv("STT_MAX_SEGMENT_S", "28")),
+            audio_store_size=int(os.getenv("AUDIO_STORE_SIZE", "64")),
+            audio_store_mb=int(os.getenv("AUDIO_STORE_MB", "64")),
+            audio_store_ttl_s=int(os.getenv("AUDIO_STORE_TTL_S", "600")),
+            stt_precision=os.getenv("STT_PRECISION", "fp32"),
+            tts_precision=os.getenv("TTS_PRECISION", "fp32"),
+            ocr_precision=os.getenv("OCR_PRECISION", "fp32"),
+            torch_threads=int(os.getenv("TORCH_THREADS", "0")),
+            torch_interop_threads=int(os.getenv("TORCH_INTEROP_THREADS", "0")),
+            precision_onnx_dir=os.getenv("PRECISION_ONNX_DIR", "./models/onnx"),
+            precision_max_wer_delta=float(os.getenv("PRECISION_MAX_WER_DELTA", "0.02")),
+            precision_max_cer_delta=float(os.getenv("PRECISION_MAX_CER_DELTA", "0.01")),
         )
 
     def validate(self):
@@ -41,6 +199,54 @@ class Config:
             raise ValueError("chunk_overlap must be less than chunk_size")
         if self.api_port < 1 or self.api_port > 65535:
             raise ValueError("api_port must be between 1 and 65535")
+        if self.faiss_index_type not in ("flat", "ivf_flat", "ivf_pq", "hnsw"):
+            raise ValueError("faiss_index_type must be one of flat, ivf_flat, ivf_pq, hnsw")
+        if self.index_load_mode not in ("memory", "mmap"):
+            raise ValueError("index_load_mode must be memory or mmap")
+        if not 0 < self.answer_cache_similarity <= 1:
+            raise ValueError("answer_cache_similarity must be in (0, 1]")
+        if min(self.retrieval_workers, self.index_workers, self.ocr_workers, self.stt_workers, self.tts_workers) < 1:
+            raise ValueError("worker pool sizes must be at least 1")
+        if self.embed_batch_size < 1 or self.ingest_workers < 1:
+            raise ValueError("embed_batch_size and ingest_workers must be at least 1")
+        if self.embedding_backend not in ("torch", "onnx", "onnx-int8"):
+            raise ValueError("embedding_backend must be torch, onnx or onnx-int8")
+        if self.bm25_budget_ms < 0 or self.rrf_k < 1 or self.hybrid_candidates < 1:
+            raise ValueError("bm25_budget_ms must be non-negative, rrf_k and hybrid_candidates at least 1")
+        if self.context_max_tokens < 1 or not 0 < self.context_duplicate_threshold <= 1:
+            raise ValueError("context_max_tokens must be at least 1 and context_duplicate_threshold in (0, 1]")
+        if self.rerank_top_n < 1 or self.rerank_candidates < self.rerank_top_n or self.rerank_batch_size < 1:
+            raise ValueError("rerank_top_n and rerank_batch_size must be at least 1, rerank_candidates at least rerank_top_n")
+        if self.query_batch_wait_ms < 0:
+            raise ValueError("query_batch_wait_ms must be non-negative")
+        if self.session_backend not in ("memory", "sqlite"):
+            raise ValueError("session_backend must be memory or sqlite")
+        if self.session_history_tokens < 1:
+            raise ValueError("session_history_tokens must be at least 1")
+        if self.ocr_mode not in ("page", "line"):
+            raise ValueError("ocr_mode must be page or line")
+        if self.stt_precision not in ("fp32", "int8", "onnx") or self.ocr_precision not in ("fp32", "int8", "onnx"):
+            raise ValueError("stt_precision and ocr_precision must be fp32, int8 or onnx")
+        if self.tts_precision not in ("fp32", "int8"):
+            raise ValueError("tts_precision must be fp32 or int8")
+        if self.torch_threads < 0 or self.torch_interop_threads < 0:
+            raise ValueError("torch_threads and torch_interop_threads must be non-negative")
+
+    def worker_pool_sizes(self) -> dict:
+        return {
+            "retrieval": self.retrieval_workers,
+            "index": self.index_workers,
+            "ocr": self.ocr_workers,
+            "stt": self.stt_workers,
+            "tts": self.tts_workers,
+        }
+
+    def precision_modes(self) -> dict:
+        return {
+            "whisper": self.stt_precision,
+            "speecht5": self.tts_precision,
+            "trocr": self.ocr_precision,
+        }
 
     def ensure_directories(self):
         Path(self.knowledge_base_dir).mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,21 @@
+# Ingest module
+# The pipeline pulls in LangChain and PyMuPDF, so names are imported on first attribute access
+import importlib
+
+_EXPORTS = {
+    'IngestionJob': '.jobs',
+    'JobQueue': '.jobs',
+    'STAGES': '.jobs',
+    'PDFIngestor': '.pipeline',
+    'UploadError': '.pipeline',
+    'expand_upload': '.pipeline',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,117 @@
+# Background ingestion jobs with per-stage progress
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+STAGES = ("parse", "split", "embed", "index", "persist")
+
+@dataclass
+class IngestionJob:
+    filename: str
+    content: Optional[bytes] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued, running, completed, failed
+    stage: Optional[str] = None
+    progress: Dict[str, Dict[str, int]] = field(default_factory=lambda: {stage: {"done": 0, "total": 0} for stage in STAGES})
+    chunks_added: int = 0
+    chunks_skipped: int = 0
+    duplicate: bool = False
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def set_total(self, stage: str, total: int):
+        self.progress[stage]["total"] = total
+
+    def advance(self, stage: str, count: int = 1):
+        self.stage = stage
+        self.progress[stage]["done"] += count
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "chunks_added": self.chunks_added,
+            "chunks_skipped": self.chunks_skipped,
+            "duplicate": self.duplicate,
+            "error": self.error,
+            "elapsed_s": round(end - self.started_at, 2) if self.started_at else 0.0,
+        }
+
+class JobQueue:
+    """FIFO queue of ingestion jobs processed by background worker threads.
+
+    `handler(job)` does the work and updates the job's progress; the queue
+    only tracks status. Finished jobs are kept for status lookups up to
+    `history_size`.
+    """
+
+    def __init__(self, handler: Callable[[IngestionJob], None], workers: int = 1, history_size: int = 200):
+        self.handler = handler
+        self.history_size = history_size
+        self._queue: "queue.Queue[Optional[IngestionJob]]" = queue.Queue()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True) for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, filename: str, content: bytes) -> IngestionJob:
+        job = IngestionJob(filename=filename, content=content)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("completed", "failed")]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                self.handler(job)
+                job.status = "completed"
+                print(f"✅ Ingestion job {job.id} ({job.filename}): {job.chunks_added} chunks added, {job.chunks_skipped} skipped")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                print(f"❌ Ingestion job {job.id} ({job.filename}) failed: {e}")
+            finally:
+                job.content = None
+                job.finished_at = time.time()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in ("queued", "running", "completed", "failed")}
+        for job in jobs:
+            counts[job.status] += 1
+        return {"workers": len(self._threads), "queue_depth": self._queue.qsize(), **counts}
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
@@ -0,0 +1,162 @@
+# Pipelined PDF ingestion: parse/split in one thread, embed/index in batches in another
+import io
+import queue
+import threading
+import zipfile
+from pathlib import PurePosixPath
+from typing import Callable, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from rag.hashing import document_hash
+from .jobs import IngestionJob
+
+_DONE = object()
+
+class UploadError(Exception):
+    pass
+
+def expand_upload(filename: str, content: bytes, max_files: int = 100, max_unzipped_mb: int = 500) -> List[Tuple[str, bytes]]:
+    """Return the PDFs in an upload: the file itself, or every PDF inside a zip."""
+    if filename.lower().endswith(".pdf"):
+        return [(filename, content)]
+    if not filename.lower().endswith(".zip"):
+        raise UploadError("Only PDF and ZIP files are supported")
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        raise UploadError(f"{filename} is not a valid zip file")
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(".pdf") and not PurePosixPath(info.filename).name.startswith(".")
+        and "__MACOSX" not in info.filename
+    ]
+    if not entries:
+        raise UploadError(f"{filename} contains no PDF files")
+    if len(entries) > max_files:
+        raise UploadError(f"{filename} contains {len(entries)} PDFs (limit {max_files})")
+    if sum(info.file_size for info in entries) > max_unzipped_mb * 1024 * 1024:
+        raise UploadError(f"{filename} expands to more than {max_unzipped_mb} MB")
+    return [(PurePosixPath(info.filename).name, archive.read(info)) for info in entries]
+
+class PDFIngestor:
+    """Job handler that streams a PDF through parse -> split -> embed -> index -> persist.
+
+    Pages are parsed and split on a producer thread while the job thread
+    embeds chunks in batches of `batch_size`, so parsing overlaps with
+    embedding. Embedded batches are staged and only added to the index
+    once the whole file has parsed, so a PDF that fails halfway leaves no
+    chunks behind. `on_indexed` runs after the index has been persisted.
+    """
+
+    def __init__(self, vector_store, chunk_size: int = 1000, chunk_overlap: int = 200, batch_size: int = 64, queue_size: int = 256, on_indexed: Optional[Callable[[], None]] = None):
+        self.vector_store = vector_store
+        # start_index lets context packing merge overlapping chunks of a page by offset
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.on_indexed = on_indexed
+
+    def __call__(self, job: IngestionJob):
+        if not self.vector_store.is_loaded and self.vector_store.index_file.exists():
+            # Never start a fresh index over one that just hasn't been loaded yet
+            if not self.vector_store.load_index():
+                raise RuntimeError("Existing index could not be loaded")
+        file_hash = document_hash(job.content)
+        if self.vector_store.has_document(file_hash):
+            job.duplicate = True
+            print(f"⏭️ {job.filename} is already indexed")
+            return
+        chunks: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[Exception] = []
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                self._parse_and_split(job, file_hash, put)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(_DONE)
+
+        producer = threading.Thread(target=produce, name=f"ingest-parse-{job.id[:8]}", daemon=True)
+        producer.start()
+        staged: List[Tuple[List[Document], List[List[float]]]] = []
+        try:
+            batch: List[Document] = []
+            while True:
+                item = chunks.get()
+                if item is _DONE:
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    staged.append(self._embed(job, batch))
+                    batch = []
+            if errors:
+                raise errors[0]
+            if batch:
+                staged.append(self._embed(job, batch))
+        finally:
+            stop.set()
+            producer.join()
+
+        job.stage = "index"
+        for batch, vectors in staged:
+            job.chunks_added += self.vector_store.add_embedded_documents(batch, vectors)
+            job.advance("index", len(batch))
+
+        if job.chunks_added:
+            job.set_total("persist", 1)
+            job.stage = "persist"
+            self.vector_store.save_index()
+            job.advance("persist")
+        # Only a completed job marks the file as ingested; failed ones can simply be retried
+        self.vector_store.record_documents([file_hash])
+        if job.chunks_added and self.on_indexed:
+            self.on_indexed()
+
+    def _parse_and_split(self, job: IngestionJob, file_hash: str, put: Callable[[Document], bool]):
+        import fitz  # PyMuPDF
+
+        with fitz.open(stream=job.content, filetype="pdf") as pdf:
+            total_pages = pdf.page_count
+            job.set_total("parse", total_pages)
+            for page_number, page in enumerate(pdf):
+                text = page.get_text()
+                job.advance("parse")
+                if not text.strip():
+                    continue
+                page_doc = Document(page_content=text, metadata={
+                    "source": job.filename,
+                    "source_file": job.filename,
+                    "page": page_number,
+                    "total_pages": total_pages,
+                    "document_hash": file_hash,
+                })
+                page_chunks = self.splitter.split_documents([page_doc])
+                job.progress["split"]["total"] += len(page_chunks)
+                job.advance("split", len(page_chunks))
+                for chunk in page_chunks:
+                    if not put(chunk):
+                        return
+
+    def _embed(self, job: IngestionJob, batch: List[Document]) -> Tuple[List[Document], List[List[float]]]:
+        # Chunks that are already indexed are never embedded
+        batch, skipped = self.vector_store.split_duplicates(batch)
+        job.chunks_skipped += skipped
+        for stage in ("embed", "index"):
+            job.progress[stage]["total"] = job.progress["split"]["total"] - job.chunks_skipped
+        if not batch:
+            return batch, []
+        job.stage = "embed"
+        vectors = self.vector_store.embeddings.embed_documents([doc.page_content for doc in batch])
+        job.advance("embed", len(batch))
+        return batch, vectors
@@ -1,39 +1,69 @@
 # ML RAG System - FastAPI Backend
 import os
 import sys
+import json
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
+# Time every import from here on (reported at /startup)
+from runtime.profiling import startup_profile
+startup_profile.install_import_timer()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
 from config import config
-from rag import VectorStoreManager, RAGChain
+from runtime import PoolSaturatedError, configure_pools, get_pool, pool_stats, shutdown_pools
+from runtime import configure_precision, configure_registry, get_registry, precision_stats, unload_idle_loop
+
+# LangChain, FAISS and the models are imported in the background after the port binds
+if TYPE_CHECKING:
+    from rag import VectorStoreManager, RAGChain, AnswerCache, ConversationMemory
 
 # Global instances
-vector_store: Optional[VectorStoreManager] = None
-rag_chain: Optional[RAGChain] = None
+vector_store: Optional["VectorStoreManager"] = None
+rag_chain: Optional["RAGChain"] = None
+answer_cache: Optional["AnswerCache"] = None
+conversation_memory: Optional["ConversationMemory"] = None
 
 # --- Pydantic Models ---
 
 class QueryRequest(BaseModel):
     question: str
-    session_id: str = "default"
+    # Questions without a session are answered statelessly
+    session_id: Optional[str] = None
+
+class BatchQueryRequest(BaseModel):
+    # Batch questions are independent and answered without conversation history
+    questions: List[str]
 
 class QueryResponse(BaseModel):
     answer: str
     sources: List[str]
+    timings: Dict[str, float] = {}
+    cache_hit: Optional[str] = None
+    context: Dict[str, int] = {}
 
 class HealthResponse(BaseModel):
     status: str
     document_count: int
     index_loaded: bool
+    workers: Dict[str, Dict[str, float]] = {}
+    models: Dict[str, Dict[str, Any]] = {}
+    answer_cache: Dict[str, Any] = {}
+    sessions: Dict[str, Any] = {}
+    embedding_cache: Dict[str, float] = {}
+    query_batching: Dict[str, Any] = {}
+    precision: Dict[str, Any] = {}
+    bm25: Dict[str, Any] = {}
+    reranker: Dict[str, Any] = {}
 
 class UploadResponse(BaseModel):
     message: str
@@ -42,6 +72,11 @@ class UploadResponse(BaseModel):
 
 class TranscribeResponse(BaseModel):
     transcription: str
+    segments: List[Dict[str, Any]] = []
+    audio_seconds: float = 0.0
+    speech_seconds: float = 0.0
+    rtf: float = 0.0
+    timings: Dict[str, float] = {}
 
 class VoiceQueryResponse(BaseModel):
     text_response: str
@@ -51,13 +86,94 @@ class VoiceQueryResponse(BaseModel):
 
 # --- Startup/Shutdown ---
 
+def warmup_models():
+    """Load the models listed in WARMUP_MODELS ahead of the first request."""
+    names = [f"embeddings:{config.embedding_model}" if name == "embeddings" else name for name in config.warmup_models]
+    # Importing the owning modules registers their loaders
+    if {"whisper", "speecht5"} & set(names):
+        import voice
+    if "trocr" in names:
+        import ocr
+    if "reranker" in names:
+        from rag.reranker import register_reranker
+        register_reranker(config.reranker_model)
+    get_registry().warmup(names)
+
+def voice_stt():
+    """The shared speech-to-text instance, configured from config on first use."""
+    from voice import get_stt
+    return get_stt(batch_size=config.stt_batch_size, max_segment_s=config.stt_max_segment_s)
+
+def voice_audio_store():
+    """The in-memory store for generated audio, sized from config on first use."""
+    from voice import get_audio_store
+    return get_audio_store(
+        max_entries=config.audio_store_size,
+        max_bytes=config.audio_store_mb * 1024 * 1024,
+        ttl_s=config.audio_store_ttl_s
+    )
+
+def create_vector_store() -> "VectorStoreManager":
+    """Import the RAG stack and build the vector store (runs on a worker thread)."""
+    global answer_cache, conversation_memory
+    
+    with startup_profile.stage("import_rag"):
+        from rag import VectorStoreManager, AnswerCache, IndexSpec, ConversationMemory, create_session_store
+    
+    with startup_profile.stage("vector_store"):
+        if config.answer_cache_enabled:
+            answer_cache = AnswerCache(config.answer_cache_size, config.answer_cache_ttl_s, config.answer_cache_similarity)
+        conversation_memory = ConversationMemory(
+            create_session_store(config.session_backend, config.session_db_path, config.session_max_sessions, config.session_memory_mb, config.session_ttl_s),
+            history_tokens=config.session_history_tokens,
+            summary_tokens=config.session_summary_tokens
+        )
+        return VectorStoreManager(
+            embedding_model=config.embedding_model,
+            index_path=config.faiss_index_path,
+            index_spec=IndexSpec.from_config(config),
+            compaction_segments=config.index_compaction_segments,
+            load_mode=config.index_load_mode,
+            embedding_cache_size=config.embedding_cache_size,
+            embedding_cache_dir=config.embedding_cache_dir or None,
+            query_batch_size=config.query_batch_size,
+            query_batch_wait_ms=config.query_batch_wait_ms,
+            embedding_backend=config.embedding_backend,
+            onnx_dir=config.onnx_dir or None,
+            hybrid_search=config.hybrid_search,
+            bm25_budget_ms=config.bm25_budget_ms,
+            rrf_k=config.rrf_k,
+            hybrid_candidates=config.hybrid_candidates
+        )
+
+def create_rag_chain(store: "VectorStoreManager") -> "RAGChain":
+    from rag import ContextPacker, RAGChain, Reranker
+    
+    # With reranking, FAISS returns RERANK_CANDIDATES chunks and the cross-encoder keeps the best RERANK_TOP_N
+    retriever = store.get_retriever({"k": config.rerank_candidates if config.reranker_enabled else config.top_k_results})
+    return RAGChain(
+        llm_model=config.llm_model,
+        retriever=retriever,
+        groq_api_key=config.groq_api_key,
+        cache=answer_cache,
+        memory=conversation_memory,
+        packer=ContextPacker(config.context_max_tokens, config.context_duplicate_threshold) if config.context_packing else None,
+        reranker=Reranker(
+            config.reranker_model, config.rerank_top_n, config.rerank_batch_size, config.rerank_max_latency_ms, config.rerank_cache_size
+        ) if config.reranker_enabled else None
+    )
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize RAG system on startup."""
-    global vector_store, rag_chain
+    global vector_store, rag_chain, answer_cache
     
     print("🚀 Starting ML RAG System...")
     print(f"📁 FAISS Index Path: {config.faiss_index_path}")
+    with startup_profile.stage("configure"):
+        configure_pools(config.worker_pool_sizes(), config.worker_max_pending)
+        configure_registry(config.model_memory_budget_mb, config.model_idle_timeout_s)
+        configure_precision(config.precision_modes(), config.torch_threads, config.torch_interop_threads, config.precision_onnx_dir)
     
     # Load configuration
     if not config.groq_api_key:
@@ -71,37 +187,44 @@ async def lifespan(app: FastAPI):
     async def init_rag():
         global vector_store, rag_chain
         try:
-            # Initialize vector store
-            vector_store = VectorStoreManager(
-                embedding_model=config.embedding_model,
-                index_path=config.faiss_index_path
-            )
+            # Initialize vector store (imports and loading stay off the event loop so /health keeps answering)
+            vector_store = await get_pool("warmup").run(create_vector_store)
             
             # Load existing index
-            if vector_store.load_index():
+            with startup_profile.stage("load_index"):
+                loaded = await get_pool("index").run(vector_store.load_index)
+            if loaded:
                 print(f"📊 Loaded {vector_store.get_document_count()} documents from index")
                 
                 # Initialize RAG chain
                 if config.groq_api_key:
-                    retriever = vector_store.get_retriever({"k": config.top_k_results})
-                    rag_chain = RAGChain(
-                        llm_model=config.llm_model,
-                        retriever=retriever,
-                        groq_api_key=config.groq_api_key
-                    )
+                    rag_chain = await get_pool("warmup").run(create_rag_chain, vector_store)
                     print("✅ RAG chain initialized!")
             else:
                 print("⚠️ No existing index found. Upload documents to build the knowledge base.")
+            
+            if config.warmup_models:
+                with startup_profile.stage("warmup_models"):
+                    await get_pool("warmup").run(warmup_models)
+            print(f"✅ Initialization complete ({startup_profile.summary()})")
         except Exception as e:
             print(f"❌ Error initializing RAG: {e}")
     
     # Start initialization in background
-    asyncio.create_task(init_rag())
+    background_tasks = [asyncio.create_task(init_rag())]
+    if config.model_idle_timeout_s:
+        background_tasks.append(asyncio.create_task(unload_idle_loop()))
+    
+    startup_profile.mark_ready()
+    print(f"✅ Backend ready! {startup_profile.summary()}")
     
     yield
     
     # Cleanup
     print("👋 Shutting down ML RAG System...")
+    for task in background_tasks:
+        task.cancel()
+    shutdown_pools()
 
 # --- FastAPI App ---
 
@@ -124,6 +247,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(request, exc: PoolSaturatedError):
+    return JSONResponse(status_code=503, content={"detail": f"Server busy: {exc}"})
+
 # --- Endpoints ---
 
 @app.get("/health", response_model=HealthResponse)
@@ -132,9 +259,23 @@ async def health_check():
     return HealthResponse(
         status="healthy" if vector_store and vector_store.is_loaded else "no_index",
         document_count=vector_store.get_document_count() if vector_store else 0,
-        index_loaded=vector_store.is_loaded if vector_store else False
+        index_loaded=vector_store.is_loaded if vector_store else False,
+        workers=pool_stats(),
+        models=get_registry().stats(),
+        answer_cache=answer_cache.stats() if answer_cache else {},
+        sessions=conversation_memory.stats() if conversation_memory else {},
+        embedding_cache=vector_store.embedding_cache.stats() if vector_store and vector_store.embedding_cache else {},
+        query_batching=vector_store.query_batcher.stats() if vector_store and vector_store.query_batcher else {},
+        precision=precision_stats(),
+        bm25=vector_store.bm25_stats() if vector_store else {},
+        reranker=rag_chain.reranker.stats() if rag_chain and rag_chain.reranker else {}
     )
 
+@app.get("/startup")
+async def startup_report():
+    """Startup profile: time to ready, per-package import time and per-stage durations."""
+    return startup_profile.to_dict()
+
 @app.post("/query", response_model=QueryResponse)
 async def query_endpoint(request: QueryRequest):
     """Query the RAG system with a text question."""
@@ -145,38 +286,120 @@ async def query_endpoint(request: QueryRequest):
         raise HTTPException(status_code=422, detail="Question cannot be empty")
     
     try:
-        response = rag_chain.query(request.question, request.session_id)
-        return QueryResponse(answer=response.answer, sources=response.sources)
+        response = await rag_chain.aquery(request.question, request.session_id)
+        return QueryResponse(answer=response.answer, sources=response.sources, timings=response.timings, cache_hit=response.cache_hit, context=response.context)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest, http_request: Request):
+    """
+    Stream the answer as newline-delimited JSON events:
+    {"type": "sources"}, then {"type": "token"} per chunk, then {"type": "done"} with timings.
+    """
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG system not initialized. Check if GROQ_API_KEY is set and index is loaded.")
+    
+    if not request.question.strip():
+        raise HTTPException(status_code=422, detail="Question cannot be empty")
+    
+    async def events():
+        stream = rag_chain.astream(request.question, request.session_id)
+        try:
+            async for event in stream:
+                if await http_request.is_disconnected():
+                    print("🔌 Client disconnected, cancelling generation")
+                    break
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            print(f"❌ Stream error: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        finally:
+            # Closing the generator aborts the upstream Groq request
+            await stream.aclose()
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/query/batch")
+async def query_batch_endpoint(request: BatchQueryRequest, http_request: Request):
+    """
+    Answer a list of questions, streamed as newline-delimited JSON in input order:
+    one {"type": "result"} (or {"type": "error"}) line per question, then {"type": "done"}.
+    """
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG system not initialized. Check if GROQ_API_KEY is set and index is loaded.")
+    
+    if not request.questions or not all(question.strip() for question in request.questions):
+        raise HTTPException(status_code=422, detail="questions cannot be empty")
+    if len(request.questions) > config.batch_max_questions:
+        raise HTTPException(status_code=422, detail=f"At most {config.batch_max_questions} questions per batch")
+    
+    async def events():
+        start = time.perf_counter()
+        answered = 0
+        stream = rag_chain.aquery_batch(request.questions, config.batch_llm_concurrency)
+        try:
+            async for index, response in stream:
+                if await http_request.is_disconnected():
+                    print("🔌 Client disconnected, cancelling batch")
+                    break
+                if isinstance(response, Exception):
+                    yield json.dumps({"type": "error", "index": index, "question": request.questions[index], "detail": str(response)}) + "\n"
+                    continue
+                answered += 1
+                yield json.dumps({
+                    "type": "result",
+                    "index": index,
+                    "question": request.questions[index],
+                    "answer": response.answer,
+                    "sources": response.sources,
+                    "timings": response.timings,
+                    "cache_hit": response.cache_hit,
+                    "context": response.context
+                }) + "\n"
+            yield json.dumps({"type": "done", "answered": answered, "total_ms": round((time.perf_counter() - start) * 1000, 2)}) + "\n"
+        except Exception as e:
+            print(f"❌ Batch error: {e}")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        finally:
+            await stream.aclose()
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.post("/transcribe", response_model=TranscribeResponse)
 async def transcribe_audio(audio: UploadFile = File(...)):
     """Transcribe audio file to text using Whisper."""
     # Lazy import to avoid loading models at startup
-    from voice import SpeechToText
+    from voice import AudioDecodeError
     
-    # Save uploaded file temporarily
-    temp_path = f"temp_audio_{audio.filename}"
     try:
+        # Decoded in memory; nothing is written to disk
         content = await audio.read()
-        with open(temp_path, "wb") as f:
-            f.write(content)
         
-        stt = SpeechToText()
-        transcription = stt.transcribe(temp_path)
+        # Long recordings are split at silences and transcribed in batches
+        result = await get_pool("stt").run(voice_stt().transcribe_long, content)
         
-        return TranscribeResponse(transcription=transcription)
+        return TranscribeResponse(
+            transcription=result.text,
+            segments=[segment.to_dict() for segment in result.segments],
+            audio_seconds=round(result.audio_seconds, 2),
+            speech_seconds=round(result.speech_seconds, 2),
+            rtf=result.rtf,
+            timings=result.timings
+        )
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription error: {str(e)}")
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
 @app.post("/voice-query", response_model=VoiceQueryResponse)
 async def voice_query_endpoint(
     audio: UploadFile = File(...),
-    session_id: str = "voice",
+    session_id: Optional[str] = None,
     generate_audio: bool = True
 ):
     """Process voice query: transcribe, query RAG, optionally generate audio response."""
@@ -184,21 +407,17 @@ async def voice_query_endpoint(
         raise HTTPException(status_code=503, detail="RAG system not initialized")
     
     # Lazy import
-    from voice import VoiceRAGHandler
+    from voice import AudioDecodeError, VoiceRAGHandler
     
-    # Save uploaded audio
-    audio_path = f"temp_audio_{session_id}.wav"
     try:
         content = await audio.read()
-        with open(audio_path, "wb") as f:
-            f.write(content)
         
+        voice_stt()
+        voice_audio_store()
         handler = VoiceRAGHandler(rag_chain)
-        response = handler.process_voice_query(audio_path, session_id, generate_audio)
+        response = await handler.aprocess_voice_query(content, session_id, generate_audio)
         
-        audio_url = None
-        if response.audio_path and os.path.exists(response.audio_path):
-            audio_url = f"/audio/{os.path.basename(response.audio_path)}"
+        audio_url = f"/audio/{response.audio_id}.wav" if response.audio_id else None
         
         return VoiceQueryResponse(
             text_response=response.text_response,
@@ -206,25 +425,93 @@ async def voice_query_endpoint(
             transcribed_question=response.transcribed_question,
             audio_url=audio_url
         )
+    except AudioDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Voice query error: {str(e)}")
+
+@app.post("/voice-query/stream")
+async def voice_query_stream_endpoint(
+    http_request: Request,
+    audio: UploadFile = File(...),
+    session_id: Optional[str] = None,
+    format: str = "wav"
+):
+    """
+    Spoken answer streamed sentence by sentence while the LLM is still generating.
+    format=wav: one WAV stream (16 kHz mono 16-bit); pcm: raw s16le samples;
+    ndjson: transcription/sources/text/audio (base64 PCM)/done events.
+    For wav and pcm the transcription is sent in the X-Transcription header (URL-encoded).
+    """
+    if rag_chain is None:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    
+    from voice import AUDIO_FORMATS, SAMPLE_RATE, AudioDecodeError, VoiceRAGHandler, wav_stream_header
+    
+    if format not in AUDIO_FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(AUDIO_FORMATS)}")
+    
+    import base64
+    from urllib.parse import quote
+    
+    voice_stt()
+    stream = VoiceRAGHandler(rag_chain).astream_voice_query(await audio.read(), session_id)
+    try:
+        # The first event arrives once transcription is done
+        transcription = await stream.__anext__()
+    except AudioDecodeError as e:
+        await stream.aclose()
+        raise HTTPException(status_code=400, detail=str(e))
+    except PoolSaturatedError:
+        await stream.aclose()
+        raise
     except Exception as e:
+        await stream.aclose()
         raise HTTPException(status_code=500, detail=f"Voice query error: {str(e)}")
-    finally:
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-
-@app.get("/audio/{filename}")
-async def get_audio(filename: str):
-    """Serve generated audio files."""
-    file_path = Path(filename)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="Audio file not found")
-    return FileResponse(file_path, media_type="audio/wav")
+    
+    async def body():
+        try:
+            if format == "wav":
+                yield wav_stream_header(SAMPLE_RATE)
+            elif format == "ndjson":
+                yield json.dumps(transcription) + "\n"
+            async for event in stream:
+                if await http_request.is_disconnected():
+                    print("🔌 Client disconnected, cancelling voice stream")
+                    break
+                if format != "ndjson":
+                    if event["type"] == "audio":
+                        yield event["pcm"]
+                    continue
+                if event["type"] == "audio":
+                    event = {**event, "pcm": base64.b64encode(event["pcm"]).decode("ascii"), "sample_rate": SAMPLE_RATE}
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            print(f"❌ Voice stream error: {e}")
+            if format == "ndjson":
+                yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        finally:
+            await stream.aclose()
+    
+    media_types = {"wav": "audio/wav", "pcm": f"audio/L16; rate={SAMPLE_RATE}; channels=1", "ndjson": "application/x-ndjson"}
+    headers = {} if format == "ndjson" else {"X-Transcription": quote(transcription["text"])}
+    return StreamingResponse(body(), media_type=media_types[format], headers=headers)
+
+@app.get("/audio/{audio_id}")
+async def get_audio(audio_id: str):
+    """Serve generated audio from the in-memory store (ids expire)."""
+    data = voice_audio_store().get(audio_id.removesuffix(".wav"))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+    return Response(content=data, media_type="audio/wav")
 
 @app.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """Clear chat session history."""
-    if rag_chain:
-        rag_chain.clear_session(session_id)
+    if conversation_memory is not None:
+        await get_pool("retrieval").run(conversation_memory.clear, session_id)
     return {"message": f"Session {session_id} cleared"}
 
 # --- Image Query Endpoint ---
@@ -233,12 +520,17 @@ class ImageQueryResponse(BaseModel):
     answer: str
     sources: List[str]
     extracted_text: str
+    timings: Dict[str, float] = {}
+    cache_hit: Optional[str] = None
+    context: Dict[str, int] = {}
+    ocr_cached: bool = False
+    ocr: Dict[str, Any] = {}
 
 @app.post("/query-image", response_model=ImageQueryResponse)
 async def query_image_endpoint(
     image: UploadFile = File(...),
     question: str = "",
-    session_id: str = "default"
+    session_id: Optional[str] = None
 ):
     """
     Query the RAG system using an image.
@@ -268,8 +560,17 @@ async def query_image_endpoint(
         content = await image.read()
         
         # Extract text from image using OCR
-        ocr = get_ocr()
-        extracted_text = ocr.extract_text_from_bytes(content)
+        ocr = get_ocr(
+            mode=config.ocr_mode,
+            batch_size=config.ocr_batch_size,
+            line_max_tokens=config.ocr_line_max_tokens,
+            max_side=config.ocr_max_side,
+            binarize=config.ocr_binarize,
+            cache_size=config.ocr_cache_size,
+            cache_ttl_s=config.ocr_cache_ttl_s
+        )
+        ocr_result = await get_pool("ocr").run(ocr.ocr_bytes, content)
+        extracted_text = ocr_result.text
         
         if not extracted_text and not question:
             raise HTTPException(
@@ -286,14 +587,19 @@ async def query_image_endpoint(
             combined_query = question
         
         # Query RAG system
-        response = rag_chain.query(combined_query, session_id)
+        response = await rag_chain.aquery(combined_query, session_id)
         
         return ImageQueryResponse(
             answer=response.answer,
             sources=response.sources,
-            extracted_text=extracted_text
+            extracted_text=extracted_text,
+            timings=response.timings,
+            cache_hit=response.cache_hit,
+            context=response.context,
+            ocr_cached=ocr_result.cached,
+            ocr=ocr_result.stats()
         )
-    except HTTPException:
+    except (HTTPException, PoolSaturatedError):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Image query error: {str(e)}")
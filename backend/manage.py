@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the ML RAG System index.
+
+Usage:
+    python manage.py rebuild-index [--index-type hnsw] [--nlist 256] ...
+    python manage.py benchmark-index [--queries 200] [--nprobe 1,4,16] [--ef-search 16,64,128]
+    python manage.py compact-index
+    python manage.py dedupe-index
+    python manage.py export-onnx [--no-quantize] [--verify-only]
+    python manage.py startup-check [--app main] [--budget-ms 2000]
+    python manage.py precision-check [--models whisper,trocr] [--modes fp32,int8,onnx] [--threads 1,2,4]
+    python manage.py reembed-index --embedding-model ./models/finetuned --output ./faiss_index_finetuned
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Add current directory to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import config
+
+
+def load_vector_store():
+    vector_store = make_vector_store(config.embedding_model, config.faiss_index_path)
+    if not vector_store.load_index():
+        sys.exit(f"No index found at {config.faiss_index_path}")
+    return vector_store
+
+
+def make_vector_store(embedding_model, index_path, **overrides):
+    from rag import VectorStoreManager, IndexSpec
+
+    settings = dict(
+        embedding_model=embedding_model,
+        index_path=index_path,
+        index_spec=IndexSpec.from_config(config),
+        compaction_segments=config.index_compaction_segments,
+        load_mode=config.index_load_mode,
+        embedding_cache_size=config.embedding_cache_size,
+        embedding_cache_dir=config.embedding_cache_dir or None,
+        query_batch_size=config.query_batch_size,
+        query_batch_wait_ms=config.query_batch_wait_ms,
+        embedding_backend=config.embedding_backend,
+        onnx_dir=config.onnx_dir or None,
+        hybrid_search=config.hybrid_search,
+        bm25_budget_ms=config.bm25_budget_ms,
+        rrf_k=config.rrf_k,
+        hybrid_candidates=config.hybrid_candidates
+    )
+    settings.update(overrides)
+    return VectorStoreManager(**settings)
+
+
+def spec_from_args(args):
+    from rag import IndexSpec
+
+    spec = IndexSpec.from_config(config)
+    for name in ("index_type", "nlist", "nprobe", "pq_m", "pq_nbits", "hnsw_m", "ef_construction", "ef_search"):
+        value = getattr(args, name, None)
+        if value is not None:
+            setattr(spec, name, value)
+    return spec
+
+
+def cmd_rebuild_index(args):
+    """Retrain the index with the configured (or given) type without re-embedding."""
+    vector_store = load_vector_store()
+    spec = vector_store.rebuild_index(spec_from_args(args))
+    vector_store.save_index()
+    print(f"Index type: {spec.index_type} {spec.to_dict()}")
+
+
+def cmd_compact_index(args):
+    """Merge appended upload segments into a single snapshot."""
+    vector_store = load_vector_store()
+    vector_store.compact()
+
+
+def cmd_dedupe_index(args):
+    """Remove chunks with duplicate content from an existing index."""
+    vector_store = load_vector_store()
+    if vector_store.deduplicate():
+        vector_store.save_index()
+    else:
+        print("No duplicate chunks found")
+
+
+def cmd_reembed_index(args):
+    """Embed every chunk with another model (e.g. a fine-tuned one) into a new index.
+
+    Vectors go through the embedding cache, so re-running after an
+    interruption or re-indexing with the same model skips finished chunks.
+    """
+    source = load_vector_store()
+    documents = source.get_all_documents()
+    target = make_vector_store(args.embedding_model, args.output, compaction_segments=0, load_mode="memory")
+    start_time = time.perf_counter()
+    for start in range(0, len(documents), args.batch_size):
+        target.add_documents(documents[start:start + args.batch_size])
+        print(f"  {min(start + args.batch_size, len(documents))}/{len(documents)} chunks")
+    target.compact()
+    target.record_documents(source.document_hashes())
+    print(f"Re-embedded {target.get_document_count()} chunks in {time.perf_counter() - start_time:.1f}s")
+    if target.embedding_cache is not None:
+        print(f"Embedding cache: {target.embedding_cache.stats()}")
+
+
+SAMPLE_TEXTS = [
+    "What is gradient descent?",
+    "Explain the bias-variance tradeoff.",
+    "Backpropagation computes gradients of the loss with respect to every weight using the chain rule.",
+    "A convolutional neural network applies learned filters over local regions of the input.",
+    "Regularization such as L2 weight decay penalizes large weights to reduce overfitting.",
+    "How does attention work in transformers?",
+]
+
+
+def cmd_export_onnx(args):
+    """Export the embedding model to ONNX (fp32 and int8) and check it against torch."""
+    import random
+    from rag.onnx_embeddings import INT8_MODEL_FILE, MODEL_FILE, OnnxEmbeddings, compare_backends, default_onnx_dir, export_onnx, load_embeddings
+
+    output = Path(args.output or config.onnx_dir or default_onnx_dir(config.embedding_model))
+    if not args.verify_only:
+        export_onnx(config.embedding_model, str(output), quantize=not args.no_quantize)
+
+    # Real chunks from the index make the best check; fall back to fixed samples
+    texts = list(SAMPLE_TEXTS)
+    vector_store = make_vector_store(config.embedding_model, config.faiss_index_path)
+    if vector_store.index_file.exists() and vector_store.load_index():
+        documents = vector_store.get_all_documents()
+        texts += [doc.page_content for doc in random.Random(0).sample(documents, min(args.samples, len(documents)))]
+
+    reference = load_embeddings(config.embedding_model, "torch")
+    failed = False
+    for backend, filename in (("onnx", MODEL_FILE), ("onnx-int8", INT8_MODEL_FILE)):
+        if not (output / filename).exists():
+            continue
+        candidate = OnnxEmbeddings(str(output), quantized=backend == "onnx-int8")
+        start = time.perf_counter()
+        result = compare_backends(reference, candidate, texts)
+        ok = result["min_cosine"] >= args.min_cosine
+        failed = failed or not ok
+        print(f"  {backend:<10} min cosine={result['min_cosine']:.4f}  mean={result['mean_cosine']:.4f}  "
+              f"({result['texts']} texts, {time.perf_counter() - start:.2f}s)  {'OK' if ok else 'FAIL'}")
+    if failed:
+        sys.exit(f"Vectors differ from torch by more than the tolerance (min cosine {args.min_cosine}); keep EMBEDDING_BACKEND=torch or rebuild the index")
+    print(f"Set EMBEDDING_BACKEND=onnx or onnx-int8 and ONNX_DIR={output} to switch; the existing index stays valid")
+
+
+# Modules that must not load before the port binds
+DEFERRED_MODULES = ("torch", "transformers", "sentence_transformers", "langchain_groq", "langchain_community",
+                    "langchain_huggingface", "faiss", "fitz", "onnxruntime")
+
+STARTUP_PROBE = """
+import asyncio, json, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {path!r})
+os.chdir({path!r})
+import {module} as target
+imported_ms = (time.perf_counter() - start) * 1000
+eager = [name for name in {deferred!r} if name in sys.modules]
+
+async def probe():
+    async with target.app.router.lifespan_context(target.app):
+        ready_ms = (time.perf_counter() - start) * 1000
+        print(json.dumps({{"import_ms": imported_ms, "ready_ms": ready_ms, "eager": eager, "profile": target.startup_profile.to_dict(10)}}), flush=True)
+        # Skip shutdown; background initialization may still be running
+        os._exit(0)
+
+asyncio.run(probe())
+"""
+
+
+def cmd_startup_check(args):
+    """Fail (exit 1) if importing the app loads heavy modules or startup exceeds the budget."""
+    import json
+    import subprocess
+
+    root = Path(__file__).parent
+    path, module = (root.parent, "app") if args.app == "app" else (root, "main")
+    probe = STARTUP_PROBE.format(path=str(path), module=module, deferred=DEFERRED_MODULES)
+    samples = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, timeout=120)
+        lines = [line for line in result.stdout.splitlines() if line.startswith("{")]
+        if result.returncode != 0 or not lines:
+            sys.exit(f"Startup probe failed:\n{result.stderr[-2000:]}")
+        samples.append(json.loads(lines[-1]))
+
+    best = min(samples, key=lambda sample: sample["ready_ms"])
+    print(f"{module}: import {best['import_ms']:.0f}ms, ready {best['ready_ms']:.0f}ms (best of {args.runs}, budget {args.budget_ms}ms)")
+    for package, ms in best["profile"]["imports_ms"].items():
+        print(f"  {package:<28} {ms:8.1f} ms")
+    problems = []
+    if best["eager"]:
+        problems.append(f"imported before the port binds: {', '.join(best['eager'])}")
+    if best["ready_ms"] > args.budget_ms:
+        problems.append(f"ready in {best['ready_ms']:.0f}ms, over the {args.budget_ms}ms budget")
+    if problems:
+        sys.exit("Startup regression: " + "; ".join(problems))
+    print("Startup within budget")
+
+
+def cmd_benchmark_index(args):
+    """Measure recall@k and latency of the loaded index against exact search."""
+    import faiss
+    import numpy as np
+    from rag.index_factory import apply_search_params, extract_vectors
+
+    vector_store = load_vector_store()
+    index = vector_store._vector_store.index
+    vectors = extract_vectors(index)
+    if len(vectors) == 0:
+        sys.exit("Index is empty")
+
+    # Stored vectors (slightly perturbed) stand in for real queries
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)]
+    queries = (sample + rng.normal(0, 0.01, sample.shape)).astype(np.float32)
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    spec = vector_store.active_spec
+    if spec.index_type in ("ivf_flat", "ivf_pq"):
+        settings = [("nprobe", int(v)) for v in args.nprobe.split(",")]
+    elif spec.index_type == "hnsw":
+        settings = [("ef_search", int(v)) for v in args.ef_search.split(",")]
+    else:
+        settings = [(None, None)]
+
+    print(f"{spec.index_type} index, {len(vectors)} vectors, {len(queries)} queries, k={args.k}")
+    for name, value in settings:
+        if name:
+            setattr(spec, name, value)
+            apply_search_params(index, spec)
+        start = time.perf_counter()
+        _, found = index.search(queries, args.k)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        label = f"{name}={value}" if name else "exact"
+        print(f"  {label:<16} recall@{args.k}={recall:.3f}  latency={elapsed_ms:.3f} ms/query")
+
+
+def cmd_precision_check(args):
+    """Latency and accuracy of each precision mode of the CPU models; exit 1 if a configured mode fails the guard.
+
+    Whisper is scored by WER on speech synthesized from the sample texts
+    (plus any recordings in the manifest), TrOCR by CER on the texts
+    rendered as images, and SpeechT5 by the WER of fp32 Whisper on the
+    speech it produces. A mode passes when its error rate stays within
+    the allowed increase over fp32.
+    """
+    from ocr import OCRProcessor
+    from PIL import Image
+    from runtime import MODEL_PRECISION_MODES, configure_precision, get_registry
+    from runtime.accuracy import char_error_rate, load_samples, render_text_image, word_error_rate
+    from voice import SpeechToText, TextToSpeech, decode_audio
+
+    samples = load_samples(args.samples)
+    texts = samples["texts"][:args.limit] if args.limit else samples["texts"]
+    models = [m.strip() for m in args.models.split(",") if m.strip()]
+    thread_counts = [int(t) for t in args.threads.split(",")] if args.threads else [config.torch_threads]
+    registry = get_registry()
+    stt = SpeechToText(batch_size=1, max_segment_s=config.stt_max_segment_s)
+    tts = TextToSpeech()
+    ocr = OCRProcessor(mode=config.ocr_mode, batch_size=config.ocr_batch_size, max_side=config.ocr_max_side, cache_size=0)
+
+    def use(modes, threads):
+        # Every model is reloaded so it picks up the new precision and thread count
+        configure_precision(modes, threads, config.torch_interop_threads, config.precision_onnx_dir)
+        for name in MODEL_PRECISION_MODES:
+            registry.unload(name)
+
+    # Inputs and references shared by every mode
+    use({}, thread_counts[0])
+    images, image_refs = [render_text_image(text) for text in texts], list(texts)
+    for item in samples["images"]:
+        images.append(Image.open(item["file"]))
+        image_refs.append(item["text"])
+    audio, audio_refs = [], []
+    if "whisper" in models:
+        print(f"Synthesizing {len(texts)} reference clips with fp32 SpeechT5...")
+        audio, audio_refs = [tts.synthesize_array(text) for text in texts], list(texts)
+        for item in samples["audio"]:
+            audio.append(decode_audio(Path(item["file"]).read_bytes()))
+            audio_refs.append(item["text"])
+
+    # Per model: inputs, the timed call, how its outputs are scored, and the allowed increase
+    workloads = {
+        "whisper": (audio, lambda clip: stt.transcribe_long(clip).text, lambda outputs: word_error_rate(audio_refs, outputs), "WER", args.max_wer_delta),
+        "trocr": (images, lambda image: ocr.ocr_image(image).text, lambda outputs: char_error_rate(image_refs, outputs), "CER", args.max_cer_delta),
+        "speecht5": (texts, tts.synthesize_array, lambda outputs: word_error_rate(texts, [stt.transcribe_long(clip).text for clip in outputs]), "WER", args.max_wer_delta),
+    }
+    configured = config.precision_modes()
+    failed = []
+    recommended = {}
+    for model in models:
+        if model not in workloads:
+            sys.exit(f"Unknown model {model!r}; choose from {', '.join(workloads)}")
+        inputs, run, score, metric, max_delta = workloads[model]
+        modes = [mode for mode in args.modes.split(",") if mode in MODEL_PRECISION_MODES[model]]
+        print(f"\n{model}: {len(inputs)} samples, modes {', '.join(modes)}, threads {', '.join(map(str, thread_counts))}")
+        results = []
+        for threads in thread_counts:
+            for mode in ["fp32"] + [m for m in modes if m != "fp32"]:
+                use({model: mode}, threads)
+                try:
+                    start = time.perf_counter()
+                    run(inputs[0])  # loads the model and warms it up
+                    load_s = time.perf_counter() - start
+                    start = time.perf_counter()
+                    outputs = [run(item) for item in inputs]
+                    latency_ms = (time.perf_counter() - start) * 1000 / len(inputs)
+                except Exception as e:
+                    print(f"  {mode:<5} threads={threads:<3} skipped: {e}")
+                    continue
+                # Scoring may load other models (fp32 Whisper for SpeechT5); it is not timed
+                results.append({"mode": mode, "threads": threads, "error": score(outputs), "latency_ms": latency_ms, "load_s": load_s})
+        if not results:
+            continue
+        baseline = next((r for r in results if r["mode"] == "fp32"), results[0])
+        for result in results:
+            result["ok"] = result["error"] <= baseline["error"] + max_delta
+            print(f"  {result['mode']:<5} threads={result['threads']:<3} {metric}={result['error']:.4f}  "
+                  f"{result['latency_ms']:8.1f} ms/sample  x{baseline['latency_ms'] / max(result['latency_ms'], 1e-9):.2f}  "
+                  f"(load {result['load_s']:.1f}s)  {'OK' if result['ok'] else 'FAIL'}")
+        best = min((r for r in results if r["ok"]), key=lambda r: r["latency_ms"])
+        recommended[model] = best
+        current = [r for r in results if r["mode"] == configured[model] and r["threads"] == config.torch_threads]
+        if current and not current[0]["ok"]:
+            failed.append(f"{model} {configured[model]} ({metric} {current[0]['error']:.4f}, fp32 {baseline['error']:.4f})")
+
+    if recommended:
+        env = {"whisper": "STT_PRECISION", "speecht5": "TTS_PRECISION", "trocr": "OCR_PRECISION"}
+        print("\nFastest modes within the accuracy guard:")
+        for model, best in recommended.items():
+            print(f"  {env[model]}={best['mode']}  TORCH_THREADS={best['threads']}")
+    if failed:
+        sys.exit("Configured precision exceeds the accuracy guard: " + "; ".join(failed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ML RAG System maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser("rebuild-index", help="Retrain the FAISS index from stored vectors")
+    rebuild.add_argument("--index-type", choices=["flat", "ivf_flat", "ivf_pq", "hnsw"])
+    for option in ("--nlist", "--nprobe", "--pq-m", "--pq-nbits", "--hnsw-m", "--ef-construction", "--ef-search"):
+        rebuild.add_argument(option, type=int)
+    rebuild.set_defaults(func=cmd_rebuild_index)
+
+    compact = subparsers.add_parser("compact-index", help="Merge index segments into a full snapshot")
+    compact.set_defaults(func=cmd_compact_index)
+
+    dedupe = subparsers.add_parser("dedupe-index", help="Remove duplicate chunks from the index")
+    dedupe.set_defaults(func=cmd_dedupe_index)
+
+    export = subparsers.add_parser("export-onnx", help="Export the embedding model to ONNX and verify it")
+    export.add_argument("--output")
+    export.add_argument("--no-quantize", action="store_true")
+    export.add_argument("--verify-only", action="store_true")
+    export.add_argument("--samples", type=int, default=200)
+    export.add_argument("--min-cosine", type=float, default=config.onnx_min_cosine)
+    export.set_defaults(func=cmd_export_onnx)
+
+    startup = subparsers.add_parser("startup-check", help="Check app startup time and deferred imports")
+    startup.add_argument("--app", choices=["app", "main"], default="app")
+    startup.add_argument("--budget-ms", type=int, default=2000)
+    startup.add_argument("--runs", type=int, default=3)
+    startup.set_defaults(func=cmd_startup_check)
+
+    reembed = subparsers.add_parser("reembed-index", help="Build a new index with another embedding model")
+    reembed.add_argument("--embedding-model", required=True)
+    reembed.add_argument("--output", required=True)
+    reembed.add_argument("--batch-size", type=int, default=config.embed_batch_size)
+    reembed.set_defaults(func=cmd_reembed_index)
+
+    benchmark = subparsers.add_parser("benchmark-index", help="Recall vs latency of the current index")
+    benchmark.add_argument("--queries", type=int, default=200)
+    benchmark.add_argument("--k", type=int, default=config.top_k_results)
+    benchmark.add_argument("--nprobe", default="1,4,10,32")
+    benchmark.add_argument("--ef-search", default="16,32,64,128")
+    benchmark.set_defaults(func=cmd_benchmark_index)
+
+    precision = subparsers.add_parser("precision-check", help="Compare fp32/int8/onnx speed and accuracy of Whisper, TrOCR and SpeechT5")
+    precision.add_argument("--models", default="whisper,trocr,speecht5")
+    precision.add_argument("--modes", default="fp32,int8,onnx")
+    precision.add_argument("--threads", help="comma-separated torch thread counts to try (default TORCH_THREADS)")
+    precision.add_argument("--samples", default="", help="sample manifest (default samples/accuracy.json)")
+    precision.add_argument("--limit", type=int, default=0)
+    precision.add_argument("--max-wer-delta", type=float, default=config.precision_max_wer_delta)
+    precision.add_argument("--max-cer-delta", type=float, default=config.precision_max_cer_delta)
+    precision.set_defaults(func=cmd_precision_check)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
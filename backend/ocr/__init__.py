@@ -1,4 +1,6 @@
 # OCR Module
-from .processor import OCRProcessor, get_ocr
+from .processor import OCR_MODES, OCRProcessor, OCRResult, get_ocr, prepare_image
+from .cache import OCRCache
+from .segmentation import LineBox, segment_lines
 
-__all__ = ['OCRProcessor', 'get_ocr']
+__all__ = ['OCR_MODES', 'OCRProcessor', 'OCRResult', 'get_ocr', 'prepare_image', 'OCRCache', 'LineBox', 'segment_lines']
@@ -1,41 +1,121 @@
 # OCR Module for Image Text Extraction
+import hashlib
 import io
+import time
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Optional
-from PIL import Image
+from typing import Any, Dict, List, Optional
+from PIL import Image, ImageOps
+from runtime import apply_torch_threads, get_precision, get_registry, load_onnx_model, quantize_int8
+from .cache import OCRCache
+from .segmentation import otsu_threshold, segment_lines
+
+TROCR_MODEL = "microsoft/trocr-base-printed"
+OCR_MODES = ("page", "line")
+
+def _load_trocr():
+    import torch
+    from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+
+    apply_torch_threads()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # Reduced precision is a CPU path; a GPU keeps the fp32 model
+    precision = get_precision("trocr") if device == "cpu" else "fp32"
+    if precision == "onnx":
+        from optimum.onnxruntime import ORTModelForVision2Seq
+
+        model = load_onnx_model(ORTModelForVision2Seq, TROCR_MODEL)
+    else:
+        model = VisionEncoderDecoderModel.from_pretrained(TROCR_MODEL).to(device)
+        if precision == "int8":
+            model = quantize_int8(model)
+    return {
+        "processor": TrOCRProcessor.from_pretrained(TROCR_MODEL),
+        "model": model,
+        "device": device,
+    }
+
+get_registry().register("trocr", _load_trocr)
+
+@dataclass
+class OCRResult:
+    text: str
+    mode: str
+    lines: int = 0
+    crops: int = 0
+    batch_size: int = 0
+    batches: int = 0
+    cached: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "cached": self.cached,
+            "lines": self.lines,
+            "crops": self.crops,
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "timings": self.timings,
+        }
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+def prepare_image(image: Image.Image, max_side: int = 1600, grayscale: bool = True, binarize: bool = False) -> Image.Image:
+    """Normalize an upload before OCR: EXIF orientation, transparency on white,
+    grayscale (optionally Otsu-binarized) and a cap on the longest side.
+
+    TrOCR resizes every crop to 384x384, so pixels beyond `max_side` only
+    slow down segmentation and resizing.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        image = Image.alpha_composite(Image.new("RGBA", rgba.size, "white"), rgba)
+    image = image.convert("L") if grayscale or binarize else image.convert("RGB")
+    if max_side and max(image.size) > max_side:
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if binarize:
+        import numpy as np
+        threshold = otsu_threshold(np.asarray(image, dtype=np.uint8))
+        image = image.point(lambda p: 255 if p > threshold else 0)
+    return image.convert("RGB")
+
+def image_hash(image: Image.Image) -> str:
+    """Content hash of decoded pixels, so re-encoded copies of the same image match."""
+    digest = hashlib.blake2b(f"{image.mode}:{image.size}".encode(), digest_size=16)
+    digest.update(image.tobytes())
+    return digest.hexdigest()
 
 class OCRProcessor:
-    """OCR processor using HuggingFace TrOCR for text extraction from images."""
+    """OCR processor using HuggingFace TrOCR for text extraction from images.
+
+    TrOCR reads a single line of text. In "page" mode text lines are found
+    with projection profiles first and all line crops are recognized in
+    batched `generate` calls; "line" mode sends the whole image as one line.
+    """
     
     SUPPORTED_FORMATS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.gif'}
     
-    def __init__(self):
-        self._model = None
-        self._processor = None
-        self._device = None
+    def __init__(self, mode: str = "page", batch_size: int = 16, line_max_tokens: int = 64, max_side: int = 1600,
+                 binarize: bool = False, cache_size: int = 256, cache_ttl_s: float = 86400):
+        if mode not in OCR_MODES:
+            raise ValueError(f"OCR mode must be one of {', '.join(OCR_MODES)}")
+        self.mode = mode
+        self.batch_size = max(1, batch_size)
+        self.line_max_tokens = line_max_tokens
+        self.max_side = max_side
+        self.binarize = binarize
+        self.cache = OCRCache(cache_size, cache_ttl_s)
     
-    def _load_model(self):
-        """Lazy load the OCR model."""
-        if self._model is not None:
-            return
-        
+    def _load_model(self) -> Optional[dict]:
+        """Fetch the shared OCR model from the registry (loaded once per process)."""
         try:
-            import torch
-            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-            
-            print("Loading OCR model (TrOCR)...")
-            
-            self._device = "cuda" if torch.cuda.is_available() else "cpu"
-            model_name = "microsoft/trocr-base-printed"
-            
-            self._processor = TrOCRProcessor.from_pretrained(model_name)
-            self._model = VisionEncoderDecoderModel.from_pretrained(model_name).to(self._device)
-            
-            print(f"OCR model loaded on {self._device}")
+            return get_registry().get("trocr")
         except Exception as e:
             print(f"Failed to load OCR model: {e}")
-            self._model = None
-            self._processor = None
+            return None
     
     @staticmethod
     def is_supported(filename: str) -> bool:
@@ -43,44 +123,118 @@ class OCRProcessor:
         ext = Path(filename).suffix.lower()
         return ext in OCRProcessor.SUPPORTED_FORMATS
     
-    def extract_text_from_image(self, image: Image.Image) -> str:
-        """Extract text from a PIL Image using OCR."""
-        self._load_model()
-        
-        if self._model is None or self._processor is None:
-            return ""
+    def _recognize(self, models: dict, crops: List[Image.Image], max_tokens: int, result: OCRResult) -> List[str]:
+        """Run TrOCR on `crops` in batches of `batch_size`, accumulating stage timings on `result`."""
+        import torch
         
-        try:
-            import torch
-            
-            # Ensure image is in RGB mode
-            if image.mode != "RGB":
-                image = image.convert("RGB")
-            
-            # For better OCR results, we process the image in chunks if it's large
-            # TrOCR works best on single lines of text
-            # For full page OCR, we'll process the whole image
-            
-            # Process with TrOCR
-            pixel_values = self._processor(image, return_tensors="pt").pixel_values.to(self._device)
+        texts: List[str] = []
+        for name in ("preprocess_ms", "generate_ms", "decode_ms"):
+            result.timings.setdefault(name, 0.0)
+        for i in range(0, len(crops), self.batch_size):
+            batch = crops[i:i + self.batch_size]
+            start = time.perf_counter()
+            pixel_values = models["processor"](images=batch, return_tensors="pt").pixel_values.to(models["device"])
+            result.timings["preprocess_ms"] += _elapsed_ms(start)
             
+            start = time.perf_counter()
             with torch.no_grad():
-                generated_ids = self._model.generate(pixel_values, max_length=512)
+                generated_ids = models["model"].generate(pixel_values, max_new_tokens=max_tokens)
+            result.timings["generate_ms"] += _elapsed_ms(start)
+            
+            start = time.perf_counter()
+            texts += [text.strip() for text in models["processor"].batch_decode(generated_ids, skip_special_tokens=True)]
+            result.timings["decode_ms"] += _elapsed_ms(start)
+            result.batches += 1
+        result.batch_size = min(self.batch_size, len(crops))
+        return texts
+    
+    def ocr_image(self, image: Image.Image, mode: Optional[str] = None, alias_key: Optional[str] = None) -> OCRResult:
+        """OCR a PIL Image, reporting line count, batching and per-stage timings.
+
+        The preprocessed pixels are hashed first; a cache hit skips TrOCR
+        entirely. `alias_key` also caches the result under another key
+        (the hash of the raw upload).
+        """
+        total_start = time.perf_counter()
+        mode = mode or self.mode
+        
+        try:
+            start = time.perf_counter()
+            image = prepare_image(image, self.max_side, binarize=self.binarize)
+            key = f"{mode}:{image_hash(image)}"
+            prepare_ms = _elapsed_ms(start)
+        except Exception as e:
+            print(f"Failed to preprocess image: {e}")
+            return OCRResult(text="", mode=mode)
+        
+        cached = self.cache.get(key)
+        if cached is not None:
+            if alias_key:
+                self.cache.put(alias_key, cached)
+            return replace(cached, cached=True, timings={"prepare_ms": prepare_ms, "total_ms": _elapsed_ms(total_start)})
+        
+        result = OCRResult(text="", mode=mode, timings={"prepare_ms": prepare_ms})
+        models = self._load_model()
+        
+        if models is None:
+            return result
+        
+        try:
+            boxes = []
+            if result.mode == "page":
+                start = time.perf_counter()
+                boxes = segment_lines(image)
+                result.timings["segment_ms"] = _elapsed_ms(start)
             
-            text = self._processor.batch_decode(generated_ids, skip_special_tokens=True)[0]
-            return text.strip()
+            if not boxes:
+                # Line mode, or no lines found: the whole image is one line
+                result.mode = "line"
+                result.lines = result.crops = 1
+                result.text = self._recognize(models, [image], 512, result)[0]
+            else:
+                crops = [image.crop(box.box) for box in boxes]
+                texts = self._recognize(models, crops, self.line_max_tokens, result)
+                # Boxes are already in reading order; pieces of one line are joined with spaces
+                lines: Dict[int, List[str]] = {}
+                for box, text in zip(boxes, texts):
+                    if text:
+                        lines.setdefault(box.line, []).append(text)
+                result.text = "\n".join(" ".join(pieces) for pieces in lines.values())
+                result.lines = boxes[-1].line + 1
+                result.crops = len(boxes)
         except Exception as e:
             print(f"OCR extraction failed: {e}")
-            return ""
+            result.text = ""
+        result.timings["total_ms"] = _elapsed_ms(total_start)
+        if result.text:
+            # Failures come back empty; never cache them
+            for cache_key in filter(None, (key, alias_key)):
+                self.cache.put(cache_key, result)
+        return result
     
-    def extract_text_from_bytes(self, image_bytes: bytes) -> str:
-        """Extract text from image bytes."""
+    def ocr_bytes(self, image_bytes: bytes, mode: Optional[str] = None) -> OCRResult:
+        """`ocr_image` for encoded image bytes; an identical upload is answered before decoding."""
+        total_start = time.perf_counter()
+        mode = mode or self.mode
+        raw_key = f"{mode}:raw:{hashlib.blake2b(image_bytes, digest_size=16).hexdigest()}"
+        cached = self.cache.get(raw_key, count_miss=False)
+        if cached is not None:
+            return replace(cached, cached=True, timings={"total_ms": _elapsed_ms(total_start)})
         try:
             image = Image.open(io.BytesIO(image_bytes))
-            return self.extract_text_from_image(image)
+            image.load()
         except Exception as e:
             print(f"Failed to process image bytes: {e}")
-            return ""
+            return OCRResult(text="", mode=mode)
+        return self.ocr_image(image, mode, alias_key=raw_key)
+    
+    def extract_text_from_image(self, image: Image.Image) -> str:
+        """Extract text from a PIL Image using OCR."""
+        return self.ocr_image(image).text
+    
+    def extract_text_from_bytes(self, image_bytes: bytes) -> str:
+        """Extract text from image bytes."""
+        return self.ocr_bytes(image_bytes).text
     
     def extract_text_from_file(self, file_path: str) -> str:
         """Extract text from an image file."""
@@ -95,9 +249,9 @@ class OCRProcessor:
 # Global OCR instance (lazy loaded)
 _ocr_instance: Optional[OCRProcessor] = None
 
-def get_ocr() -> OCRProcessor:
-    """Get the global OCR processor instance."""
+def get_ocr(**settings) -> OCRProcessor:
+    """Get the global OCR processor instance; `settings` apply when it is first created."""
     global _ocr_instance
     if _ocr_instance is None:
-        _ocr_instance = OCRProcessor()
+        _ocr_instance = OCRProcessor(**settings)
     return _ocr_instance
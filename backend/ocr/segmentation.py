@@ -0,0 +1,90 @@
+# Text line detection with projection profiles (numpy only, runs before the OCR model)
+from dataclasses import dataclass
+from typing import List, Tuple
+import numpy as np
+from PIL import Image
+
+@dataclass
+class LineBox:
+    left: int
+    top: int
+    right: int
+    bottom: int
+    line: int  # index of the text line; wide lines are split into several boxes
+
+    @property
+    def box(self) -> Tuple[int, int, int, int]:
+        return (self.left, self.top, self.right, self.bottom)
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Grey level that best separates ink from background (Otsu's method)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cumulative = np.cumsum(hist * np.arange(256))
+    mean_bg = cumulative / np.maximum(weight_bg, 1)
+    mean_fg = (cumulative[-1] - cumulative) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+def ink_mask(gray: np.ndarray) -> np.ndarray:
+    """Boolean mask of text pixels; the majority side of the threshold is background,
+    so light-on-dark slides work as well as dark-on-light pages."""
+    threshold = otsu_threshold(gray)
+    dark = gray <= threshold
+    return dark if dark.mean() < 0.5 else ~dark
+
+def _runs(active: np.ndarray, max_gap: int = 0) -> List[Tuple[int, int]]:
+    """[start, end) spans of True values, merging spans separated by at most `max_gap` False values."""
+    padded = np.concatenate(([False], active, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    spans = list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+    merged: List[Tuple[int, int]] = []
+    for start, end in spans:
+        if merged and start - merged[-1][1] <= max_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def segment_lines(image: Image.Image, min_height: int = 6, max_aspect: float = 12.0, pad: int = 4) -> List[LineBox]:
+    """Text line boxes in reading order (top to bottom, then left to right).
+
+    Rows containing ink form line bands (horizontal projection). Within a
+    band, columns are grouped into words (vertical projection); a gap of
+    more than twice the line height starts a new box (e.g. a second
+    column), and words are packed into boxes no wider than `max_aspect`
+    times the line height, because TrOCR resizes every crop to a square.
+    """
+    gray = np.asarray(image.convert("L"), dtype=np.uint8)
+    mask = ink_mask(gray)
+    height, width = mask.shape
+    # Ignore rows with a few specks of noise
+    rows = mask.sum(axis=1) > max(1, width // 500)
+    boxes: List[LineBox] = []
+    line = 0
+    for top, bottom in _runs(rows, max_gap=1):
+        band_height = bottom - top
+        if band_height < min_height:
+            continue
+        columns = mask[top:bottom].any(axis=0)
+        words = _runs(columns, max_gap=max(2, band_height // 4))
+        if not words:
+            continue
+        pieces: List[Tuple[int, int]] = []
+        for start, end in words:
+            if pieces and start - pieces[-1][1] <= 2 * band_height and end - pieces[-1][0] <= max_aspect * band_height:
+                pieces[-1] = (pieces[-1][0], end)
+            else:
+                pieces.append((start, end))
+        for left, right in pieces:
+            boxes.append(LineBox(
+                left=max(0, left - pad),
+                top=max(0, top - pad),
+                right=min(width, right + pad),
+                bottom=min(height, bottom + pad),
+                line=line,
+            ))
+        line += 1
+    return boxes
@@ -1,5 +1,29 @@
 # RAG module
-from .vector_store import VectorStoreManager, VectorStoreError
-from .chain import RAGChain, RAGResponse
+# Submodules pull in LangChain, FAISS and model code, so they are imported on first attribute access
+import importlib
 
-__all__ = ['VectorStoreManager', 'VectorStoreError', 'RAGChain', 'RAGResponse']
+_EXPORTS = {
+    'VectorStoreManager': '.vector_store',
+    'VectorStoreError': '.vector_store',
+    'RAGChain': '.chain',
+    'RAGResponse': '.chain',
+    'IndexRetriever': '.retriever',
+    'AnswerCache': '.cache',
+    'IndexSpec': '.index_factory',
+    'INDEX_TYPES': '.index_factory',
+    'CachedEmbeddings': '.embedding_cache',
+    'BM25Index': '.bm25',
+    'ContextPacker': '.context',
+    'Reranker': '.reranker',
+    'ConversationMemory': '.memory',
+    'create_session_store': '.memory',
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,89 @@
+# Micro-batching of concurrent query embeddings
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+from langchain_core.embeddings import Embeddings
+from runtime import Histogram
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Coalesces concurrent `embed_query` calls into one batched forward pass.
+
+    A dispatcher thread takes the first waiting query, collects more for
+    up to `max_wait_ms` or until `max_batch` are queued, embeds them with
+    a single `embed_documents` call and resolves each caller's future.
+    That assumes a symmetric model (no query instruction), which holds for
+    the sentence-transformers models used here. `embed_documents` is
+    already batched and passes straight through.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.embeddings = embeddings
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Tuple[str, float, Future]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_MS_BUCKETS)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # Already a batch; no need to wait for company
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_dispatcher()
+        future: Future = Future()
+        self._queue.put((text, time.perf_counter(), future))
+        return future.result()
+
+    def _ensure_dispatcher(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[Tuple[str, float, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            self.batch_sizes.observe(len(batch))
+            for _, enqueued, _ in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _, _ in batch])
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.to_dict(),
+            "queue_wait_ms": self.queue_wait_ms.to_dict(),
+        }
@@ -0,0 +1,166 @@
+# BM25 inverted index over the chunk docstore, and reciprocal rank fusion with dense results
+import json
+import math
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+
+BM25_FILE = "bm25.npz"
+
+# Keeps exact ML terms whole: "relu6", "adamw", "l2", "gpt-4" -> "gpt", "4"
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was what when "
+    "where which who why with does do can you your".split()
+)
+# tf is stored as uint16
+_MAX_TF = 65535
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in _STOPWORDS]
+
+class BM25Index:
+    """Okapi BM25 over documents identified by their FAISS position (0, 1, 2, ...).
+
+    Each term's postings are two growable integer arrays, document
+    positions (uint32, ascending) and term frequencies (uint16), plus one
+    uint32 length per document. Documents are only ever appended, in
+    index order, so adding a batch never touches existing postings.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._terms: Dict[str, int] = {}
+        self._docs: List[array] = []
+        self._freqs: List[array] = []
+        self._lengths = array("I")
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.truncated = 0
+
+    @property
+    def doc_count(self) -> int:
+        return len(self._lengths)
+
+    def add(self, texts: Sequence[str]):
+        """Append documents; the first gets position `doc_count`."""
+        tokenized = [tokenize(text) for text in texts]
+        with self._lock:
+            for tokens in tokenized:
+                position = len(self._lengths)
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, count in counts.items():
+                    term_id = self._terms.get(term)
+                    if term_id is None:
+                        term_id = self._terms[term] = len(self._docs)
+                        self._docs.append(array("I"))
+                        self._freqs.append(array("H"))
+                    self._docs[term_id].append(position)
+                    self._freqs[term_id].append(min(count, _MAX_TF))
+                self._lengths.append(len(tokens))
+                self._total_length += len(tokens)
+
+    def search(self, query: str, top_k: int = 5, budget_ms: float = 0) -> Tuple[List[int], List[float], bool]:
+        """Top `top_k` positions with their scores, and whether the budget cut the search short.
+
+        Terms are scored rarest first, so when `budget_ms` runs out the
+        terms left over are the common ones that contribute the least.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            count = len(self._lengths)
+            term_ids = {self._terms[t] for t in tokenize(query) if t in self._terms}
+            if not count or not term_ids:
+                self.searches += 1
+                return [], [], False
+            average_length = self._total_length / count
+            lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+            scores = np.zeros(count, dtype=np.float32)
+            truncated = False
+            for i, term_id in enumerate(sorted(term_ids, key=lambda t: len(self._docs[t]))):
+                if budget_ms and i and (time.perf_counter() - start) * 1000 > budget_ms:
+                    truncated = True
+                    break
+                docs = np.frombuffer(self._docs[term_id], dtype=np.uint32).astype(np.int64)
+                tf = np.frombuffer(self._freqs[term_id], dtype=np.uint16).astype(np.float32)
+                idf = math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+                scores[docs] += idf * tf * (self.k1 + 1) / (tf + norm)
+            # Views of the arrays must not outlive the lock; add() may resize them
+            del lengths
+            self.searches += 1
+            self.truncated += truncated
+        # idf is positive, so every document sharing a term with the query has a positive score
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order.tolist(), scores[order].tolist(), truncated
+
+    def save(self, path: Path, last_id: str = "", doc_count: Optional[int] = None):
+        """Write the index as flat arrays; `last_id` (the docstore id at the last position) is checked on load.
+
+        With `doc_count`, only the first `doc_count` documents are written,
+        so a snapshot of an earlier state can be saved while adds continue.
+        """
+        with self._lock:
+            count = len(self._lengths) if doc_count is None else min(doc_count, len(self._lengths))
+            # Positions are ascending, so each term's postings for the first `count` documents are a prefix
+            cuts = [bisect_left(docs, count) for docs in self._docs]
+            terms = sorted(self._terms, key=self._terms.get)
+            offsets = np.cumsum([0] + cuts, dtype=np.int64)
+            docs = np.frombuffer(b"".join(d[:cut].tobytes() for d, cut in zip(self._docs, cuts)), dtype=np.uint32)
+            freqs = np.frombuffer(b"".join(f[:cut].tobytes() for f, cut in zip(self._freqs, cuts)), dtype=np.uint16)
+            lengths = np.frombuffer(self._lengths[:count], dtype=np.uint32)
+        meta = {"k1": self.k1, "b": self.b, "last_id": last_id, "terms": terms}
+        tmp = Path(path).with_name(Path(path).name + ".tmp.npz")
+        np.savez(tmp, meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8), offsets=offsets,
+                 docs=docs, freqs=freqs, lengths=lengths)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Tuple["BM25Index", str]:
+        """Read an index written by `save`; returns it with the stored `last_id`."""
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            index = cls(k1=meta["k1"], b=meta["b"])
+            offsets, docs, freqs = data["offsets"], data["docs"], data["freqs"]
+            for term_id, term in enumerate(meta["terms"]):
+                index._terms[term] = term_id
+                index._docs.append(array("I", docs[offsets[term_id]:offsets[term_id + 1]].tobytes()))
+                index._freqs.append(array("H", freqs[offsets[term_id]:offsets[term_id + 1]].tobytes()))
+            index._lengths = array("I", data["lengths"].astype(np.uint32).tobytes())
+        index._total_length = int(sum(index._lengths))
+        return index, meta["last_id"]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "documents": self.doc_count,
+            "terms": len(self._terms),
+            "postings": sum(len(docs) for docs in self._docs),
+            "searches": self.searches,
+            "truncated": self.truncated,
+        }
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked lists: each item scores sum(weight / (k + rank)), rank starting at 1.
+
+    Only ranks are used, so BM25 and vector-distance scores need no
+    calibration against each other.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, 1):
+            fused[item] = fused.get(item, 0.0) + weight / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,134 @@
+# Semantic answer cache for RAG responses
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+@dataclass
+class CachedAnswer:
+    question: str
+    answer: str
+    sources: List[str]
+    vector: Optional[np.ndarray]
+    created: float
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip(" ?!.")
+
+class AnswerCache:
+    """LRU/TTL cache of answers keyed by normalized question.
+
+    Exact matches hit on the normalized text; near matches hit when the
+    question embedding has cosine similarity >= `similarity_threshold`
+    with a cached question. Call `invalidate` whenever the index changes.
+
+    `invalidate` also bumps `generation`. Callers read it before
+    retrieving and pass it to `put`, so an answer built from the old
+    index is dropped instead of outliving the invalidation.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_s: float = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Stacked vectors of all entries, rebuilt lazily after changes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+        self.generation = 0
+
+    def _expired(self, entry: CachedAnswer) -> bool:
+        return bool(self.ttl_s) and time.time() - entry.created > self.ttl_s
+
+    def _remove(self, key: str):
+        del self._entries[key]
+        self._matrix = None
+
+    def get(self, question: str) -> Optional[CachedAnswer]:
+        """Exact lookup on the normalized question. Does not count a miss."""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry
+
+    def get_similar(self, vector: List[float]) -> Optional[CachedAnswer]:
+        """Nearest cached question by cosine similarity, if above the threshold."""
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._lock:
+            if self._matrix is None:
+                self._matrix_keys = [k for k, e in self._entries.items() if e.vector is not None]
+                self._matrix = np.stack([self._entries[k].vector for k in self._matrix_keys]) if self._matrix_keys else np.empty((0, query.shape[0]), dtype=np.float32)
+            if len(self._matrix_keys):
+                scores = self._matrix @ query
+                best = int(np.argmax(scores))
+                key = self._matrix_keys[best]
+                entry = self._entries.get(key)
+                if scores[best] >= self.similarity_threshold and entry is not None:
+                    if self._expired(entry):
+                        self._remove(key)
+                    else:
+                        self._entries.move_to_end(key)
+                        self.semantic_hits += 1
+                        return entry
+            self.misses += 1
+            return None
+
+    def put(self, question: str, answer: str, sources: List[str], vector: Optional[List[float]] = None,
+            generation: Optional[int] = None):
+        """Store an answer; it is dropped if `generation` is given and `invalidate` has run since."""
+        key = normalize_question(question)
+        if vector is not None:
+            vector = np.array(vector, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self.stale_writes += 1
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CachedAnswer(question=question, answer=answer, sources=sources, vector=vector, created=time.time())
+            self._matrix = None
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry (the index changed, so answers may be stale)."""
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.semantic_hits) / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
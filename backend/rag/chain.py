@@ -1,29 +1,75 @@
 # RAG Chain with Groq LLM
+import asyncio
+import time
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from langchain_core.documents import Document
+from runtime import get_pool
+from .cache import AnswerCache, CachedAnswer, normalize_question
+from .context import ContextPacker, PackedContext
+from .reranker import Reranker
+from .memory import ConversationMemory, Turn, extractive_summary
 
 @dataclass
 class RAGResponse:
     answer: str
     sources: List[str]
     context_chunks: List[Document] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    cache_hit: Optional[str] = None
+    # Context packing stats: chunks, passages, merged, duplicates, tokens, tokens_saved
+    context: Dict[str, int] = field(default_factory=dict)
+
+@dataclass
+class _Retrieval:
+    docs: List[Document] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    vector: Optional[List[float]] = None
+    cached: Optional[CachedAnswer] = None
+    cache_hit: Optional[str] = None
+    cacheable: bool = True
+    generation: Optional[int] = None  # answer-cache generation read before retrieval
+    history: str = ""
+    context: Optional[PackedContext] = None
+    rerank: Dict[str, int] = field(default_factory=dict)
 
 def format_docs(docs):
     """Format documents for context."""
     return '\n\n'.join(doc.page_content for doc in docs)
 
+def extract_sources(docs: List[Document]) -> List[str]:
+    """Unique source files/URLs referenced by the given documents."""
+    sources = []
+    for doc in docs:
+        if doc.metadata.get("source_file"):
+            sources.append(doc.metadata["source_file"])
+        elif doc.metadata.get("source_url"):
+            sources.append(doc.metadata["source_url"])
+    return list(set(sources))
+
+def format_history(history: str) -> str:
+    """Prompt block for the conversation so far (empty for a new session)."""
+    return f"Conversation so far:\n{history}\n\n" if history else ""
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
 class RAGChain:
     """RAG chain using Groq LLM with LCEL (LangChain Expression Language)."""
 
-    def __init__(self, llm_model: str, retriever, groq_api_key: str):
+    def __init__(self, llm_model: str, retriever, groq_api_key: str, cache: Optional[AnswerCache] = None, memory: Optional[ConversationMemory] = None, packer: Optional[ContextPacker] = None, reranker: Optional[Reranker] = None):
         self.llm = ChatGroq(model=llm_model, api_key=groq_api_key, temperature=0.7)
         self.retriever = retriever
-        self._chat_histories: Dict[str, List] = {}
+        self.cache = cache
+        self.memory = memory
+        # Without a packer the retrieved chunks are joined as they are
+        self.packer = packer
+        # With a reranker the retriever should return more candidates (e.g. 50) than reach the prompt
+        self.reranker = reranker
+        self._summary_tasks = set()
         self._setup_chain()
 
     def _setup_chain(self):
@@ -34,34 +80,294 @@ Always cite your sources when possible.
 Context:
 {context}
 
-Question: {question}
+{history}Question: {question}
 """
         prompt = ChatPromptTemplate.from_template(system_prompt)
 
-        self.rag_chain = (
-            RunnableParallel(context=self.retriever | format_docs, question=RunnablePassthrough())
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-
-    def query(self, question: str, session_id: str = "default") -> RAGResponse:
-        # Get relevant documents
-        docs = self.retriever.invoke(question)
-
-        # Get answer
-        answer = self.rag_chain.invoke(question)
-
-        # Extract sources
-        sources = []
-        for doc in docs:
-            if doc.metadata.get("source_file"):
-                sources.append(doc.metadata["source_file"])
-            elif doc.metadata.get("source_url"):
-                sources.append(doc.metadata["source_url"])
-
-        return RAGResponse(answer=answer, sources=list(set(sources)), context_chunks=docs)
-
-    def clear_session(self, session_id: str):
-        if session_id in self._chat_histories:
-            del self._chat_histories[session_id]
+        # Retrieval happens once in `retrieve`; the chain only renders and generates
+        self.rag_chain = prompt | self.llm | StrOutputParser()
+
+        summary_prompt = ChatPromptTemplate.from_template("""Condense this conversation between a user and an ML assistant into at most {max_words} words.
+Keep the topics, facts and open questions a follow-up question might refer to.
+
+{previous}{turns}
+""")
+        self.summary_chain = summary_prompt | self.llm | StrOutputParser()
+
+    def _prepare(self, question: str, use_cache: bool = True, session_id: Optional[str] = None) -> _Retrieval:
+        """Session history, answer-cache lookup and single retrieval, timing each stage in milliseconds.
+
+        Answers that depend on earlier turns are neither served from nor
+        stored in the answer cache.
+        """
+        result = _Retrieval()
+        if session_id is not None and self.memory is not None:
+            start = time.perf_counter()
+            result.history = self.memory.window(session_id)
+            result.timings["history_ms"] = _elapsed_ms(start)
+        use_cache = use_cache and not result.history
+        result.cacheable = use_cache
+        if use_cache and self.cache is not None:
+            result.generation = self.cache.generation
+            entry = self.cache.get(question)
+            if entry is not None:
+                result.cached, result.cache_hit = entry, "exact"
+                return result
+
+        if not hasattr(self.retriever, "embed_query"):
+            # Plain LangChain retrievers do not expose embed/search separately
+            start = time.perf_counter()
+            result.docs = self.retriever.invoke(question)
+            result.timings["retrieve_ms"] = _elapsed_ms(start)
+            self._rerank(question, result)
+            self._pack(result)
+            return result
+
+        start = time.perf_counter()
+        result.vector = self.retriever.embed_query(question)
+        result.timings["embed_ms"] = _elapsed_ms(start)
+
+        if use_cache and self.cache is not None:
+            entry = self.cache.get_similar(result.vector)
+            if entry is not None:
+                result.cached, result.cache_hit = entry, "semantic"
+                return result
+
+        start = time.perf_counter()
+        result.docs = self.retriever.search_by_vector(result.vector, query=question, timings=result.timings)
+        result.timings["search_ms"] = _elapsed_ms(start)
+        self._rerank(question, result)
+        self._pack(result)
+        return result
+
+    def _rerank(self, question: str, result: _Retrieval):
+        if self.reranker is None:
+            return
+        start = time.perf_counter()
+        result.docs, result.rerank = self.reranker.rerank(question, result.docs)
+        result.timings["rerank_ms"] = _elapsed_ms(start)
+
+    def _pack(self, result: _Retrieval):
+        if self.packer is None:
+            return
+        start = time.perf_counter()
+        result.context = self.packer.pack(result.docs)
+        result.timings["pack_ms"] = _elapsed_ms(start)
+
+    def _prepare_batch(self, questions: List[str]) -> List[_Retrieval]:
+        """`_prepare` for many questions: one embedding pass and one index search for all cache misses.
+
+        Stage timings are for the whole batch and are reported on every question.
+        """
+        if not hasattr(self.retriever, "embed_queries"):
+            return [self._prepare(question) for question in questions]
+
+        results = [_Retrieval() for _ in questions]
+        pending = list(range(len(questions)))
+        if self.cache is not None:
+            generation = self.cache.generation
+            for i in pending:
+                results[i].generation = generation
+                entry = self.cache.get(questions[i])
+                if entry is not None:
+                    results[i].cached, results[i].cache_hit = entry, "exact"
+            pending = [i for i in pending if results[i].cached is None]
+        if not pending:
+            return results
+
+        start = time.perf_counter()
+        vectors = self.retriever.embed_queries([questions[i] for i in pending])
+        embed_ms = _elapsed_ms(start)
+        for i, vector in zip(pending, vectors):
+            results[i].vector = vector
+            results[i].timings["embed_ms"] = embed_ms
+
+        if self.cache is not None:
+            for i in pending:
+                entry = self.cache.get_similar(results[i].vector)
+                if entry is not None:
+                    results[i].cached, results[i].cache_hit = entry, "semantic"
+            pending = [i for i in pending if results[i].cached is None]
+        if not pending:
+            return results
+
+        start = time.perf_counter()
+        search_timings: Dict[str, float] = {}
+        found = self.retriever.search_by_vectors([results[i].vector for i in pending], [questions[i] for i in pending], search_timings)
+        search_ms = _elapsed_ms(start)
+        for i, docs in zip(pending, found):
+            results[i].docs = docs
+            results[i].timings.update(search_timings)
+            results[i].timings["search_ms"] = search_ms
+            self._rerank(questions[i], results[i])
+            self._pack(results[i])
+        return results
+
+    def retrieve(self, question: str) -> Tuple[List[Document], Dict[str, float]]:
+        """Retrieve context documents once, timing each stage in milliseconds."""
+        result = self._prepare(question, use_cache=False)
+        return result.docs, result.timings
+
+    def _finish(self, question: str, prepared: _Retrieval, answer: Optional[str], total_start: float) -> RAGResponse:
+        timings = prepared.timings
+        if prepared.cached is not None:
+            timings["total_ms"] = _elapsed_ms(total_start)
+            return RAGResponse(answer=prepared.cached.answer, sources=prepared.cached.sources, timings=timings, cache_hit=prepared.cache_hit)
+
+        sources = extract_sources(prepared.docs)
+        if self.cache is not None and prepared.cacheable:
+            self.cache.put(question, answer, sources, prepared.vector, prepared.generation)
+        timings["total_ms"] = _elapsed_ms(total_start)
+        context = dict(prepared.context.stats) if prepared.context is not None else {}
+        context.update({f"rerank_{name}": value for name, value in prepared.rerank.items()})
+        return RAGResponse(answer=answer, sources=sources, context_chunks=prepared.docs, timings=timings, context=context)
+
+    def _inputs(self, question: str, prepared: _Retrieval) -> Dict[str, str]:
+        context = prepared.context.text if prepared.context is not None else format_docs(prepared.docs)
+        return {"context": context, "history": format_history(prepared.history), "question": question}
+
+    def _summary_inputs(self, previous: str, turns: List[Turn], max_tokens: int) -> Dict[str, Any]:
+        return {
+            "max_words": max(20, int(max_tokens * 0.75)),
+            "previous": f"Earlier summary: {previous}\n\n" if previous else "",
+            "turns": "\n\n".join(f"User: {t.question}\nAssistant: {t.answer}" for t in turns),
+        }
+
+    def _summarize(self, previous: str, turns: List[Turn], max_tokens: int) -> str:
+        """LLM summarizer for `ConversationMemory.compact`."""
+        return self.summary_chain.invoke(self._summary_inputs(previous, turns, max_tokens))
+
+    def _remember(self, session_id: Optional[str], question: str, response: RAGResponse):
+        if session_id is None or self.memory is None:
+            return
+        if self.memory.record(session_id, question, response.answer):
+            self.memory.compact(session_id, self._summarize)
+
+    async def _aremember(self, session_id: Optional[str], question: str, response: RAGResponse):
+        """Record the turn; older turns are summarized in the background, off the response path."""
+        if session_id is None or self.memory is None:
+            return
+        if await get_pool("retrieval").run(self.memory.record, session_id, question, response.answer):
+            task = asyncio.create_task(self._acompact(session_id))
+            self._summary_tasks.add(task)
+            task.add_done_callback(self._summary_tasks.discard)
+
+    async def _acompact(self, session_id: str):
+        pending = await get_pool("retrieval").run(self.memory.overflow, session_id)
+        if pending is None:
+            return
+        previous, turns = pending
+        try:
+            summary = await self.summary_chain.ainvoke(self._summary_inputs(previous, turns, self.memory.summary_tokens))
+        except Exception as e:
+            print(f"⚠️ Summarizing session {session_id} failed, using extractive summary: {e}")
+            summary = extractive_summary(previous, turns, self.memory.summary_tokens)
+        await get_pool("retrieval").run(self.memory.apply_summary, session_id, turns, summary)
+
+    def query(self, question: str, session_id: Optional[str] = None) -> RAGResponse:
+        total_start = time.perf_counter()
+
+        # Get relevant documents (or a cached answer)
+        prepared = self._prepare(question, session_id=session_id)
+
+        # Get answer from the same documents
+        answer = None
+        if prepared.cached is None:
+            start = time.perf_counter()
+            answer = self.rag_chain.invoke(self._inputs(question, prepared))
+            prepared.timings["llm_ms"] = _elapsed_ms(start)
+
+        response = self._finish(question, prepared, answer, total_start)
+        self._remember(session_id, question, response)
+        return response
+
+    async def aquery(self, question: str, session_id: Optional[str] = None) -> RAGResponse:
+        """Async variant of `query`: retrieval runs on the retrieval pool, the LLM call via `ainvoke`."""
+        total_start = time.perf_counter()
+
+        prepared = await get_pool("retrieval").run(self._prepare, question, True, session_id)
+
+        answer = None
+        if prepared.cached is None:
+            start = time.perf_counter()
+            answer = await self.rag_chain.ainvoke(self._inputs(question, prepared))
+            prepared.timings["llm_ms"] = _elapsed_ms(start)
+
+        response = self._finish(question, prepared, answer, total_start)
+        await self._aremember(session_id, question, response)
+        return response
+
+    async def aquery_batch(self, questions: List[str], concurrency: int = 4) -> AsyncIterator[Tuple[int, Any]]:
+        """Answer many questions, yielding `(index, RAGResponse or Exception)` in input order.
+
+        Retrieval for the whole batch runs once on the retrieval pool; at
+        most `concurrency` LLM calls are in flight. Closing the generator
+        cancels the calls that have not finished.
+        """
+        total_start = time.perf_counter()
+        prepared = await get_pool("retrieval").run(self._prepare_batch, questions)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(i: int) -> RAGResponse:
+            result = prepared[i]
+            text = None
+            if result.cached is None:
+                async with semaphore:
+                    start = time.perf_counter()
+                    text = await self.rag_chain.ainvoke(self._inputs(questions[i], result))
+                    result.timings["llm_ms"] = _elapsed_ms(start)
+            return self._finish(questions[i], result, text, total_start)
+
+        # Repeated questions in a bank share one LLM call
+        tasks, first = [], {}
+        for i, question in enumerate(questions):
+            key = normalize_question(question)
+            if key not in first:
+                first[key] = asyncio.create_task(answer(i))
+            tasks.append(first[key])
+        try:
+            for i, task in enumerate(tasks):
+                try:
+                    yield i, await task
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    yield i, e
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def astream(self, question: str, session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as events: sources first, then answer tokens, then timings.
+
+        Closing the generator (e.g. on client disconnect) closes the upstream
+        LLM stream, which cancels the Groq request.
+        """
+        total_start = time.perf_counter()
+        prepared = await get_pool("retrieval").run(self._prepare, question, True, session_id)
+
+        if prepared.cached is not None:
+            yield {"type": "sources", "sources": prepared.cached.sources, "cache_hit": prepared.cache_hit}
+            yield {"type": "token", "content": prepared.cached.answer}
+            response = self._finish(question, prepared, None, total_start)
+            await self._aremember(session_id, question, response)
+            yield {"type": "done", "timings": response.timings}
+            return
+
+        yield {"type": "sources", "sources": extract_sources(prepared.docs), "cache_hit": None}
+
+        start = time.perf_counter()
+        parts = []
+        async for token in self.rag_chain.astream(self._inputs(question, prepared)):
+            if not parts:
+                prepared.timings["first_token_ms"] = _elapsed_ms(start)
+            parts.append(token)
+            yield {"type": "token", "content": token}
+        prepared.timings["llm_ms"] = _elapsed_ms(start)
+
+        response = self._finish(question, prepared, "".join(parts), total_start)
+        await self._aremember(session_id, question, response)
+        yield {"type": "done", "timings": response.timings, "context": response.context}
+
+    def clear_session(self, session_id: str) -> bool:
+        return self.memory.clear(session_id) if self.memory is not None else False
@@ -0,0 +1,167 @@
+# Context assembly: merge overlapping chunks, drop near-duplicates, pack into a token budget
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+from langchain_core.documents import Document
+from .tokens import count_tokens, truncate_tokens
+
+SEPARATOR = "\n\n"
+
+@dataclass
+class _Passage:
+    text: str
+    key: Tuple[Any, Any]  # (source, page); only passages with the same key are merged
+    rank: int  # best retrieval rank among its chunks
+    start: Optional[int] = None  # character offsets in the page, when the splitter recorded them
+    end: Optional[int] = None
+    chunks: int = 1
+
+@dataclass
+class PackedContext:
+    text: str
+    passages: List[str] = field(default_factory=list)
+    stats: Dict[str, int] = field(default_factory=dict)
+
+def _source_key(doc: Document) -> Tuple[Any, Any]:
+    metadata = doc.metadata
+    return (metadata.get("source_file") or metadata.get("source_url") or metadata.get("source"), metadata.get("page"))
+
+def text_overlap(left: str, right: str, min_overlap: int = 20) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right` (0 below `min_overlap`)."""
+    if len(right) < min_overlap or len(left) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        # The first match leaves the longest suffix
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+    return 0
+
+def _shingles(text: str, size: int = 5) -> Set[int]:
+    words = text.lower().split()
+    if len(words) < size:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+class ContextPacker:
+    """Turns retrieved chunks into the prompt context.
+
+    1. Chunks from the same source page that overlap or touch (by the
+       splitter's `start_index`, else by shared text at their edges) are
+       merged, so the splitter's chunk overlap is sent once.
+    2. Passages whose word 5-grams are mostly contained in a better-ranked
+       passage (`duplicate_threshold`) are dropped, e.g. the same
+       paragraph in two uploaded files.
+    3. Passages are added in rank order until `max_tokens`; the first one
+       that does not fit is truncated if at least `min_tokens` remain.
+    """
+
+    def __init__(self, max_tokens: int = 1500, duplicate_threshold: float = 0.85, min_overlap: int = 20, min_tokens: int = 50):
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap = min_overlap
+        self.min_tokens = min_tokens
+
+    def _merge(self, first: _Passage, second: _Passage) -> Optional[_Passage]:
+        """`first` and `second` as one passage, or None if they are not contiguous."""
+        if first.key != second.key:
+            return None
+        text = None
+        if None not in (first.start, first.end, second.start, second.end):
+            left, right = (first, second) if first.start <= second.start else (second, first)
+            if right.end <= left.end:
+                text = left.text
+            elif right.start <= left.end:
+                text = left.text + right.text[left.end - right.start:]
+            elif right.start - left.end <= 2:
+                # Adjacent; the splitter dropped the whitespace between them
+                text = left.text + " " + right.text
+            if text is not None:
+                start, end = left.start, max(left.end, right.end)
+        else:
+            start = end = None
+            if second.text in first.text:
+                text = first.text
+            elif first.text in second.text:
+                text = second.text
+            else:
+                for left, right in ((first, second), (second, first)):
+                    overlap = text_overlap(left.text, right.text, self.min_overlap)
+                    if overlap:
+                        text = left.text + right.text[overlap:]
+                        break
+        if text is None:
+            return None
+        return _Passage(text=text, key=first.key, rank=min(first.rank, second.rank), start=start, end=end, chunks=first.chunks + second.chunks)
+
+    def _passages(self, docs: List[Document]) -> List[_Passage]:
+        passages: List[_Passage] = []
+        for rank, doc in enumerate(docs):
+            start = doc.metadata.get("start_index")
+            passage = _Passage(
+                text=doc.page_content.strip(),
+                key=_source_key(doc),
+                rank=rank,
+                start=start if isinstance(start, int) and start >= 0 else None,
+            )
+            if passage.start is not None:
+                passage.end = passage.start + len(doc.page_content)
+            # A merged passage may now bridge two earlier ones, so keep merging until nothing changes
+            merged = True
+            while merged:
+                merged = False
+                for i, other in enumerate(passages):
+                    combined = self._merge(other, passage)
+                    if combined is not None:
+                        passage = combined
+                        del passages[i]
+                        merged = True
+                        break
+            passages.append(passage)
+        return sorted(passages, key=lambda p: p.rank)
+
+    def pack(self, docs: List[Document]) -> PackedContext:
+        naive_tokens = count_tokens(SEPARATOR.join(doc.page_content for doc in docs))
+        passages = self._passages(docs)
+        merged = len(docs) - len(passages)
+
+        kept: List[_Passage] = []
+        kept_shingles: List[Set[int]] = []
+        duplicates = 0
+        for passage in passages:
+            shingles = _shingles(passage.text)
+            if any(len(shingles & other) / len(shingles) >= self.duplicate_threshold for other in kept_shingles):
+                duplicates += 1
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+
+        texts: List[str] = []
+        used = 0
+        truncated = 0
+        separator_tokens = count_tokens(SEPARATOR)
+        for passage in kept:
+            cost = count_tokens(passage.text) + (separator_tokens if texts else 0)
+            if used + cost <= self.max_tokens:
+                texts.append(passage.text)
+                used += cost
+                continue
+            remaining = self.max_tokens - used - (separator_tokens if texts else 0)
+            if remaining >= self.min_tokens:
+                texts.append(truncate_tokens(passage.text, remaining))
+                truncated += 1
+            break
+
+        text = SEPARATOR.join(texts)
+        tokens = count_tokens(text)
+        return PackedContext(text=text, passages=texts, stats={
+            "chunks": len(docs),
+            "passages": len(texts),
+            "merged": merged,
+            "duplicates": duplicates,
+            "truncated": truncated,
+            "dropped": len(kept) - len(texts),
+            "tokens": tokens,
+            "tokens_saved": max(0, naive_tokens - tokens),
+        })
@@ -0,0 +1,154 @@
+# On-disk SQLite docstore for memory-mapped index loading
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_core.documents import Document
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+def write_sqlite_docstore(path: Path, documents: Iterable[Tuple[str, Document]], positions: Iterable[Tuple[int, str]]):
+    """Write documents and the FAISS position -> id mapping to a new SQLite file at `path`."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.unlink(missing_ok=True)
+    conn = sqlite3.connect(str(tmp))
+    try:
+        conn.execute("CREATE TABLE documents (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        conn.execute("CREATE TABLE positions (pos INTEGER PRIMARY KEY, doc_id TEXT NOT NULL)")
+        conn.executemany(
+            "INSERT INTO documents VALUES (?, ?, ?)",
+            ((doc_id, doc.page_content, json.dumps(doc.metadata, default=str)) for doc_id, doc in documents),
+        )
+        conn.executemany("INSERT INTO positions VALUES (?, ?)", positions)
+        conn.commit()
+    finally:
+        conn.close()
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class _ReadOnlyDB:
+    """Per-thread read-only connections to one SQLite file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn.execute(sql, params)
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Docstore that reads documents from SQLite on demand.
+
+    The file is opened read-only, so every process can share its pages
+    through the OS page cache. Documents added at runtime live in an
+    in-memory overlay until the next snapshot rewrites the file.
+    """
+
+    def __init__(self, path: Path):
+        self._db = _ReadOnlyDB(path)
+        self._added: Dict[str, Document] = {}
+        self._deleted: set = set()
+
+    def _load(self, doc_id: str) -> Union[Document, None]:
+        if doc_id in self._deleted:
+            return None
+        if doc_id in self._added:
+            return self._added[doc_id]
+        row = self._db.execute("SELECT page_content, metadata FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return None
+        return Document(id=doc_id, page_content=row[0], metadata=json.loads(row[1]))
+
+    def search(self, search: str) -> Union[str, Document]:
+        doc = self._load(search)
+        return doc if doc is not None else f"ID {search} not found."
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._load(doc_id) is not None
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        overlapping = [doc_id for doc_id in texts if doc_id in self]
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        for doc_id, doc in texts.items():
+            self._deleted.discard(doc_id)
+            self._added[doc_id] = doc
+
+    def delete(self, ids: List) -> None:
+        for doc_id in ids:
+            self._added.pop(doc_id, None)
+            self._deleted.add(doc_id)
+
+    def copy(self) -> "SQLiteDocstore":
+        """A view of the current documents that later adds and deletes do not change."""
+        view = SQLiteDocstore.__new__(SQLiteDocstore)
+        view._db, view._added, view._deleted = self._db, dict(self._added), set(self._deleted)
+        return view
+
+    def iter_documents(self) -> Iterator[Tuple[str, Document]]:
+        for doc_id, page_content, metadata in self._db.execute("SELECT id, page_content, metadata FROM documents"):
+            if doc_id not in self._deleted and doc_id not in self._added:
+                yield doc_id, Document(id=doc_id, page_content=page_content, metadata=json.loads(metadata))
+        yield from self._added.items()
+
+class SQLiteIndexMap(MutableMapping):
+    """FAISS position -> docstore id mapping read from SQLite, with an in-memory overlay."""
+
+    def __init__(self, path: Path):
+        self._db = _ReadOnlyDB(path)
+        self._base_len = self._db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        self._added: Dict[int, str] = {}
+        self._removed: set = set()
+
+    def __getitem__(self, pos: int) -> str:
+        if pos in self._added:
+            return self._added[pos]
+        if pos not in self._removed:
+            row = self._db.execute("SELECT doc_id FROM positions WHERE pos = ?", (int(pos),)).fetchone()
+            if row is not None:
+                return row[0]
+        raise KeyError(pos)
+
+    def __setitem__(self, pos: int, doc_id: str):
+        self._removed.discard(pos)
+        self._added[pos] = doc_id
+
+    def __delitem__(self, pos: int):
+        if pos in self._added:
+            del self._added[pos]
+        elif pos < self._base_len and pos not in self._removed:
+            self._removed.add(pos)
+        else:
+            raise KeyError(pos)
+
+    def __iter__(self) -> Iterator[int]:
+        for (pos,) in self._db.execute("SELECT pos FROM positions ORDER BY pos"):
+            if pos not in self._removed and pos not in self._added:
+                yield pos
+        yield from sorted(self._added)
+
+    def copy(self) -> "SQLiteIndexMap":
+        """A view of the current mapping that later changes do not affect."""
+        view = SQLiteIndexMap.__new__(SQLiteIndexMap)
+        view._db, view._base_len, view._added, view._removed = self._db, self._base_len, dict(self._added), set(self._removed)
+        return view
+
+    def __len__(self) -> int:
+        return self._base_len - len(self._removed) + len([p for p in self._added if p >= self._base_len])
+
+    def __contains__(self, pos) -> bool:
+        try:
+            self[pos]
+            return True
+        except KeyError:
+            return False
@@ -0,0 +1,185 @@
+# Two-tier embedding cache: in-memory LRU in front of a memory-mapped vector file
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from .hashing import chunk_hash
+
+# Keys per IN (...) query; older SQLite builds allow at most 999 bound variables
+_SQL_BATCH = 500
+
+class DiskEmbeddingStore:
+    """Vectors of one model in `vectors.f32` (read through np.memmap), keys in `keys.sqlite`.
+
+    A writer reserves its rows and writes their bytes inside one IMMEDIATE
+    transaction, so several processes can share the directory and readers
+    only see keys whose vectors are complete.
+    """
+
+    def __init__(self, directory: Path):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.vector_path = self.dir / "vectors.f32"
+        self.vector_path.touch(exist_ok=True)
+        self._local = threading.local()
+        self._map: Optional[np.memmap] = None
+        self._map_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.commit()
+        row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim: Optional[int] = row[0] if row else None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.dir / "keys.sqlite"), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _rows(self, min_rows: int) -> np.memmap:
+        with self._map_lock:
+            if self._map is None or len(self._map) < min_rows:
+                rows = os.path.getsize(self.vector_path) // (self.dim * 4)
+                self._map = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+            return self._map
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if not keys or self.dim is None:
+            return {}
+        found = {}
+        conn = self._conn()
+        for start in range(0, len(keys), _SQL_BATCH):
+            batch = keys[start:start + _SQL_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(f"SELECT key, row FROM keys WHERE key IN ({placeholders})", batch).fetchall())
+        if not found:
+            return {}
+        vectors = self._rows(max(found.values()) + 1)
+        return {key: np.array(vectors[row]) for key, row in found.items()}
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        if not items:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.dim is None:
+                row = conn.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+                self.dim = row[0] if row else len(next(iter(items.values())))
+                conn.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (self.dim,))
+            keys = list(items)
+            existing = set()
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                existing.update(key for (key,) in conn.execute(f"SELECT key FROM keys WHERE key IN ({placeholders})", batch))
+            new = [(key, vector) for key, vector in items.items() if key not in existing]
+            if new:
+                next_row = conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM keys").fetchone()[0]
+                data = np.stack([np.asarray(vector, dtype=np.float32) for _, vector in new])
+                with open(self.vector_path, "r+b") as f:
+                    f.seek(next_row * self.dim * 4)
+                    f.write(data.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                conn.executemany("INSERT INTO keys VALUES (?, ?)", [(key, next_row + i) for i, (key, _) in enumerate(new)])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embedding model with a memory LRU and an optional disk tier.
+
+    Entries are keyed by (model key, kind, normalized text hash); queries
+    and documents are cached separately because some models embed them
+    differently. Only texts missing from both tiers reach the model, in
+    one batched call. The wrapped model must also provide `embed_queries`.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_key: str, max_entries: int = 10000, cache_dir: Optional[str] = None):
+        self.embeddings = embeddings
+        self.model_key = model_key
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = DiskEmbeddingStore(Path(cache_dir) / re.sub(r"[^A-Za-z0-9._-]+", "_", model_key)) if cache_dir else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _embed(self, texts: List[str], kind: str) -> List[List[float]]:
+        keys = [f"{kind}:{chunk_hash(text)}" for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self.memory_hits += sum(1 for key in keys if key in found)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        disk_hits = 0
+        if missing and self.disk is not None:
+            from_disk = self.disk.get_many(missing)
+            found.update(from_disk)
+            disk_hits = sum(1 for key in keys if key in from_disk)
+            missing = [key for key in missing if key not in from_disk]
+
+        computed: Dict[str, np.ndarray] = {}
+        if missing:
+            text_of = dict(zip(keys, texts))
+            missing_texts = [text_of[key] for key in missing]
+            if kind == "query" and len(missing_texts) == 1:
+                vectors = [self.embeddings.embed_query(missing_texts[0])]
+            elif kind == "query":
+                vectors = self.embeddings.embed_queries(missing_texts)
+            else:
+                vectors = self.embeddings.embed_documents(missing_texts)
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, vectors)}
+            if self.disk is not None:
+                self.disk.put_many(computed)
+            found.update(computed)
+
+        with self._lock:
+            self.disk_hits += disk_hits
+            self.misses += sum(1 for key in keys if key in computed)
+            for key in dict.fromkeys(keys):
+                self._memory[key] = found[key]
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "doc")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], "query")[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "query")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            memory_entries, memory_hits, disk_hits, misses = len(self._memory), self.memory_hits, self.disk_hits, self.misses
+        lookups = memory_hits + disk_hits + misses
+        return {
+            "memory_entries": memory_entries,
+            "disk_entries": len(self.disk) if self.disk is not None else 0,
+            "memory_hits": memory_hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_rate": round((memory_hits + disk_hits) / lookups, 3) if lookups else 0.0,
+        }
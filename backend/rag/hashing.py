@@ -0,0 +1,10 @@
+# Content hashes for document and chunk deduplication
+import hashlib
+
+def document_hash(content: bytes) -> str:
+    """SHA-256 of an uploaded file's raw bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+def chunk_hash(text: str) -> str:
+    """SHA-256 of a chunk's text with whitespace collapsed, so re-extracted copies still match."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
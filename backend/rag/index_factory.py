@@ -0,0 +1,121 @@
+# FAISS index construction for the configurable index types
+import json
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+from typing import Any, Dict, Optional
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+META_FILE = "index_meta.json"
+
+@dataclass
+class IndexSpec:
+    """Index type and its build/search parameters.
+
+    - flat: exact search, memory = n * dim * 4 bytes
+    - ivf_flat: `nlist` inverted lists, `nprobe` of them scanned per query
+    - ivf_pq: IVF with product quantization, `pq_m` sub-vectors of `pq_nbits` bits
+    - hnsw: graph with `hnsw_m` links per node, `ef_search` candidates per query
+    """
+    index_type: str = "flat"
+    nlist: int = 100
+    nprobe: int = 10
+    pq_m: int = 16
+    pq_nbits: int = 8
+    hnsw_m: int = 32
+    ef_construction: int = 40
+    ef_search: int = 64
+
+    @classmethod
+    def from_config(cls, config) -> "IndexSpec":
+        return cls(
+            index_type=config.faiss_index_type,
+            nlist=config.faiss_nlist,
+            nprobe=config.faiss_nprobe,
+            pq_m=config.faiss_pq_m,
+            pq_nbits=config.faiss_pq_nbits,
+            hnsw_m=config.faiss_hnsw_m,
+            ef_construction=config.faiss_ef_construction,
+            ef_search=config.faiss_ef_search,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexSpec":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def validate(self, dim: Optional[int] = None):
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"index_type must be one of {', '.join(INDEX_TYPES)}")
+        if self.index_type == "ivf_pq" and dim is not None and dim % self.pq_m != 0:
+            raise ValueError(f"pq_m ({self.pq_m}) must divide the embedding dimension ({dim})")
+
+def effective_spec(spec: IndexSpec, n_vectors: int) -> IndexSpec:
+    """Adjust `spec` to what can be trained on `n_vectors`.
+
+    IVF needs roughly 39 training points per list, PQ needs 2**nbits points
+    per codebook; small corpora fall back to fewer lists or a flat index.
+    """
+    spec = IndexSpec.from_dict(spec.to_dict())
+    if spec.index_type in ("ivf_flat", "ivf_pq"):
+        spec.nlist = max(1, min(spec.nlist, n_vectors // 39))
+        spec.nprobe = min(spec.nprobe, spec.nlist)
+        if spec.index_type == "ivf_pq" and n_vectors < 2 ** spec.pq_nbits:
+            print(f"⚠️ {n_vectors} vectors are too few to train IVF-PQ, using a flat index")
+            spec.index_type = "flat"
+    return spec
+
+def build_index(spec: IndexSpec, vectors: np.ndarray) -> faiss.Index:
+    """Create, train and fill an index of the given type (L2 metric, like LangChain's default)."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vectors.shape[1]
+    spec.validate(dim)
+
+    if spec.index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif spec.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, spec.hnsw_m)
+        index.hnsw.efConstruction = spec.ef_construction
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        if spec.index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, spec.nlist)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, spec.nlist, spec.pq_m, spec.pq_nbits)
+        index.train(vectors)
+
+    if len(vectors):
+        index.add(vectors)
+    apply_search_params(index, spec)
+    return index
+
+def apply_search_params(index: faiss.Index, spec: IndexSpec):
+    """Set query-time parameters, which FAISS does not always persist."""
+    if hasattr(index, "nprobe"):
+        index.nprobe = spec.nprobe
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = spec.ef_search
+
+def extract_vectors(index: faiss.Index) -> np.ndarray:
+    """Stored vectors in id order (lossy for PQ indexes)."""
+    if index.ntotal == 0:
+        return np.empty((0, index.d), dtype=np.float32)
+    if hasattr(index, "make_direct_map"):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def save_spec(index_path: Path, spec: IndexSpec):
+    meta = Path(index_path) / META_FILE
+    tmp = meta.with_suffix(".tmp")
+    tmp.write_text(json.dumps(spec.to_dict(), indent=2))
+    tmp.replace(meta)
+
+def load_spec(index_path: Path) -> Optional[IndexSpec]:
+    meta = Path(index_path) / META_FILE
+    if not meta.exists():
+        return None
+    return IndexSpec.from_dict(json.loads(meta.read_text()))
@@ -0,0 +1,343 @@
+# Conversation memory: per-session turns, a token-budgeted prompt window and bounded storage
+import json
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .tokens import count_tokens, truncate_tokens
+
+SESSION_BACKENDS = ("memory", "sqlite")
+
+@dataclass
+class Turn:
+    question: str
+    answer: str
+    tokens: int
+    created: float = field(default_factory=time.time)
+
+@dataclass
+class Session:
+    session_id: str
+    turns: List[Turn] = field(default_factory=list)
+    summary: str = ""
+    summarized_turns: int = 0
+    updated: float = field(default_factory=time.time)
+
+    def size_bytes(self) -> int:
+        """Approximate footprint, used for the store's memory cap."""
+        return 256 + len(self.summary) + sum(96 + len(t.question) + len(t.answer) for t in self.turns)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "Session":
+        raw = json.loads(data)
+        raw["turns"] = [Turn(**turn) for turn in raw["turns"]]
+        return cls(**raw)
+
+class SessionStore(ABC):
+    """Storage backend for sessions.
+
+    `update` is an atomic read-modify-write, so concurrent requests on one
+    session never lose a turn. Recency is the time of the last update;
+    sessions idle for longer than `ttl_s` expire, and the least recently
+    updated ones are evicted beyond `max_sessions` or `max_bytes`.
+    """
+
+    def __init__(self, max_sessions: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 86400):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, updated: float, now: Optional[float] = None) -> bool:
+        return bool(self.ttl_s) and (now or time.time()) - updated > self.ttl_s
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, fn: Callable[[Session], None]) -> Session:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+class InMemorySessionStore(SessionStore):
+    """Sessions in a process-local LRU; lost on restart and not shared between workers."""
+
+    def __init__(self, max_sessions: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 86400):
+        super().__init__(max_sessions, max_bytes, ttl_s)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, session_id: str):
+        del self._sessions[session_id]
+        self._total_bytes -= self._sizes.pop(session_id)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session.updated):
+                self._remove(session_id)
+                self.expirations += 1
+                return None
+            return session
+
+    def update(self, session_id: str, fn: Callable[[Session], None]) -> Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self._expired(session.updated):
+                self._remove(session_id)
+                self.expirations += 1
+                session = None
+            if session is None:
+                session = Session(session_id)
+            fn(session)
+            session.updated = time.time()
+            if session_id in self._sessions:
+                self._remove(session_id)
+            self._sessions[session_id] = session
+            self._sizes[session_id] = session.size_bytes()
+            self._total_bytes += self._sizes[session_id]
+            self._evict()
+            return session
+
+    def _evict(self):
+        now = time.time()
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if self._expired(oldest.updated, now):
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions or (self.max_bytes and self._total_bytes > self.max_bytes):
+                self.evictions += 1
+            else:
+                break
+            self._remove(oldest_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            self._remove(session_id)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self._total_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a local SQLite file: they survive restarts and are shared by every worker on the host.
+
+    Writes run in IMMEDIATE transactions (WAL mode), so several processes
+    can append to the same session safely.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 86400):
+        super().__init__(max_sessions, max_bytes, ttl_s)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data TEXT NOT NULL, size INTEGER NOT NULL, updated REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> Optional[Session]:
+        row = self._conn().execute("SELECT data, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return Session.from_json(row[0])
+
+    def update(self, session_id: str, fn: Callable[[Session], None]) -> Session:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data, updated FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            session = Session.from_json(row[0]) if row is not None and not self._expired(row[1]) else Session(session_id)
+            fn(session)
+            session.updated = time.time()
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)", (session_id, session.to_json(), session.size_bytes(), session.updated))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return session
+
+    def _evict(self, conn: sqlite3.Connection):
+        if self.ttl_s:
+            self.expirations += conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - self.ttl_s,)).rowcount
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        if count <= self.max_sessions and (not self.max_bytes or total <= self.max_bytes):
+            return
+        # Walk from the least recently updated until both caps hold
+        doomed = []
+        for session_id, size in conn.execute("SELECT id, size FROM sessions ORDER BY updated"):
+            if count <= self.max_sessions and (not self.max_bytes or total <= self.max_bytes):
+                break
+            doomed.append((session_id,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM sessions WHERE id = ?", doomed)
+        self.evictions += len(doomed)
+
+    def delete(self, session_id: str) -> bool:
+        return self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        count, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM sessions").fetchone()
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "sessions": count,
+            "bytes": total,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+def create_session_store(backend: str = "memory", path: str = "./sessions.sqlite", max_sessions: int = 10000, max_memory_mb: int = 64, ttl_s: float = 86400) -> SessionStore:
+    if backend not in SESSION_BACKENDS:
+        raise ValueError(f"session backend must be one of {', '.join(SESSION_BACKENDS)}")
+    max_bytes = max_memory_mb * 1024 * 1024
+    if backend == "sqlite":
+        return SQLiteSessionStore(path, max_sessions, max_bytes, ttl_s)
+    return InMemorySessionStore(max_sessions, max_bytes, ttl_s)
+
+Summarizer = Callable[[str, List[Turn], int], str]
+
+def _first_sentence(text: str, limit: int = 200) -> str:
+    sentence = re.split(r"(?<=[.!?])\s", text.strip(), maxsplit=1)[0]
+    return sentence[:limit]
+
+def extractive_summary(previous: str, turns: List[Turn], max_tokens: int) -> str:
+    """Cheap summary without an LLM: the first sentence of each question and answer, newest kept."""
+    lines = previous.splitlines() if previous else []
+    lines += [f"Asked: {_first_sentence(t.question)} Answered: {_first_sentence(t.answer)}" for t in turns]
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_tokens("\n".join(lines), max_tokens, keep_end=True)
+
+class ConversationMemory:
+    """Session history for the prompt, bounded by a token budget.
+
+    `window` returns the session summary plus as many of the newest turns
+    as fit in `history_tokens`. The newest turn is always included, cut
+    with `truncate_tokens` when it does not fit. Once the turns outgrow
+    that budget, `overflow` names the oldest ones, which are folded into a
+    summary of at most `summary_tokens` by `summarizer` and then dropped.
+    """
+
+    def __init__(self, store: SessionStore, history_tokens: int = 1000, summary_tokens: int = 250, summarizer: Optional[Summarizer] = None):
+        self.store = store
+        self.history_tokens = history_tokens
+        self.summary_tokens = min(summary_tokens, history_tokens // 2)
+        self.summarizer = summarizer or extractive_summary
+        self.summaries = 0
+
+    def window(self, session_id: str) -> str:
+        session = self.store.get(session_id)
+        if session is None:
+            return ""
+        budget = self.history_tokens
+        parts = []
+        if session.summary:
+            parts.append(f"Summary of earlier conversation: {session.summary}")
+            budget -= count_tokens(parts[0])
+        recent = []
+        for turn in reversed(session.turns):
+            text = f"User: {turn.question}\nAssistant: {turn.answer}"
+            if turn.tokens > budget:
+                if not recent:
+                    # Follow-ups refer to the last exchange; the summary never leaves it less than half the budget
+                    recent.append(truncate_tokens(text, max(budget, self.history_tokens - self.summary_tokens)))
+                break
+            recent.append(text)
+            budget -= turn.tokens
+        return "\n\n".join(parts + recent[::-1])
+
+    def record(self, session_id: str, question: str, answer: str) -> bool:
+        """Append a turn; True when older turns should now be summarized."""
+        turn = Turn(question=question, answer=answer, tokens=count_tokens(question) + count_tokens(answer) + 4)
+        session = self.store.update(session_id, lambda s: s.turns.append(turn))
+        return self._overflow(session) is not None
+
+    def _overflow(self, session: Session) -> Optional[List[Turn]]:
+        budget = self.history_tokens - self.summary_tokens
+        kept = 0
+        for i in range(len(session.turns) - 1, -1, -1):
+            kept += session.turns[i].tokens
+            if kept > budget:
+                # Always keep the newest turn verbatim
+                return session.turns[:min(i + 1, len(session.turns) - 1)] or None
+        return None
+
+    def overflow(self, session_id: str) -> Optional[Tuple[str, List[Turn]]]:
+        """The current summary and the oldest turns that no longer fit, or None."""
+        session = self.store.get(session_id)
+        if session is None:
+            return None
+        turns = self._overflow(session)
+        return (session.summary, turns) if turns else None
+
+    def apply_summary(self, session_id: str, turns: List[Turn], summary: str):
+        """Replace `turns` with `summary`, unless the session changed underneath (e.g. was cleared)."""
+        def fold(session: Session):
+            head = session.turns[:len(turns)]
+            if not head or [t.created for t in head] != [t.created for t in turns]:
+                return
+            session.turns = session.turns[len(turns):]
+            session.summary = truncate_tokens(summary.strip(), self.summary_tokens, keep_end=True)
+            session.summarized_turns += len(turns)
+            self.summaries += 1
+
+        if self.store.get(session_id) is not None:
+            self.store.update(session_id, fold)
+
+    def compact(self, session_id: str, summarizer: Optional[Summarizer] = None):
+        """Summarize overflowing turns synchronously with `summarizer` (default: the memory's own)."""
+        pending = self.overflow(session_id)
+        if pending is None:
+            return
+        previous, turns = pending
+        try:
+            summary = (summarizer or self.summarizer)(previous, turns, self.summary_tokens)
+        except Exception as e:
+            print(f"⚠️ Summarizing session {session_id} failed, using extractive summary: {e}")
+            summary = extractive_summary(previous, turns, self.summary_tokens)
+        self.apply_summary(session_id, turns, summary)
+
+    def clear(self, session_id: str) -> bool:
+        return self.store.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.store.stats()
+        stats.update({"history_tokens": self.history_tokens, "summary_tokens": self.summary_tokens, "summaries": self.summaries})
+        return stats
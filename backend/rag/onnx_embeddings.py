@@ -0,0 +1,134 @@
+# ONNX Runtime embedding backend (fp32 or dynamically quantized int8)
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+
+class OnnxEmbeddingError(Exception):
+    pass
+
+def default_onnx_dir(embedding_model: str) -> str:
+    return str(Path("./models/onnx") / embedding_model.replace("/", "__"))
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an exported ONNX model, without importing torch.
+
+    Reproduces the sentence-transformers pipeline used by the torch backend:
+    fast tokenizer, transformer, mean pooling over the attention mask, then
+    L2 normalisation.
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, batch_size: int = 64, intra_op_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        model_file = model_dir / (INT8_MODEL_FILE if quantized else MODEL_FILE)
+        if not model_file.exists():
+            raise OnnxEmbeddingError(f"{model_file} not found; run `python manage.py export-onnx` first")
+        settings = json.loads((model_dir / CONFIG_FILE).read_text())
+        self.max_seq_length = settings["max_seq_length"]
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds: Dict[str, np.ndarray] = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self._encode(texts[i:i + self.batch_size]) for i in range(0, len(texts), self.batch_size)]
+        return np.concatenate(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
+
+def export_onnx(embedding_model: str, output_dir: str, quantize: bool = True, opset: int = 14) -> Path:
+    """Export a sentence-transformers model to ONNX (plus an int8 copy) with its tokenizer.
+
+    Needs the torch stack (and `onnx` for quantization); serving the result
+    only needs onnxruntime and tokenizers.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = SentenceTransformer(embedding_model, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(str(output_dir))
+    if not (output_dir / "tokenizer.json").exists():
+        raise OnnxEmbeddingError(f"{embedding_model} has no fast tokenizer (tokenizer.json)")
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            str(output_dir / MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    (output_dir / CONFIG_FILE).write_text(json.dumps({
+        "embedding_model": embedding_model,
+        "max_seq_length": model.max_seq_length,
+        "pooling": "mean",
+        "normalize": True,
+    }, indent=2))
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(str(output_dir / MODEL_FILE), str(output_dir / INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+    print(f"✅ Exported {embedding_model} to {output_dir}")
+    return output_dir
+
+def compare_backends(reference: Embeddings, candidate: Embeddings, texts: List[str]) -> Dict[str, float]:
+    """Cosine similarity between two backends' vectors for the same texts."""
+    a = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min_cosine": float(cosines.min()), "mean_cosine": float(cosines.mean()), "texts": len(texts)}
+
+def load_embeddings(embedding_model: str, backend: str = "torch", onnx_dir: Optional[str] = None):
+    """Embedding model for `backend`; the registry loader behind VectorStoreManager."""
+    if backend not in EMBEDDING_BACKENDS:
+        raise OnnxEmbeddingError(f"embedding backend must be one of {', '.join(EMBEDDING_BACKENDS)}")
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(
+            model_name=embedding_model,
+            model_kwargs={'device': 'cpu'},
+            encode_kwargs={'normalize_embeddings': True}
+        )
+    return OnnxEmbeddings(onnx_dir or default_onnx_dir(embedding_model), quantized=backend == "onnx-int8")
@@ -0,0 +1,178 @@
+# Append-only segment log and crash-safe snapshots for the FAISS index
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+SEGMENTS_DIR = "segments"
+MANIFEST_FILE = "manifest.json"
+# Hashes of source files whose ingestion completed; kept outside snapshots
+DOCUMENTS_FILE = "documents.json"
+# Each snapshot is a generation directory here; the manifest names the current one
+SNAPSHOTS_DIR = "snapshots"
+
+def _fsync_dir(path: Path):
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write_bytes(path: Path, data: bytes):
+    """Write `data` to a temp file, fsync it, then rename it over `path`."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path.parent)
+
+def read_manifest(index_path: Path) -> Dict[str, Any]:
+    manifest = Path(index_path) / MANIFEST_FILE
+    if not manifest.exists():
+        return {"segment_seq": 0}
+    return json.loads(manifest.read_text())
+
+def write_manifest(index_path: Path, manifest: Dict[str, Any]):
+    atomic_write_bytes(Path(index_path) / MANIFEST_FILE, json.dumps(manifest, indent=2).encode())
+
+def read_documents(index_path: Path) -> Set[str]:
+    path = Path(index_path) / DOCUMENTS_FILE
+    if not path.exists():
+        return set()
+    return set(json.loads(path.read_text()))
+
+def write_documents(index_path: Path, hashes: Iterable[str]):
+    Path(index_path).mkdir(parents=True, exist_ok=True)
+    atomic_write_bytes(Path(index_path) / DOCUMENTS_FILE, json.dumps(sorted(hashes)).encode())
+
+def snapshot_path(index_path: Path, manifest: Optional[Dict[str, Any]] = None) -> Path:
+    """Directory of the current snapshot: the generation named by the manifest, or
+    `index_path` itself for indexes saved before generations existed."""
+    index_path = Path(index_path)
+    generation = (manifest if manifest is not None else read_manifest(index_path)).get("generation")
+    if generation is None:
+        return index_path
+    return index_path / SNAPSHOTS_DIR / f"{generation:08d}"
+
+def install_snapshot(index_path: Path, snapshot_dir: Path, manifest: Dict[str, Any], keep: Iterable[int] = ()) -> int:
+    """Make the complete snapshot written in `snapshot_dir` current; returns its generation.
+
+    `snapshot_dir` is renamed as a whole into a new generation directory
+    and only then does the atomically written manifest switch to it. A
+    crash at any point leaves the manifest naming either the old or the
+    new generation, each with its own index, docstore, id map and metadata,
+    so files of two snapshots are never loaded together (dedup and rebuilds
+    renumber positions). Until the manifest is replaced, restart also
+    replays the segments the new snapshot contains; replay skips ids that
+    are already indexed.
+
+    Other generations are deleted afterwards, except those in `keep`
+    (generation 0 is the pre-generation layout in `index_path`) that a
+    memory-mapped index still reads from.
+    """
+    index_path = Path(index_path)
+    generations_dir = index_path / SNAPSHOTS_DIR
+    generations_dir.mkdir(parents=True, exist_ok=True)
+    # Past the highest directory too: a crash may have left one the manifest never named
+    existing = [int(p.name) for p in generations_dir.iterdir() if p.name.isdigit()]
+    generation = max(existing + [read_manifest(index_path).get("generation", 0)]) + 1
+    names = [p.name for p in snapshot_dir.iterdir()]
+    for name in names:
+        with open(snapshot_dir / name, "rb") as f:
+            os.fsync(f.fileno())
+    _fsync_dir(snapshot_dir)
+    os.replace(snapshot_dir, generations_dir / f"{generation:08d}")
+    _fsync_dir(generations_dir)
+    write_manifest(index_path, {**manifest, "generation": generation})
+
+    keep = set(keep) | {generation}
+    for path in generations_dir.iterdir():
+        if path.name.isdigit() and int(path.name) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+    if 0 not in keep:
+        for name in names:
+            (index_path / name).unlink(missing_ok=True)
+    return generation
+
+class SegmentLog:
+    """Append-only log of embedded chunks added since the last snapshot.
+
+    Each segment is a `.npy` vector file plus a `.jsonl` docstore journal
+    with one document per line. The journal is renamed into place last, so
+    a segment counts as committed only when both files exist.
+    """
+
+    def __init__(self, index_path: Path):
+        self.dir = Path(index_path) / SEGMENTS_DIR
+
+    def _paths(self, seq: int) -> Tuple[Path, Path]:
+        return self.dir / f"{seq:08d}.npy", self.dir / f"{seq:08d}.jsonl"
+
+    def committed(self) -> List[int]:
+        if not self.dir.exists():
+            return []
+        seqs = []
+        for journal in self.dir.glob("*.jsonl"):
+            seq = int(journal.stem)
+            if self._paths(seq)[0].exists():
+                seqs.append(seq)
+        return sorted(seqs)
+
+    def append(self, seq: int, ids: List[str], vectors: np.ndarray, documents: List[Document]):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        vector_path, journal_path = self._paths(seq)
+
+        vector_tmp = vector_path.with_name(vector_path.name + ".tmp")
+        with open(vector_tmp, "wb") as f:
+            np.save(f, np.asarray(vectors, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+
+        lines = [json.dumps({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}) for doc_id, doc in zip(ids, documents)]
+        journal_tmp = journal_path.with_name(journal_path.name + ".tmp")
+        with open(journal_tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(vector_tmp, vector_path)
+        os.replace(journal_tmp, journal_path)
+        _fsync_dir(self.dir)
+
+    def read(self, seq: int) -> Tuple[List[str], np.ndarray, List[Document]]:
+        vector_path, journal_path = self._paths(seq)
+        vectors = np.load(vector_path)
+        ids, documents = [], []
+        with open(journal_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                ids.append(record["id"])
+                documents.append(Document(page_content=record["page_content"], metadata=record["metadata"]))
+        if len(ids) != len(vectors):
+            raise ValueError(f"Segment {seq} is inconsistent ({len(ids)} documents, {len(vectors)} vectors)")
+        return ids, vectors, documents
+
+    def remove_through(self, seq: int):
+        """Delete segments up to and including `seq` (already in a snapshot)."""
+        for committed in self.committed():
+            if committed <= seq:
+                for path in self._paths(committed):
+                    path.unlink(missing_ok=True)
+
+    def cleanup_tmp(self):
+        """Remove partial files left by a crash mid-append."""
+        if self.dir.exists():
+            for tmp in self.dir.glob("*.tmp"):
+                tmp.unlink(missing_ok=True)
@@ -0,0 +1,153 @@
+# Optional cross-encoder reranking of retrieved candidates, with a latency cap and a score cache
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+from runtime import apply_torch_threads, get_registry
+from .cache import normalize_question
+from .hashing import chunk_hash
+
+RERANKER_KEY = "reranker"
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+def register_reranker(model_name: str = DEFAULT_RERANKER_MODEL):
+    """Register the cross-encoder loader (a no-op once registered), e.g. before warming it up."""
+    def load():
+        # sentence-transformers (and torch) are imported on first load, not when the app starts
+        from sentence_transformers import CrossEncoder
+
+        apply_torch_threads()
+        return CrossEncoder(model_name, device="cpu", max_length=512)
+
+    get_registry().register(RERANKER_KEY, load)
+
+class ScoreCache:
+    """LRU of cross-encoder scores keyed by (normalized query, chunk content hash)."""
+
+    def __init__(self, max_entries: int = 20000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._lock:
+            score = self._entries.get(key)
+            if score is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return score
+
+    def put(self, key: Tuple[str, str], score: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = score
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+class Reranker:
+    """Second retrieval stage: scores (query, chunk) pairs with a local cross-encoder
+    and keeps the best `top_n` of the dense candidates.
+
+    Pairs are scored in batches of `batch_size`. Before each batch its
+    cost is estimated from the previous one; when it would end past
+    `max_latency_ms`, scoring stops. The candidates scored so far (and any
+    cached) are then ranked by score, followed by the rest in dense order.
+    While the model is still loading, the candidates keep their dense order.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, top_n: int = 5, batch_size: int = 16,
+                 max_latency_ms: float = 250, cache_size: int = 20000):
+        self.model_name = model_name
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.max_latency_ms = max_latency_ms
+        self.cache = ScoreCache(cache_size)
+        self._loading: Optional[threading.Thread] = None
+        self.requests = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+        register_reranker(model_name)
+
+    def _model(self):
+        """The loaded cross-encoder, or None while it loads in the background."""
+        registry = get_registry()
+        if registry.is_loaded(RERANKER_KEY):
+            return registry.get(RERANKER_KEY)
+        if self._loading is None or not self._loading.is_alive():
+            # Loading takes seconds; requests use dense order meanwhile
+            self._loading = threading.Thread(target=registry.get, args=(RERANKER_KEY,), name="reranker-load", daemon=True)
+            self._loading.start()
+        return None
+
+    def rerank(self, query: str, docs: List[Document]) -> Tuple[List[Document], Dict[str, int]]:
+        """The best `top_n` of `docs` for `query`, with stats: candidates, scored, cached, fallback."""
+        self.requests += 1
+        stats = {"candidates": len(docs), "scored": 0, "cached": 0, "fallback": 0}
+        if len(docs) <= 1:
+            return docs[:self.top_n], stats
+
+        start = time.perf_counter()
+        query_key = normalize_question(query)
+        keys = [(query_key, doc.metadata.get("content_hash") or chunk_hash(doc.page_content)) for doc in docs]
+        scores: List[Optional[float]] = [self.cache.get(key) for key in keys]
+        pending = [i for i, score in enumerate(scores) if score is None]
+        stats["cached"] = len(docs) - len(pending)
+
+        if pending:
+            model = self._model()
+            if model is None:
+                self.fallbacks += 1
+                stats["fallback"] = 1
+                return docs[:self.top_n], stats
+            batch_ms = 0.0
+            for offset in range(0, len(pending), self.batch_size):
+                batch = pending[offset:offset + self.batch_size]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                if offset and self.max_latency_ms and elapsed_ms + batch_ms * len(batch) / self.batch_size > self.max_latency_ms:
+                    self.timeouts += 1
+                    stats["fallback"] = 1
+                    break
+                batch_start = time.perf_counter()
+                try:
+                    predicted = model.predict([(query, docs[i].page_content) for i in batch], batch_size=len(batch), show_progress_bar=False)
+                except Exception as e:
+                    print(f"⚠️ Reranking failed, keeping dense order for unscored candidates: {e}")
+                    stats["fallback"] = 1
+                    break
+                batch_ms = (time.perf_counter() - batch_start) * 1000
+                for i, score in zip(batch, predicted):
+                    scores[i] = float(score)
+                    self.cache.put(keys[i], scores[i])
+                stats["scored"] += len(batch)
+            self.fallbacks += stats["fallback"]
+
+        # Stable sort: equal scores keep dense order; unscored candidates follow the scored ones
+        scored = sorted((i for i in range(len(docs)) if scores[i] is not None), key=lambda i: -scores[i])
+        order = scored + [i for i in range(len(docs)) if scores[i] is None]
+        return [docs[i] for i in order[:self.top_n]], stats
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "model": self.model_name,
+            "loaded": get_registry().is_loaded(RERANKER_KEY),
+            "requests": self.requests,
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "cache": self.cache.stats(),
+        }
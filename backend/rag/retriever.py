@@ -0,0 +1,32 @@
+# Retriever over VectorStoreManager with separately timed stages
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+class IndexRetriever(BaseRetriever):
+    """LangChain retriever that exposes the embed and search stages separately.
+
+    Holding the manager (not a FAISS instance) means the retriever keeps
+    working after the index is rebuilt or reloaded.
+    """
+
+    manager: Any
+    k: int = 5
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.manager.embed_query(query)
+
+    def search_by_vector(self, vector: List[float], query: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> List[Document]:
+        # `query` feeds the BM25 side of hybrid search; dense-only stores ignore it
+        return self.manager.search_by_vector(vector, top_k=self.k, query=query, timings=timings)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return self.manager.embed_queries(queries)
+
+    def search_by_vectors(self, vectors: List[List[float]], queries: Optional[List[str]] = None,
+                          timings: Optional[Dict[str, float]] = None) -> List[List[Document]]:
+        return self.manager.search_by_vectors(vectors, top_k=self.k, queries=queries, timings=timings)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.search_by_vector(self.embed_query(query), query=query)
@@ -0,0 +1,42 @@
+# Token counting for prompt budgets
+
+# Rough characters-per-token ratio for English text when tiktoken is not installed
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = None
+        _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, otherwise a character-based estimate."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Cut `text` to at most `max_tokens`, keeping the start (or the end with `keep_end`)."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    return text[-limit:] if keep_end else text[:limit]
@@ -1,79 +1,680 @@
 # FAISS Vector Store Manager
+import shutil
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Iterable, List, Optional, Dict, Any, Tuple
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+import faiss
+import numpy as np
+from .retriever import IndexRetriever
+from .index_factory import IndexSpec, apply_search_params, build_index, effective_spec, extract_vectors, load_spec, save_spec
+from .persistence import SegmentLog, install_snapshot, read_documents, read_manifest, snapshot_path, write_documents
+from .hashing import chunk_hash
+from .embedding_cache import CachedEmbeddings
+from .batching import MicroBatchingEmbeddings
+from .onnx_embeddings import EMBEDDING_BACKENDS, load_embeddings
+from .docstore import DOCSTORE_FILE, SQLiteDocstore, SQLiteIndexMap, write_sqlite_docstore
+from .bm25 import BM25_FILE, BM25Index, reciprocal_rank_fusion
+from runtime import get_registry
 
 class VectorStoreError(Exception):
     pass
 
+LOAD_MODES = ("memory", "mmap")
+
+class _RegistryEmbeddings(Embeddings):
+    """Resolves the embedding model through the registry on first use.
+
+    Handed to the FAISS wrapper so loading an index does not load the model.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_registry().get(self.key).embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_registry().get(self.key).embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        # The sentence-transformers models used here embed queries and documents alike
+        return self.embed_documents(texts)
+
 class VectorStoreManager:
     """Manages FAISS vector store for document embeddings."""
 
-    def __init__(self, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2", index_path: str = "./faiss_index"):
+    def __init__(self, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2", index_path: str = "./faiss_index", index_spec: Optional[IndexSpec] = None, compaction_segments: int = 8, load_mode: str = "memory", embedding_cache_size: int = 10000, embedding_cache_dir: Optional[str] = None, query_batch_size: int = 32, query_batch_wait_ms: float = 5.0, embedding_backend: str = "torch", onnx_dir: Optional[str] = None, hybrid_search: bool = False, bm25_budget_ms: float = 10.0, rrf_k: int = 60, hybrid_candidates: int = 20):
+        if load_mode not in LOAD_MODES:
+            raise VectorStoreError(f"load_mode must be one of {', '.join(LOAD_MODES)}")
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise VectorStoreError(f"embedding_backend must be one of {', '.join(EMBEDDING_BACKENDS)}")
         self.embedding_model_name = embedding_model
+        # torch, onnx or onnx-int8; ONNX models come from `python manage.py export-onnx`
+        self.embedding_backend = embedding_backend
+        self.onnx_dir = onnx_dir
         self.index_path = Path(index_path)
-        self._embeddings = None
         self._vector_store = None
+        # "mmap" maps index.faiss and reads documents lazily from docstore.sqlite
+        self.load_mode = load_mode
+        self._index_mapped = False
+        # Snapshot generation the loaded store reads from (mmap mode keeps reading its files)
+        self._loaded_generation = 0
+        # Incremental persistence: chunks added since the last save, appended as segments
+        self.compaction_segments = compaction_segments
+        self._segments = SegmentLog(self.index_path)
+        self._segment_seq = 0
+        self._pending: List[Tuple[List[str], np.ndarray, List[Document]]] = []
+        self._snapshot_needed = False
+        self._write_lock = threading.RLock()
+        # One snapshot at a time; held while writing files, without the write lock
+        self._compaction_lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        # Content hashes of indexed chunks, built on the first add
+        self._chunk_hashes: Optional[set] = None
+        # Hashes of source files whose ingestion completed (documents.json), read on first use
+        self._document_hashes: Optional[set] = None
+        # Target index layout (from config) and the layout of the index actually in memory
+        self.index_spec = index_spec or IndexSpec()
+        self.active_spec = IndexSpec()
+        # Embeddings are needed by every query, so the registry never unloads them
+        self._embeddings_key = f"embeddings:{embedding_model}"
+        get_registry().register(self._embeddings_key, self._load_embeddings, pinned=True)
+        self._lazy_embeddings = _RegistryEmbeddings(self._embeddings_key)
+        # Concurrent query embeddings are coalesced into one forward pass (batch size 1 disables it)
+        model: Embeddings = self._lazy_embeddings
+        self.query_batcher: Optional[MicroBatchingEmbeddings] = None
+        if query_batch_size > 1:
+            self.query_batcher = model = MicroBatchingEmbeddings(model, query_batch_size, query_batch_wait_ms)
+        # Queries, uploads and re-embedding runs all go through the cache (0 disables it); hits skip the batcher
+        self.embedding_cache: Optional[CachedEmbeddings] = None
+        if embedding_cache_size > 0:
+            self.embedding_cache = model = CachedEmbeddings(model, self._embedding_model_key(), embedding_cache_size, embedding_cache_dir)
+        self._embeddings = model
+        # Hybrid retrieval: BM25 over the same chunks (addressed by FAISS position), fused with dense results by RRF
+        self.hybrid_search = hybrid_search
+        self.bm25_budget_ms = bm25_budget_ms
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
+        self._bm25: Optional[BM25Index] = None
+        # Searches take no write lock; this keeps the (FAISS store, BM25) pair they read consistent
+        self._swap_lock = threading.Lock()
+
+    def _load_embeddings(self):
+        return load_embeddings(self.embedding_model_name, self.embedding_backend, self.onnx_dir)
+
+    def _embedding_model_key(self) -> str:
+        # A local (e.g. fine-tuned) model can be retrained in place; its mtime keeps stale vectors out
+        key = self.embedding_model_name
+        model_config = Path(self.embedding_model_name) / "config.json"
+        if model_config.exists():
+            key = f"{key}@{int(model_config.stat().st_mtime)}"
+        # Quantized vectors differ slightly from torch ones, so each backend has its own entries
+        if self.embedding_backend != "torch":
+            key = f"{key}#{self.embedding_backend}"
+        return key
 
     @property
-    def embeddings(self):
-        if self._embeddings is None:
-            print("🔄 Loading embedding model...")
-            self._embeddings = HuggingFaceEmbeddings(
-                model_name=self.embedding_model_name,
-                model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
-            )
-            print("✅ Embedding model loaded")
+    def embeddings(self) -> Embeddings:
         return self._embeddings
 
     @property
     def is_loaded(self) -> bool:
         return self._vector_store is not None
 
+    @property
+    def index_file(self) -> Path:
+        """index.faiss of the current snapshot (it may not exist yet)."""
+        return snapshot_path(self.index_path) / "index.faiss"
+
     def load_index(self) -> bool:
-        index_file = self.index_path / "index.faiss"
+        manifest = read_manifest(self.index_path)
+        snapshot = snapshot_path(self.index_path, manifest)
+        index_file = snapshot / "index.faiss"
         if not index_file.exists():
             print(f"❌ Index file not found at {index_file}")
             return False
         try:
-            self._vector_store = FAISS.load_local(str(self.index_path), self.embeddings, allow_dangerous_deserialization=True)
-            print(f"✅ Loaded index with {self.get_document_count()} documents")
+            with self._write_lock:
+                if self.load_mode == "mmap":
+                    store = self._load_mapped(snapshot)
+                else:
+                    store = FAISS.load_local(str(snapshot), self._lazy_embeddings, allow_dangerous_deserialization=True)
+                    self._index_mapped = False
+                with self._swap_lock:
+                    self._vector_store, self._bm25 = store, None
+                self._loaded_generation = manifest.get("generation", 0)
+                # Indexes saved before index_meta.json existed are flat
+                self.active_spec = load_spec(snapshot) or IndexSpec()
+                apply_search_params(self._vector_store.index, self.active_spec)
+                self._pending.clear()
+                self._snapshot_needed = False
+                self._chunk_hashes = None
+                self._document_hashes = None
+                self._drop_unindexed_documents()
+                replayed = self._replay_segments()
+                if self.hybrid_search:
+                    self._bm25 = self._read_bm25(snapshot)
+                    self._sync_bm25()
+            print(f"✅ Loaded {self.active_spec.index_type} index ({self.load_mode}) with {self.get_document_count()} documents ({replayed} replayed from segments)")
+            if self.active_spec.index_type != self.index_spec.index_type:
+                print(f"ℹ️ Configured index type is {self.index_spec.index_type}; run `python manage.py rebuild-index` to switch")
             return True
         except Exception as e:
             print(f"❌ Failed to load index: {e}")
             return False
 
+    def _load_mapped(self, snapshot: Path) -> FAISS:
+        """Memory-map index.faiss and open the SQLite docstore without reading documents.
+
+        Cold-start cost no longer grows with the corpus, and every worker
+        process shares the same page-cache pages for both files.
+        """
+        index_file = str(snapshot / "index.faiss")
+        try:
+            index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._index_mapped = True
+        except RuntimeError as e:
+            print(f"⚠️ Cannot memory-map this index type ({e}), reading it into memory")
+            index = faiss.read_index(index_file)
+            self._index_mapped = False
+
+        db_path = snapshot / DOCSTORE_FILE
+        if not db_path.exists() or SQLiteIndexMap(db_path)._base_len < index.ntotal:
+            # One-time conversion for snapshots written before docstore.sqlite existed
+            print("🔄 Building docstore.sqlite from index.pkl...")
+            legacy = FAISS.load_local(str(snapshot), self._lazy_embeddings, allow_dangerous_deserialization=True)
+            write_sqlite_docstore(db_path, legacy.docstore._dict.items(), legacy.index_to_docstore_id.items())
+            del legacy
+
+        return FAISS(
+            embedding_function=self._lazy_embeddings,
+            index=index,
+            docstore=SQLiteDocstore(db_path),
+            index_to_docstore_id=SQLiteIndexMap(db_path),
+        )
+
+    def _drop_unindexed_documents(self):
+        """Drop docstore entries past the end of the vector index.
+
+        Snapshots written before generation directories existed replaced
+        index.pkl before index.faiss; after a crash between the two renames
+        the extra documents are still in the segment log and are re-added by
+        replay.
+        """
+        store = self._vector_store
+        extra = [pos for pos in range(store.index.ntotal, len(store.index_to_docstore_id)) if pos in store.index_to_docstore_id]
+        if extra:
+            store.docstore.delete([store.index_to_docstore_id.pop(pos) for pos in extra])
+            print(f"⚠️ Dropped {len(extra)} documents without vectors from an interrupted snapshot")
+
+    def _replay_segments(self) -> int:
+        """Re-add segments written after the snapshot, skipping ids already indexed."""
+        self._segments.cleanup_tmp()
+        base_seq = read_manifest(self.index_path).get("segment_seq", 0)
+        self._segment_seq = max(self._segment_seq, base_seq)
+        replayed = 0
+        for seq in self._segments.committed():
+            self._segment_seq = max(self._segment_seq, seq)
+            if seq <= base_seq:
+                continue
+            ids, vectors, documents = self._segments.read(seq)
+            # After dropping unindexed entries, "in the docstore" means "indexed"
+            keep = [i for i, doc_id in enumerate(ids) if not isinstance(self._vector_store.docstore.search(doc_id), Document)]
+            if keep:
+                self._add_embedded([ids[i] for i in keep], vectors[keep], [documents[i] for i in keep])
+                replayed += len(keep)
+        return replayed
+
     def save_index(self):
+        """Persist changes since the last save.
+
+        Appends pending chunks as a new segment when a snapshot already
+        exists, otherwise (or after a rebuild) writes a full snapshot. Once
+        `compaction_segments` segments pile up they are merged in the
+        background.
+        """
+        if self._vector_store is None:
+            raise VectorStoreError("No index to save")
+        with self._write_lock:
+            snapshot = self._snapshot_needed or not self.index_file.exists()
+            if not snapshot:
+                if not self._pending:
+                    return
+                ids = [doc_id for batch in self._pending for doc_id in batch[0]]
+                vectors = np.concatenate([batch[1] for batch in self._pending])
+                documents = [doc for batch in self._pending for doc in batch[2]]
+                self._segment_seq += 1
+                self._segments.append(self._segment_seq, ids, vectors, documents)
+                self._pending.clear()
+                segment_count = len(self._segments.committed())
+        if snapshot:
+            # compact() takes the write lock itself, only to capture and to install
+            self.compact()
+            return
+        print(f"✅ Appended {len(ids)} chunks as segment {self._segment_seq} in {self.index_path}")
+        if self.compaction_segments and segment_count >= self.compaction_segments:
+            self.compact_in_background()
+
+    def compact(self):
+        """Write a full snapshot (base index + all segments) and drop merged segments.
+
+        The write lock is held only to capture the index, documents and
+        segment sequence, and again to install the finished snapshot; the
+        files are written in between while uploads and searches carry on.
+        """
         if self._vector_store is None:
             raise VectorStoreError("No index to save")
-        self.index_path.mkdir(parents=True, exist_ok=True)
-        self._vector_store.save_local(str(self.index_path))
+        with self._compaction_lock:
+            with self._write_lock:
+                store = self._vector_store
+                # Adds grow an in-memory index in place; a mapped one is replaced by a copy instead
+                index = store.index if self._index_mapped else faiss.clone_index(store.index)
+                if isinstance(store.docstore, SQLiteDocstore):
+                    docstore, mapping = store.docstore.copy(), store.index_to_docstore_id.copy()
+                else:
+                    docstore, mapping = dict(store.docstore._dict), dict(store.index_to_docstore_id)
+                bm25 = self._bm25
+                spec = self.active_spec
+                seq = self._segment_seq
+                # Pending chunks are in the captured index, so the snapshot covers them
+                covered = list(self._pending)
+                snapshot_needed, self._snapshot_needed = self._snapshot_needed, False
+
+            try:
+                self.index_path.mkdir(parents=True, exist_ok=True)
+                snapshot_dir = self.index_path / ".snapshot.tmp"
+                shutil.rmtree(snapshot_dir, ignore_errors=True)
+                if isinstance(docstore, SQLiteDocstore):
+                    # index.pkl needs the documents in memory; only for the duration of the snapshot
+                    docstore, mapping = dict(docstore.iter_documents()), dict(mapping.items())
+                snapshot = FAISS(
+                    embedding_function=self._lazy_embeddings,
+                    index=index,
+                    docstore=InMemoryDocstore(docstore),
+                    index_to_docstore_id=mapping,
+                )
+                snapshot.save_local(str(snapshot_dir))
+                write_sqlite_docstore(snapshot_dir / DOCSTORE_FILE, docstore.items(), mapping.items())
+                save_spec(snapshot_dir, spec)
+                if bm25 is not None and bm25.doc_count >= index.ntotal:
+                    bm25.save(snapshot_dir / BM25_FILE, mapping.get(index.ntotal - 1, ""), index.ntotal)
+
+                with self._write_lock:
+                    # A store still reading SQLite/mmapped files needs the generation it was loaded from
+                    keep = (self._loaded_generation,) if isinstance(self._vector_store.docstore, SQLiteDocstore) else ()
+                    install_snapshot(self.index_path, snapshot_dir, {"segment_seq": seq, "ntotal": index.ntotal}, keep)
+                    self._segments.remove_through(seq)
+                    # Chunks added while the files were written stay pending for the next save
+                    covered_ids = {id(batch) for batch in covered}
+                    self._pending = [batch for batch in self._pending if id(batch) not in covered_ids]
+            except Exception:
+                with self._write_lock:
+                    self._snapshot_needed = self._snapshot_needed or snapshot_needed
+                raise
         print(f"✅ Saved index to {self.index_path}")
 
+    def compact_in_background(self):
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"❌ Index compaction failed: {e}")
+        self._compaction_thread = threading.Thread(target=run, name="index-compaction", daemon=True)
+        self._compaction_thread.start()
+
     def add_documents(self, documents: List[Document]) -> int:
+        """Embed and add documents, skipping chunks that are already indexed."""
+        documents, skipped = self.split_duplicates(documents)
+        if skipped:
+            print(f"⏭️ Skipped {skipped} duplicate chunks")
         if not documents:
             return 0
-        if self._vector_store is None:
-            self._vector_store = FAISS.from_documents(documents, self.embeddings)
-        else:
-            self._vector_store.add_documents(documents)
+        vectors = self.embeddings.embed_documents([doc.page_content for doc in documents])
+        return self.add_embedded_documents(documents, vectors)
+
+    def add_embedded_documents(self, documents: List[Document], vectors) -> int:
+        """Add documents whose embeddings were computed by the caller (e.g. in batches).
+
+        Duplicates are checked again under the write lock, so concurrent
+        uploads of the same content add it only once.
+        """
+        if not documents:
+            return 0
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._write_lock:
+            keep = self._new_positions(documents)
+            if not keep:
+                return 0
+            documents = [documents[i] for i in keep]
+            vectors = vectors[keep]
+            ids = [doc.id or str(uuid.uuid4()) for doc in documents]
+            self._add_embedded(ids, vectors, documents)
+            self._pending.append((ids, vectors, documents))
+            self._chunk_hashes.update(doc.metadata["content_hash"] for doc in documents)
         print(f"✅ Added {len(documents)} documents to index")
         return len(documents)
 
+    def split_duplicates(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """Return the documents whose content is not indexed yet and how many were skipped.
+
+        Stamps each document's metadata with its `content_hash`.
+        """
+        with self._write_lock:
+            keep = self._new_positions(documents)
+        return [documents[i] for i in keep], len(documents) - len(keep)
+
+    def has_document(self, document_hash: str) -> bool:
+        """Whether a source file with this hash was fully ingested (see `record_documents`)."""
+        with self._write_lock:
+            return document_hash in self._completed_documents()
+
+    def record_documents(self, document_hashes: Iterable[str]):
+        """Mark source files as fully ingested; call once their chunks are indexed and saved.
+
+        Recorded separately from chunk metadata, so a file whose ingestion
+        failed partway is not mistaken for a duplicate when uploaded again.
+        """
+        with self._write_lock:
+            completed = self._completed_documents()
+            new = set(document_hashes) - completed
+            if new:
+                completed.update(new)
+                write_documents(self.index_path, completed)
+
+    def document_hashes(self) -> set:
+        """Hashes of every fully ingested source file."""
+        with self._write_lock:
+            return set(self._completed_documents())
+
+    def _completed_documents(self) -> set:
+        if self._document_hashes is None:
+            self._document_hashes = read_documents(self.index_path)
+        return self._document_hashes
+
+    def _new_positions(self, documents: List[Document]) -> List[int]:
+        self._ensure_hashes()
+        seen = set()
+        keep = []
+        for i, doc in enumerate(documents):
+            digest = doc.metadata.setdefault("content_hash", chunk_hash(doc.page_content))
+            if digest in self._chunk_hashes or digest in seen:
+                continue
+            seen.add(digest)
+            keep.append(i)
+        return keep
+
+    def _ensure_hashes(self):
+        if self._chunk_hashes is not None:
+            return
+        self._chunk_hashes = set()
+        for _, doc in self._iter_documents():
+            # Chunks indexed before hashing existed have no content_hash yet
+            self._chunk_hashes.add(doc.metadata.get("content_hash") or chunk_hash(doc.page_content))
+
+    def _iter_documents(self):
+        if self._vector_store is None:
+            return iter(())
+        docstore = self._vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            return docstore.iter_documents()
+        return iter(list(docstore._dict.items()))
+
+    def deduplicate(self) -> int:
+        """Remove chunks whose content repeats an earlier chunk; returns how many were removed.
+
+        Not every FAISS index type supports removing ids, so the index is
+        rebuilt from the kept vectors and the next save writes a snapshot.
+        """
+        if self._vector_store is None:
+            raise VectorStoreError("No index loaded")
+        with self._write_lock:
+            store = self._vector_store
+            documents = dict(self._iter_documents())
+            seen = set()
+            keep, kept_documents, mapping = [], {}, {}
+            for pos in range(store.index.ntotal):
+                doc = documents.get(store.index_to_docstore_id.get(pos))
+                if doc is None:
+                    continue
+                digest = doc.metadata.get("content_hash") or chunk_hash(doc.page_content)
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                doc.metadata["content_hash"] = digest
+                doc_id = store.index_to_docstore_id[pos]
+                mapping[len(keep)] = doc_id
+                kept_documents[doc_id] = doc
+                keep.append(pos)
+            removed = store.index.ntotal - len(keep)
+            if not removed:
+                return 0
+            if self.active_spec.index_type == "ivf_pq":
+                print("⚠️ Rebuilding from an IVF-PQ index uses its quantized vectors")
+            spec = effective_spec(self.active_spec, len(keep))
+            vectors = extract_vectors(store.index)[keep]
+            deduplicated = FAISS(
+                embedding_function=self._lazy_embeddings,
+                index=build_index(spec, vectors),
+                docstore=InMemoryDocstore(kept_documents),
+                index_to_docstore_id=mapping,
+            )
+            # Positions changed, so the lexical index is rebuilt from scratch before both are swapped in
+            bm25 = None
+            if self.hybrid_search:
+                bm25 = BM25Index()
+                bm25.add([kept_documents[mapping[pos]].page_content for pos in range(len(keep))])
+            with self._swap_lock:
+                self._vector_store, self._bm25 = deduplicated, bm25
+            self.active_spec = spec
+            self._index_mapped = False
+            self._snapshot_needed = True
+            self._chunk_hashes = None
+        print(f"✅ Removed {removed} duplicate chunks ({len(keep)} remain)")
+        return removed
+
+    def _add_embedded(self, ids: List[str], vectors: np.ndarray, documents: List[Document]):
+        text_embeddings = list(zip([doc.page_content for doc in documents], vectors.tolist()))
+        metadatas = [doc.metadata for doc in documents]
+        if self._vector_store is None:
+            store = FAISS.from_embeddings(text_embeddings, self._lazy_embeddings, metadatas=metadatas, ids=ids)
+            with self._swap_lock:
+                self._vector_store, self._bm25 = store, BM25Index() if self.hybrid_search else None
+            self.active_spec = IndexSpec()
+            if self.index_spec.index_type != "flat":
+                self.rebuild_index()
+        else:
+            if self._index_mapped:
+                # A mapped index is read-only; copy it into memory on the first write
+                self._replace_index(faiss.clone_index(self._vector_store.index))
+                self._index_mapped = False
+            self._vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        self._sync_bm25(documents)
+
+    def _replace_index(self, index):
+        """Publish a store with a new FAISS index over the same documents.
+
+        Searches read the store without the write lock, so the index is
+        never swapped on the live store object.
+        """
+        store = self._vector_store
+        replacement = FAISS(
+            embedding_function=store.embedding_function,
+            index=index,
+            docstore=store.docstore,
+            index_to_docstore_id=store.index_to_docstore_id,
+            normalize_L2=store._normalize_L2,
+            distance_strategy=store.distance_strategy,
+        )
+        with self._swap_lock:
+            self._vector_store = replacement
+
+    def _read_bm25(self, snapshot: Path) -> BM25Index:
+        """The lexical index saved with the snapshot, if it still matches the docstore."""
+        path = snapshot / BM25_FILE
+        if path.exists():
+            try:
+                bm25, last_id = BM25Index.load(path)
+                mapping = self._vector_store.index_to_docstore_id
+                if bm25.doc_count <= self.get_document_count() and mapping.get(bm25.doc_count - 1, "") == last_id:
+                    return bm25
+                print("⚠️ bm25.npz does not match the index, rebuilding it")
+            except Exception as e:
+                print(f"⚠️ Could not read {path}: {e}")
+        return BM25Index()
+
+    def _sync_bm25(self, documents: Optional[List[Document]] = None):
+        """Index the chunks past the end of the BM25 index.
+
+        `documents` are the chunks just appended to FAISS; otherwise (after
+        a load or a rebuild) the missing chunks are read from the docstore.
+        """
+        bm25 = self._bm25
+        if bm25 is None or self._vector_store is None:
+            return
+        total = self.get_document_count()
+        if bm25.doc_count >= total:
+            return
+        if documents is not None and bm25.doc_count + len(documents) == total:
+            bm25.add([doc.page_content for doc in documents])
+            return
+        start = time.perf_counter()
+        store = self._vector_store
+        missing = range(bm25.doc_count, total)
+        if len(missing) > 1000:
+            contents = {doc_id: doc.page_content for doc_id, doc in self._iter_documents()}
+            texts = [contents.get(store.index_to_docstore_id.get(pos), "") for pos in missing]
+        else:
+            docs = [store.docstore.search(store.index_to_docstore_id.get(pos)) for pos in missing]
+            texts = [doc.page_content if isinstance(doc, Document) else "" for doc in docs]
+        bm25.add(texts)
+        print(f"✅ BM25 index: added {len(texts)} chunks in {time.perf_counter() - start:.2f}s ({bm25.doc_count} total)")
+
+    def bm25_stats(self) -> Dict[str, Any]:
+        if self._bm25 is None:
+            return {"enabled": self.hybrid_search}
+        return {"enabled": True, **self._bm25.stats()}
+
+    def rebuild_index(self, spec: Optional[IndexSpec] = None) -> IndexSpec:
+        """Retrain the index as `spec` (default: the configured spec) from the stored vectors.
+
+        Vectors are reconstructed from the current index, so nothing is
+        re-embedded; the docstore and id mapping keep their order.
+        """
+        if self._vector_store is None:
+            raise VectorStoreError("No index loaded")
+        with self._write_lock:
+            spec = effective_spec(spec or self.index_spec, self.get_document_count())
+            if self.active_spec.index_type == "ivf_pq":
+                print("⚠️ Rebuilding from an IVF-PQ index uses its quantized vectors")
+            vectors = extract_vectors(self._vector_store.index)
+            self._replace_index(build_index(spec, vectors))
+            self._index_mapped = False
+            self.active_spec = spec
+            self._snapshot_needed = True
+        print(f"✅ Rebuilt index as {spec.index_type} ({len(vectors)} vectors)")
+        return spec
+
     def search(self, query: str, top_k: int = 5) -> List[Document]:
         if self._vector_store is None:
             raise VectorStoreError("No index loaded")
         if not query or not query.strip():
             return []
-        return self._vector_store.similarity_search(query, k=min(top_k, self.get_document_count()))
+        return self.search_by_vector(self.embed_query(query), top_k, query=query)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embeddings.embed_query(query)
+
+    def search_by_vector(self, vector: List[float], top_k: int = 5, query: Optional[str] = None,
+                         timings: Optional[Dict[str, float]] = None) -> List[Document]:
+        """Dense search, fused with BM25 results for `query` when hybrid search is on."""
+        return self.search_by_vectors([vector], top_k, [query] if query else None, timings)[0]
+
+    def search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Document]]:
+        """Batched `search`: one embedding pass and one FAISS search for all queries."""
+        if self._vector_store is None:
+            raise VectorStoreError("No index loaded")
+        results: List[List[Document]] = [[] for _ in queries]
+        positions = [i for i, query in enumerate(queries) if query and query.strip()]
+        if positions:
+            vectors = self.embed_queries([queries[i] for i in positions])
+            for i, docs in zip(positions, self.search_by_vectors(vectors, top_k, [queries[i] for i in positions])):
+                results[i] = docs
+        return results
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_queries(queries)
+
+    def search_by_vectors(self, vectors: List[List[float]], top_k: int = 5, queries: Optional[List[str]] = None,
+                          timings: Optional[Dict[str, float]] = None) -> List[List[Document]]:
+        """Search many query vectors with a single `index.search` over the stacked matrix.
+
+        With hybrid search and `queries`, each row's top `hybrid_candidates`
+        dense hits are fused with its BM25 hits by reciprocal rank fusion;
+        `timings` receives the BM25 time for the batch as `bm25_ms`.
+
+        Runs without the write lock. FAISS gets new vectors before the id
+        mapping is updated, so positions not mapped yet are skipped.
+        """
+        with self._swap_lock:
+            store, bm25 = self._vector_store, self._bm25
+        if store is None:
+            raise VectorStoreError("No index loaded")
+        # Read once: k must be sized against the index that is searched
+        index = store.index
+        count = index.ntotal
+        k = min(top_k, count)
+        if k <= 0 or len(vectors) == 0:
+            return [[] for _ in vectors]
+        if queries is None:
+            bm25 = None
+        depth = min(max(k, self.hybrid_candidates), count) if bm25 is not None else k
+        matrix = np.array(vectors, dtype=np.float32)
+        if store._normalize_L2:
+            faiss.normalize_L2(matrix)
+        _, positions = index.search(matrix, depth)
+        rows = [[int(pos) for pos in row if pos != -1] for row in positions]
+        if bm25 is not None:
+            start = time.perf_counter()
+            fused_rows = []
+            for dense, query in zip(rows, queries):
+                lexical = bm25.search(query, depth, self.bm25_budget_ms)[0] if query else []
+                fused_rows.append([pos for pos, _ in reciprocal_rank_fusion([dense, lexical], self.rrf_k)[:k]])
+            rows = fused_rows
+            if timings is not None:
+                timings["bm25_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        results = []
+        for row in rows:
+            docs = []
+            for pos in row[:k]:
+                doc_id = store.index_to_docstore_id.get(pos)
+                if doc_id is None:
+                    continue
+                doc = store.docstore.search(doc_id)
+                if isinstance(doc, Document):
+                    docs.append(doc)
+            results.append(docs)
+        return results
+
+    def get_all_documents(self) -> List[Document]:
+        """Every indexed chunk, in index order."""
+        if self._vector_store is None:
+            return []
+        documents = dict(self._iter_documents())
+        mapping = self._vector_store.index_to_docstore_id
+        return [documents[mapping[pos]] for pos in range(self.get_document_count()) if mapping.get(pos) in documents]
 
     def get_document_count(self) -> int:
         return self._vector_store.index.ntotal if self._vector_store else 0
 
-    def get_retriever(self, search_kwargs: dict = None):
+    def get_retriever(self, search_kwargs: dict = None) -> IndexRetriever:
         if self._vector_store is None:
             raise VectorStoreError("No index loaded")
-        return self._vector_store.as_retriever(search_kwargs=search_kwargs or {"k": 5})
+        return IndexRetriever(manager=self, k=(search_kwargs or {}).get("k", 5))
@@ -0,0 +1,17 @@
+# Runtime module
+from .workers import WorkerPool, PoolSaturatedError, configure_pools, get_pool, pool_stats, shutdown_pools
+from .registry import ModelRegistry, ModelRegistryError, configure_registry, get_registry, unload_idle_loop
+from .metrics import Histogram
+from .profiling import StartupProfile, startup_profile
+from .precision import (
+    MODEL_PRECISION_MODES, PRECISION_MODES, PrecisionError, apply_torch_threads, configure_precision,
+    get_precision, load_onnx_model, precision_stats, quantize_int8,
+)
+
+__all__ = [
+    'WorkerPool', 'PoolSaturatedError', 'configure_pools', 'get_pool', 'pool_stats', 'shutdown_pools',
+    'ModelRegistry', 'ModelRegistryError', 'configure_registry', 'get_registry', 'unload_idle_loop',
+    'Histogram', 'StartupProfile', 'startup_profile',
+    'MODEL_PRECISION_MODES', 'PRECISION_MODES', 'PrecisionError', 'apply_torch_threads', 'configure_precision',
+    'get_precision', 'load_onnx_model', 'precision_stats', 'quantize_int8',
+]
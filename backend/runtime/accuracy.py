@@ -0,0 +1,72 @@
+# Word/character error rates and the local sample set used to guard reduced-precision models
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+DEFAULT_SAMPLES = Path(__file__).parent.parent / "samples" / "accuracy.json"
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace (Whisper/TrOCR casing and
+    punctuation vary between precisions without changing what was read)."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    text = re.sub(r"[^a-z0-9' ]+", " ", text.lower())
+    return " ".join(text.split())
+
+def edit_distance(reference: Sequence, hypothesis: Sequence) -> int:
+    """Levenshtein distance (substitutions, insertions and deletions all cost 1)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref != hyp))
+        previous = current
+    return previous[-1]
+
+def word_error_rate(references: List[str], hypotheses: List[str]) -> float:
+    """Corpus WER: total word edits over total reference words."""
+    edits = words = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        ref, hyp = normalize_text(reference).split(), normalize_text(hypothesis).split()
+        edits += edit_distance(ref, hyp)
+        words += len(ref)
+    return edits / words if words else 0.0
+
+def char_error_rate(references: List[str], hypotheses: List[str]) -> float:
+    """Corpus CER: total character edits over total reference characters."""
+    edits = chars = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        ref, hyp = normalize_text(reference), normalize_text(hypothesis)
+        edits += edit_distance(ref, hyp)
+        chars += len(ref)
+    return edits / chars if chars else 0.0
+
+def load_samples(path: str = "") -> Dict[str, List[Dict[str, str]]]:
+    """Read a sample manifest: {"texts": [...], "audio": [{"file", "text"}], "images": [{"file", "text"}]}.
+
+    `texts` are rendered as images for OCR and spoken by SpeechT5 for STT,
+    so the bundled set needs no binary files; recorded audio and scanned
+    images listed under `audio`/`images` (paths relative to the manifest)
+    are used as well.
+    """
+    manifest = Path(path) if path else DEFAULT_SAMPLES
+    data = json.loads(manifest.read_text())
+    samples: Dict[str, List[Dict[str, str]]] = {"texts": list(data.get("texts", []))}
+    for kind in ("audio", "images"):
+        samples[kind] = [{"file": str(manifest.parent / item["file"]), "text": item["text"]} for item in data.get(kind, [])]
+    return samples
+
+def render_text_image(text: str, font_size: int = 32, padding: int = 16):
+    """Black-on-white PIL image of one line of text, for OCR checks."""
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        # Pillow < 10.1 only has the small bitmap font
+        font = ImageFont.load_default()
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)
+    image = Image.new("RGB", (right - left + 2 * padding, bottom - top + 2 * padding), "white")
+    ImageDraw.Draw(image).text((padding - left, padding - top), text, fill="black", font=font)
+    return image
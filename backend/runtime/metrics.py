@@ -0,0 +1,29 @@
+# Lightweight fixed-bucket histograms for /health
+import bisect
+import threading
+from typing import Dict, Sequence
+
+class Histogram:
+    """Per-bucket (non-cumulative) counts keyed by upper bound, with "+Inf" for the rest."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            labels = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            return {
+                "count": self._count,
+                "mean": round(self._sum / self._count, 3) if self._count else 0.0,
+                "buckets": dict(zip(labels, self._counts)),
+            }
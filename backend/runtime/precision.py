@@ -0,0 +1,102 @@
+# Inference precision modes and torch thread settings for the CPU speech/vision models
+import sys
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# fp32: stock PyTorch; int8: dynamic quantization of Linear layers; onnx: ONNX Runtime export via optimum
+PRECISION_MODES = ("fp32", "int8", "onnx")
+# SpeechT5's generate_speech loop has no ONNX Runtime counterpart in optimum
+MODEL_PRECISION_MODES = {
+    "whisper": PRECISION_MODES,
+    "trocr": PRECISION_MODES,
+    "speecht5": ("fp32", "int8"),
+}
+
+class PrecisionError(Exception):
+    pass
+
+@dataclass
+class PrecisionSettings:
+    modes: Dict[str, str] = field(default_factory=dict)
+    torch_threads: int = 0  # 0 keeps torch's default (one thread per physical core)
+    torch_interop_threads: int = 0
+    onnx_dir: str = "./models/onnx"
+
+_settings = PrecisionSettings()
+_threads_lock = threading.Lock()
+_interop_applied = False
+
+def configure_precision(modes: Optional[Dict[str, str]] = None, torch_threads: int = 0,
+                        torch_interop_threads: int = 0, onnx_dir: str = "./models/onnx"):
+    """Set the precision per model name; loaders read it the next time they run."""
+    global _settings
+    modes = dict(modes or {})
+    for model, mode in modes.items():
+        allowed = MODEL_PRECISION_MODES.get(model, PRECISION_MODES)
+        if mode not in allowed:
+            raise PrecisionError(f"{model} precision must be one of {', '.join(allowed)}, got {mode!r}")
+    _settings = PrecisionSettings(modes=modes, torch_threads=torch_threads,
+                                  torch_interop_threads=torch_interop_threads, onnx_dir=onnx_dir)
+
+def get_precision(model: str) -> str:
+    return _settings.modes.get(model, "fp32")
+
+def apply_torch_threads():
+    """Apply the configured thread counts; loaders call this after importing torch.
+
+    The intra-op count can change at any time. torch only accepts the
+    inter-op count before its first parallel region, so it is set once.
+    """
+    global _interop_applied
+    import torch
+
+    with _threads_lock:
+        if _settings.torch_threads:
+            torch.set_num_threads(_settings.torch_threads)
+        if _settings.torch_interop_threads and not _interop_applied:
+            _interop_applied = True
+            try:
+                torch.set_num_interop_threads(_settings.torch_interop_threads)
+            except RuntimeError as e:
+                print(f"⚠️ Could not set torch inter-op threads: {e}")
+
+def quantize_int8(module: Any) -> Any:
+    """Dynamic int8 quantization of every nn.Linear (weights int8, activations quantized per batch)."""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_onnx_model(model_class: Any, model_id: str) -> Any:
+    """Load an optimum ORTModel* for `model_id`, exporting it to `onnx_dir` on first use."""
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise PrecisionError("onnx precision needs `pip install optimum[onnxruntime]`")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if _settings.torch_threads:
+        options.intra_op_num_threads = _settings.torch_threads
+    export_dir = Path(_settings.onnx_dir) / model_id.replace("/", "__")
+    if any(export_dir.glob("*.onnx")):
+        return model_class.from_pretrained(export_dir, session_options=options, provider="CPUExecutionProvider")
+
+    print(f"📦 Exporting {model_id} to ONNX in {export_dir} (first load only)...")
+    model = model_class.from_pretrained(model_id, export=True, session_options=options, provider="CPUExecutionProvider")
+    model.save_pretrained(export_dir)
+    return model
+
+def precision_stats() -> Dict[str, Any]:
+    stats: Dict[str, Any] = {
+        "modes": {model: get_precision(model) for model in MODEL_PRECISION_MODES},
+        "torch_threads": _settings.torch_threads,
+        "torch_interop_threads": _settings.torch_interop_threads,
+    }
+    # Report the effective values only if torch is already loaded; never import it for a health check
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        stats["torch_threads"] = torch.get_num_threads()
+        stats["torch_interop_threads"] = torch.get_num_interop_threads()
+    return stats
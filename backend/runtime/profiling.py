@@ -0,0 +1,123 @@
+# Startup profile: per-package import time and per-stage lifespan time
+import importlib.abc
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta-path hook that times every module execution, like `python -X importtime`.
+
+    Time spent importing nested modules is subtracted, so each module only
+    reports its own cost and per-package sums add up to the total.
+    """
+
+    def __init__(self, profile: "StartupProfile"):
+        self.profile = profile
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+        self._local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        loader = spec.loader
+        # Class-level loaders (builtins, frozen) are shared by every module; leave them alone
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        if getattr(loader.exec_module, "_timed", False):
+            # Loader instance shared by several modules (e.g. zipimport); already patched
+            return spec
+        exec_module = loader.exec_module
+
+        def timed_exec(module):
+            stack = self._local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                self.profile._record_import(fullname, elapsed - nested)
+
+        timed_exec._timed = True
+        loader.exec_module = timed_exec
+        return spec
+
+class StartupProfile:
+    """Collects import and startup-stage timings relative to `start`."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ready_ms: Optional[float] = None
+        self._imports: Dict[str, float] = {}
+        self._stages: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[_ImportTimer] = None
+
+    def install_import_timer(self):
+        if self._timer is None:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def uninstall_import_timer(self):
+        if self._timer is not None and self._timer in sys.meta_path:
+            sys.meta_path.remove(self._timer)
+
+    def _record_import(self, module: str, seconds: float):
+        package = module.split(".")[0]
+        with self._lock:
+            self._imports[package] = self._imports.get(package, 0.0) + seconds
+
+    def _elapsed_ms(self, since: Optional[float] = None) -> float:
+        return round((time.perf_counter() - (since if since is not None else self.start)) * 1000, 1)
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        entry = {"name": name, "start_ms": self._elapsed_ms(), "duration_ms": None, "thread": threading.current_thread().name}
+        with self._lock:
+            self._stages.append(entry)
+        try:
+            yield
+        finally:
+            entry["duration_ms"] = self._elapsed_ms(started)
+
+    def mark_ready(self):
+        """Record the moment the app can accept requests (end of lifespan startup)."""
+        self.ready_ms = self._elapsed_ms()
+
+    def to_dict(self, top: int = 25) -> Dict[str, Any]:
+        with self._lock:
+            imports = sorted(self._imports.items(), key=lambda item: item[1], reverse=True)
+            stages = [dict(stage) for stage in self._stages]
+        return {
+            "ready_ms": self.ready_ms,
+            "imports_ms": {package: round(seconds * 1000, 1) for package, seconds in imports[:top]},
+            "stages": stages,
+            "loaded_modules": len(sys.modules),
+        }
+
+    def summary(self, top: int = 8) -> str:
+        profile = self.to_dict(top)
+        imports = ", ".join(f"{package} {ms:.0f}ms" for package, ms in profile["imports_ms"].items())
+        stages = ", ".join(f"{stage['name']} {stage['duration_ms'] or 0:.0f}ms" for stage in profile["stages"])
+        ready = f"{profile['ready_ms']:.0f}ms" if profile["ready_ms"] is not None else "n/a"
+        return f"⏱️ Ready in {ready} | imports: {imports or 'n/a'} | stages: {stages or 'n/a'}"
+
+# Global startup profile (the clock starts when this module is first imported)
+startup_profile = StartupProfile()
@@ -0,0 +1,190 @@
+# Process-wide registry of loaded models
+import asyncio
+import gc
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+class ModelRegistryError(Exception):
+    pass
+
+@dataclass
+class _ModelEntry:
+    name: str
+    loader: Callable[[], Any]
+    pinned: bool = False
+    instance: Any = None
+    load_time_s: float = 0.0
+    memory_bytes: int = 0
+    rss_delta_bytes: int = 0
+    load_count: int = 0
+    use_count: int = 0
+    last_used: float = 0.0
+
+def _rss_bytes() -> int:
+    """Current resident set size (Linux only, 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def _tensor_bytes(obj: Any, seen: Optional[set] = None, depth: int = 0) -> int:
+    """Sum parameter/buffer bytes of torch modules reachable from `obj`."""
+    seen = seen if seen is not None else set()
+    if obj is None or id(obj) in seen or depth > 3:
+        return 0
+    seen.add(id(obj))
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        try:
+            tensors = list(obj.parameters()) + list(obj.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    if isinstance(obj, dict):
+        return sum(_tensor_bytes(v, seen, depth + 1) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(_tensor_bytes(v, seen, depth + 1) for v in obj)
+    # Pipelines and wrappers keep the module on one of these attributes
+    return sum(_tensor_bytes(getattr(obj, attr, None), seen, depth + 1) for attr in ("model", "_model", "_client", "client"))
+
+class ModelRegistry:
+    """Loads each named model once and hands out the same instance.
+
+    Loaders are registered by the modules that own the models; `get` loads
+    on first use. Models that are not pinned can be unloaded after sitting
+    idle for `idle_timeout_s`, or least-recently-used first when the loaded
+    total exceeds `memory_budget_mb`.
+    """
+
+    def __init__(self, memory_budget_mb: int = 0, idle_timeout_s: int = 0):
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_timeout_s = idle_timeout_s
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], pinned: bool = False):
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _ModelEntry(name=name, loader=loader, pinned=pinned)
+                self._locks[name] = threading.Lock()
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._entries
+
+    def is_loaded(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry.instance is not None
+
+    def get(self, name: str) -> Any:
+        """Return the shared instance for `name`, loading it on first use."""
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelRegistryError(f"Model '{name}' is not registered")
+        # The instance is taken under the lock: another model's load may unload this one right after
+        with self._locks[name]:
+            instance = entry.instance
+            loaded = instance is None
+            if loaded:
+                self._load(entry)
+                instance = entry.instance
+            entry.use_count += 1
+            entry.last_used = time.time()
+        if loaded:
+            self._enforce_budget(keep=name)
+        return instance
+
+    def _load(self, entry: _ModelEntry):
+        print(f"🔄 Loading model '{entry.name}'...")
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        instance = entry.loader()
+        entry.load_time_s = round(time.perf_counter() - start, 3)
+        entry.rss_delta_bytes = max(0, _rss_bytes() - rss_before)
+        entry.memory_bytes = _tensor_bytes(instance) or entry.rss_delta_bytes
+        entry.load_count += 1
+        entry.instance = instance
+        print(f"✅ Model '{entry.name}' loaded in {entry.load_time_s:.1f}s ({entry.memory_bytes / 1024 / 1024:.0f} MB)")
+
+    def unload(self, name: str) -> bool:
+        entry = self._entries.get(name)
+        if entry is None or entry.instance is None:
+            return False
+        with self._locks[name]:
+            if entry.instance is None:
+                return False
+            entry.instance = None
+        gc.collect()
+        print(f"🗑️ Unloaded model '{name}'")
+        return True
+
+    def warmup(self, names: List[str]):
+        """Load the given models ahead of the first request."""
+        for name in names:
+            if not self.is_registered(name):
+                print(f"⚠️ Cannot warm up unknown model '{name}'")
+                continue
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"❌ Warm-up failed for '{name}': {e}")
+
+    def unload_idle(self) -> List[str]:
+        """Unload non-pinned models unused for longer than `idle_timeout_s`."""
+        if not self.idle_timeout_s:
+            return []
+        cutoff = time.time() - self.idle_timeout_s
+        idle = [e.name for e in list(self._entries.values()) if e.instance is not None and not e.pinned and e.last_used < cutoff]
+        return [name for name in idle if self.unload(name)]
+
+    def loaded_memory_bytes(self) -> int:
+        return sum(e.memory_bytes for e in self._entries.values() if e.instance is not None)
+
+    def _enforce_budget(self, keep: str):
+        if not self.memory_budget_mb:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        candidates = sorted(
+            (e for e in self._entries.values() if e.instance is not None and not e.pinned and e.name != keep),
+            key=lambda e: e.last_used,
+        )
+        for entry in candidates:
+            if self.loaded_memory_bytes() <= budget:
+                break
+            self.unload(entry.name)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            e.name: {
+                "loaded": e.instance is not None,
+                "pinned": e.pinned,
+                "load_time_s": e.load_time_s,
+                "memory_mb": round(e.memory_bytes / 1024 / 1024, 1),
+                "rss_delta_mb": round(e.rss_delta_bytes / 1024 / 1024, 1),
+                "load_count": e.load_count,
+                "use_count": e.use_count,
+                "idle_s": round(time.time() - e.last_used, 1) if e.last_used else None,
+            }
+            for e in list(self._entries.values())
+        }
+
+
+# Global registry instance
+_registry = ModelRegistry()
+
+def get_registry() -> ModelRegistry:
+    """Get the global model registry."""
+    return _registry
+
+def configure_registry(memory_budget_mb: int = 0, idle_timeout_s: int = 0):
+    _registry.memory_budget_mb = memory_budget_mb
+    _registry.idle_timeout_s = idle_timeout_s
+
+async def unload_idle_loop(interval_s: float = 60.0):
+    """Periodically unload idle models; run as a background task."""
+    while True:
+        await asyncio.sleep(interval_s)
+        _registry.unload_idle()
@@ -0,0 +1,122 @@
+# Bounded worker pools for blocking model work
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+class PoolSaturatedError(Exception):
+    pass
+
+class WorkerPool:
+    """Thread pool that runs blocking work off the event loop.
+
+    Concurrency is capped by the number of worker threads; `max_pending`
+    bounds how many calls may wait in the queue before new ones are rejected.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, max_pending: int = 0):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_ms_total = 0.0
+        self._run_ms_total = 0.0
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on a worker thread and await its result."""
+        with self._lock:
+            if self.max_pending and self._queued >= self.max_pending:
+                self._rejected += 1
+                raise PoolSaturatedError(f"Worker pool '{self.name}' is saturated ({self._queued} queued)")
+            self._queued += 1
+            self._peak_queued = max(self._peak_queued, self._queued)
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_ms_total += (started - submitted) * 1000
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_ms_total += (time.perf_counter() - started) * 1000
+                    if ok:
+                        self._completed += 1
+                    else:
+                        self._failed += 1
+
+        future = self._executor.submit(task)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A call cancelled while still queued never reaches `task`
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "running": self._running,
+                "queued": self._queued,
+                "peak_queued": self._peak_queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(self._wait_ms_total / finished, 2) if finished else 0.0,
+                "avg_run_ms": round(self._run_ms_total / finished, 2) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Global pools (created on first use)
+_pools: Dict[str, WorkerPool] = {}
+_pool_sizes: Dict[str, int] = {}
+_max_pending: int = 0
+_pools_lock = threading.Lock()
+
+def configure_pools(sizes: Dict[str, int], max_pending: int = 0):
+    """Set worker counts per pool name. Applies to pools not yet created."""
+    global _max_pending
+    _pool_sizes.update(sizes)
+    _max_pending = max_pending
+
+def get_pool(name: str) -> WorkerPool:
+    """Get the global worker pool with the given name."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = WorkerPool(name, _pool_sizes.get(name, 1), _max_pending)
+        return _pools[name]
+
+def pool_stats() -> Dict[str, Dict[str, float]]:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+def shutdown_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
@@ -1,6 +1,11 @@
 # Voice module
-from .stt import SpeechToText
-from .tts import TextToSpeech
+from .stt import SpeechToText, Transcription, get_stt
+from .tts import TextToSpeech, get_tts
 from .handler import VoiceRAGHandler, VoiceResponse
+from .audio import AudioDecodeError, AudioStore, decode_audio, encode_wav, get_audio_store
+from .vad import detect_speech
+from .streaming import AUDIO_FORMATS, SAMPLE_RATE, SentenceSplitter, wav_stream_header
 
-__all__ = ['SpeechToText', 'TextToSpeech', 'VoiceRAGHandler', 'VoiceResponse']
+__all__ = ['SpeechToText', 'Transcription', 'detect_speech', 'TextToSpeech', 'VoiceRAGHandler', 'VoiceResponse', 'get_stt', 'get_tts',
+           'AudioDecodeError', 'AudioStore', 'decode_audio', 'encode_wav', 'get_audio_store',
+           'AUDIO_FORMATS', 'SAMPLE_RATE', 'SentenceSplitter', 'wav_stream_header']
@@ -0,0 +1,133 @@
+# In-memory audio decoding/encoding and a bounded store for generated audio
+import hashlib
+import io
+import struct
+import threading
+import time
+from collections import OrderedDict
+from math import gcd
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from .streaming import SAMPLE_RATE, to_pcm16
+
+class AudioDecodeError(Exception):
+    pass
+
+def _to_mono_float(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype.kind in "iu":
+        info = np.iinfo(samples.dtype)
+        samples = (samples.astype(np.float32) - (info.max + info.min + 1) / 2) / ((info.max - info.min + 1) / 2)
+    samples = samples.astype(np.float32, copy=False)
+    return samples.mean(axis=1) if samples.ndim > 1 else samples
+
+def _resample(samples: np.ndarray, rate: int, target: int) -> np.ndarray:
+    if rate == target:
+        return samples
+    from scipy.signal import resample_poly
+    divisor = gcd(rate, target)
+    return resample_poly(samples, target // divisor, rate // divisor).astype(np.float32)
+
+def decode_audio(data: bytes, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an uploaded audio file straight from bytes to mono float32 at `sample_rate`.
+
+    Tries soundfile (WAV/FLAC/OGG/MP3 with recent libsndfile), then
+    scipy's WAV reader, then ffmpeg through the transformers helper
+    (webm/m4a from browsers); nothing touches the disk.
+    """
+    try:
+        import soundfile as sf
+        samples, rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=False)
+        return _resample(_to_mono_float(samples), rate, sample_rate)
+    except Exception:
+        pass
+    try:
+        from scipy.io import wavfile
+        rate, samples = wavfile.read(io.BytesIO(data))
+        return _resample(_to_mono_float(samples), rate, sample_rate)
+    except Exception:
+        pass
+    try:
+        from transformers.pipelines.audio_utils import ffmpeg_read
+        return ffmpeg_read(data, sample_rate).astype(np.float32)
+    except Exception as e:
+        raise AudioDecodeError(f"Could not decode audio: {e}")
+
+def encode_wav(speech: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Mono 16-bit PCM WAV file as bytes."""
+    pcm = to_pcm16(speech)
+    return (
+        b"RIFF" + struct.pack("<I", 36 + len(pcm)) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16)
+        + b"data" + struct.pack("<I", len(pcm)) + pcm
+    )
+
+class AudioStore:
+    """Generated audio held in memory under content-addressed ids.
+
+    Ids are hashes of the audio bytes, so they cannot be guessed or
+    collide between users. Entries expire after `ttl_s`; the least
+    recently stored are evicted beyond `max_entries` or `max_bytes`.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 64 * 1024 * 1024, ttl_s: float = 600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def put(self, data: bytes) -> str:
+        audio_id = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if audio_id in self._entries:
+                self._bytes -= len(self._entries.pop(audio_id)[0])
+            self._entries[audio_id] = (data, time.time())
+            self._bytes += len(data)
+            self._evict()
+        return audio_id
+
+    def get(self, audio_id: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(audio_id)
+            if entry is None:
+                return None
+            if self.ttl_s and time.time() - entry[1] > self.ttl_s:
+                self._bytes -= len(self._entries.pop(audio_id)[0])
+                self.expirations += 1
+                return None
+            return entry[0]
+
+    def _evict(self):
+        now = time.time()
+        while self._entries:
+            oldest_id, (data, created) = next(iter(self._entries.items()))
+            if self.ttl_s and now - created > self.ttl_s:
+                self.expirations += 1
+            elif len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self.evictions += 1
+            else:
+                break
+            self._bytes -= len(data)
+            del self._entries[oldest_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# Global AudioStore instance
+_audio_store: Optional[AudioStore] = None
+
+def get_audio_store(**settings) -> AudioStore:
+    """Get the global AudioStore; `settings` apply when it is first created."""
+    global _audio_store
+    if _audio_store is None:
+        _audio_store = AudioStore(**settings)
+    return _audio_store
@@ -1,13 +1,22 @@
 # Voice RAG Handler
+import asyncio
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import List, Optional
-from .stt import SpeechToText
-from .tts import TextToSpeech
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
+from .audio import get_audio_store
+from .stt import get_stt
+from .tts import get_tts
+from .streaming import SAMPLE_RATE, SentenceSplitter, to_pcm16
+from runtime import get_pool
+
+# Sentences per stream synthesizing (or queued in the TTS pool) at once; later ones wait here
+TTS_IN_FLIGHT = 2
 
 @dataclass
 class VoiceResponse:
     text_response: str
-    audio_path: Optional[str]
+    audio_id: Optional[str]
     sources: List[str]
     transcribed_question: str = ""
 
@@ -16,27 +25,123 @@ class VoiceRAGHandler:
 
     def __init__(self, rag_chain_instance):
         self.rag_chain = rag_chain_instance
-        self.stt = SpeechToText()
-        self.tts = TextToSpeech()
+        self.stt = get_stt()
+        self.tts = get_tts()
 
-    def process_voice_query(self, audio_path: str, session_id: str = "voice", generate_audio: bool = True) -> VoiceResponse:
+    def process_voice_query(self, audio: Union[str, bytes], session_id: Optional[str] = None, generate_audio: bool = True) -> VoiceResponse:
         print("🎤 Transcribing audio...")
-        transcribed_text = self.stt.transcribe(audio_path)
+        transcribed_text = self.stt.transcribe(audio)
         print(f"📝 Transcribed: {transcribed_text}")
 
         print("🤔 Processing query...")
         rag_response = self.rag_chain.query(transcribed_text, session_id)
 
-        audio_output = None
+        audio_id = None
         if generate_audio:
             print("🔊 Generating audio response...")
             # Limit text for TTS
             speak_text = rag_response.answer[:500] + '...' if len(rag_response.answer) > 500 else rag_response.answer
-            audio_output = self.tts.synthesize(speak_text, f"response_{session_id}.wav")
+            audio_id = get_audio_store().put(self.tts.synthesize_wav(speak_text))
+
+        return VoiceResponse(
+            text_response=rag_response.answer,
+            audio_id=audio_id,
+            sources=rag_response.sources,
+            transcribed_question=transcribed_text
+        )
+
+    async def aprocess_voice_query(self, audio: Union[str, bytes], session_id: Optional[str] = None, generate_audio: bool = True) -> VoiceResponse:
+        """Async variant of `process_voice_query` that keeps model work off the event loop."""
+        print("🎤 Transcribing audio...")
+        transcribed_text = await get_pool("stt").run(self.stt.transcribe, audio)
+        print(f"📝 Transcribed: {transcribed_text}")
+
+        print("🤔 Processing query...")
+        rag_response = await self.rag_chain.aquery(transcribed_text, session_id)
+
+        audio_id = None
+        if generate_audio:
+            print("🔊 Generating audio response...")
+            speak_text = rag_response.answer[:500] + '...' if len(rag_response.answer) > 500 else rag_response.answer
+            wav_bytes = await get_pool("tts").run(self.tts.synthesize_wav, speak_text)
+            audio_id = get_audio_store().put(wav_bytes)
 
         return VoiceResponse(
             text_response=rag_response.answer,
-            audio_path=audio_output,
+            audio_id=audio_id,
             sources=rag_response.sources,
             transcribed_question=transcribed_text
         )
+
+    async def astream_voice_query(self, audio: Union[str, bytes], session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a spoken answer as events: "transcription", "sources", "text" per LLM token,
+        "audio" (16-bit PCM) per sentence in order, then "done" with timings.
+
+        Sentences go to the TTS pool as the LLM completes them, at most
+        `TTS_IN_FLIGHT` at a time per stream, so synthesis overlaps
+        generation, the first audio waits for one sentence instead of the
+        whole answer, and one long answer cannot flood the pool. Full
+        answers are spoken. Closing the generator cancels the LLM stream and
+        drops sentences not yet started; a synthesis already running on a
+        worker thread cannot be interrupted and finishes in the background.
+        """
+        total_start = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        print("🎤 Transcribing audio...")
+        transcribed_text = await get_pool("stt").run(self.stt.transcribe, audio)
+        timings["stt_ms"] = round((time.perf_counter() - total_start) * 1000, 2)
+        print(f"📝 Transcribed: {transcribed_text}")
+        yield {"type": "transcription", "text": transcribed_text}
+
+        splitter = SentenceSplitter()
+        waiting: Deque[str] = deque()
+        pending: Deque[Tuple[str, asyncio.Future]] = deque()
+        sentences = 0
+        audio_seconds = 0.0
+
+        def schedule(texts: List[str]):
+            waiting.extend(texts)
+            while waiting and len(pending) < TTS_IN_FLIGHT:
+                text = waiting.popleft()
+                pending.append((text, asyncio.ensure_future(get_pool("tts").run(self.tts.synthesize_array, text))))
+
+        def audio_event(text: str, speech) -> Dict[str, Any]:
+            nonlocal sentences, audio_seconds
+            if not sentences:
+                timings["first_audio_ms"] = round((time.perf_counter() - total_start) * 1000, 2)
+            sentences += 1
+            audio_seconds += len(speech) / SAMPLE_RATE
+            return {"type": "audio", "index": sentences - 1, "sentence": text, "pcm": to_pcm16(speech)}
+
+        stream = self.rag_chain.astream(transcribed_text, session_id)
+        try:
+            async for event in stream:
+                if event["type"] == "token":
+                    yield {"type": "text", "content": event["content"]}
+                    schedule(splitter.feed(event["content"]))
+                elif event["type"] == "sources":
+                    yield event
+                elif event["type"] == "done":
+                    timings["rag"] = event["timings"]
+                # Hand over finished sentences without waiting for the rest of the answer
+                while pending and pending[0][1].done():
+                    text, task = pending.popleft()
+                    schedule([])
+                    yield audio_event(text, task.result())
+            schedule(splitter.flush())
+            while pending:
+                text, task = pending[0]
+                speech = await task
+                pending.popleft()
+                schedule([])
+                yield audio_event(text, speech)
+        finally:
+            await stream.aclose()
+            waiting.clear()
+            # Removes queued calls from the pool; a call already on a worker thread runs to completion
+            for _, task in pending:
+                task.cancel()
+
+        timings["total_ms"] = round((time.perf_counter() - total_start) * 1000, 2)
+        yield {"type": "done", "sentences": sentences, "audio_seconds": round(audio_seconds, 2), "timings": timings}
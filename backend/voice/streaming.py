@@ -0,0 +1,85 @@
+# Sentence chunking of streamed LLM text and PCM/WAV framing for streamed speech
+import re
+import struct
+from typing import List
+import numpy as np
+
+SAMPLE_RATE = 16000
+AUDIO_FORMATS = ("wav", "pcm", "ndjson")
+
+# A sentence ends at . ! ? or a newline followed by whitespace; "3.14" and "e.g." mid-token do not split
+_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*")
+_ABBREVIATIONS = ("e.g.", "i.e.", "etc.", "vs.", "fig.", "eq.", "approx.", "mr.", "dr.")
+_MARKDOWN = re.compile(r"```.*?```|`|\*\*?|__|^#+\s*|^\s*[-*]\s+|\[(.*?)\]\(.*?\)", re.S | re.M)
+
+def speakable(text: str) -> str:
+    """Strip markdown markup that SpeechT5 would read out or choke on."""
+    text = _MARKDOWN.sub(lambda m: m.group(1) or "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+class SentenceSplitter:
+    """Accumulates streamed tokens and emits complete sentences.
+
+    Sentences shorter than `min_chars` are held back and joined with the
+    next one (fewer, more natural TTS calls); longer than `max_chars`
+    they are cut at a comma or space, since SpeechT5 degrades on long input.
+    """
+
+    def __init__(self, min_chars: int = 40, max_chars: int = 300):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, text: str) -> bool:
+        return text.rstrip().lower().endswith(_ABBREVIATIONS)
+
+    def _cut(self, sentence: str) -> List[str]:
+        parts = []
+        while len(sentence) > self.max_chars:
+            cut = max(sentence.rfind(", ", 0, self.max_chars), sentence.rfind("; ", 0, self.max_chars))
+            if cut < self.min_chars:
+                cut = sentence.rfind(" ", 0, self.max_chars)
+            if cut <= 0:
+                cut = self.max_chars
+            parts.append(sentence[:cut + 1].strip())
+            sentence = sentence[cut + 1:]
+        # The remainder may still be growing, so keep its trailing whitespace
+        return parts + [sentence]
+
+    def feed(self, token: str) -> List[str]:
+        self._buffer += token
+        sentences = []
+        start = 0
+        pending = ""
+        for match in _BOUNDARY.finditer(self._buffer):
+            candidate = pending + self._buffer[start:match.end()]
+            start = match.end()
+            if self._is_abbreviation(candidate) or len(candidate.strip()) < self.min_chars:
+                pending = candidate
+                continue
+            sentences.extend(self._cut(candidate))
+            pending = ""
+        self._buffer = pending + self._buffer[start:]
+        if len(self._buffer) > self.max_chars:
+            # No boundary in sight; speak what we have rather than stall
+            *full, self._buffer = self._cut(self._buffer)
+            sentences.extend(full)
+        return [s for s in (speakable(s) for s in sentences) if s]
+
+    def flush(self) -> List[str]:
+        rest, self._buffer = self._buffer, ""
+        return [s for s in (speakable(s) for s in self._cut(rest)) if s]
+
+def to_pcm16(speech: np.ndarray) -> bytes:
+    """Float waveform in [-1, 1] to little-endian 16-bit PCM."""
+    return (np.clip(np.asarray(speech, dtype=np.float32), -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def wav_stream_header(sample_rate: int = SAMPLE_RATE, channels: int = 1) -> bytes:
+    """WAV header for a stream of unknown length (sizes set to the maximum, which players accept)."""
+    unknown = 0xFFFFFFFF
+    byte_rate = sample_rate * channels * 2
+    return (
+        b"RIFF" + struct.pack("<I", unknown) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+        + b"data" + struct.pack("<I", unknown)
+    )
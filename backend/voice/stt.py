@@ -1,25 +1,169 @@
 # Speech-to-Text using HuggingFace Whisper
-import torch
-from transformers import pipeline
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from runtime import apply_torch_threads, get_precision, get_registry, load_onnx_model, quantize_int8
+from .audio import decode_audio
+from .streaming import SAMPLE_RATE
+from .vad import SpeechRegion, detect_speech
+
+WHISPER_MODEL = "openai/whisper-small"
+# Whisper's receptive window; anything longer goes through VAD segmentation
+WHISPER_WINDOW_S = 30.0
+
+def _load_whisper():
+    # torch/transformers are imported on first load, not when the app starts
+    import torch
+    from transformers import pipeline
+
+    apply_torch_threads()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # Reduced precision is a CPU path; a GPU keeps the fp32 model
+    precision = get_precision("whisper") if device == "cpu" else "fp32"
+    if precision == "onnx":
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        from transformers import AutoProcessor
+
+        processor = AutoProcessor.from_pretrained(WHISPER_MODEL)
+        return pipeline(
+            "automatic-speech-recognition",
+            model=load_onnx_model(ORTModelForSpeechSeq2Seq, WHISPER_MODEL),
+            tokenizer=processor.tokenizer,
+            feature_extractor=processor.feature_extractor,
+        )
+
+    pipe = pipeline("automatic-speech-recognition", model=WHISPER_MODEL, device=device)
+    if precision == "int8":
+        pipe.model = quantize_int8(pipe.model)
+    return pipe
+
+get_registry().register("whisper", _load_whisper)
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    end: float
+    text: str
+    batch: int
+    # The batch's Whisper time, apportioned by segment duration
+    asr_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        duration = self.end - self.start
+        return {
+            "start": round(self.start, 2),
+            "end": round(self.end, 2),
+            "text": self.text,
+            "batch": self.batch,
+            "asr_ms": round(self.asr_ms, 2),
+            "rtf": round(self.asr_ms / 1000 / duration, 3) if duration else 0.0,
+        }
+
+@dataclass
+class Transcription:
+    text: str
+    segments: List[TranscriptSegment] = field(default_factory=list)
+    audio_seconds: float = 0.0
+    speech_seconds: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def rtf(self) -> float:
+        """Real-time factor: processing time over audio duration (below 1 is faster than real time)."""
+        return round(self.timings.get("total_ms", 0.0) / 1000 / self.audio_seconds, 3) if self.audio_seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "text": self.text,
+            "segments": [segment.to_dict() for segment in self.segments],
+            "audio_seconds": round(self.audio_seconds, 2),
+            "speech_seconds": round(self.speech_seconds, 2),
+            "rtf": self.rtf,
+            "timings": self.timings,
+        }
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
 
 class SpeechToText:
-    """Speech-to-text using HuggingFace Whisper."""
+    """Speech-to-text using HuggingFace Whisper (shared through the model registry).
+
+    Clips up to Whisper's 30 s window are transcribed in one pass. Longer
+    recordings are split at silences by an energy VAD, silent stretches
+    are dropped, and the speech segments go through Whisper in batches.
+    """
 
-    def __init__(self):
-        self._pipe = None
+    def __init__(self, batch_size: int = 8, max_segment_s: float = 28.0):
+        self.batch_size = max(1, batch_size)
+        self.max_segment_s = min(max_segment_s, WHISPER_WINDOW_S)
 
     @property
     def pipe(self):
-        if self._pipe is None:
-            print("🔄 Loading Whisper model...")
-            self._pipe = pipeline(
-                "automatic-speech-recognition",
-                model="openai/whisper-small",
-                device="cuda" if torch.cuda.is_available() else "cpu"
-            )
-            print("✅ Whisper model loaded")
-        return self._pipe
-
-    def transcribe(self, audio_path: str) -> str:
-        result = self.pipe(audio_path)
-        return result["text"]
+        return get_registry().get("whisper")
+
+    def transcribe(self, audio: Union[str, bytes, np.ndarray]) -> str:
+        """Transcribe a file path, encoded audio bytes (decoded in memory) or a 16 kHz waveform."""
+        return self.transcribe_long(audio).text
+
+    def transcribe_long(self, audio: Union[str, bytes, np.ndarray]) -> Transcription:
+        """Transcribe audio of any length, with per-segment timestamps and timings."""
+        total_start = time.perf_counter()
+        timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        if isinstance(audio, str):
+            audio = Path(audio).read_bytes()
+        if isinstance(audio, (bytes, bytearray)):
+            audio = decode_audio(bytes(audio))
+        samples = np.asarray(audio, dtype=np.float32)
+        timings["decode_ms"] = _elapsed_ms(start)
+        result = Transcription(text="", audio_seconds=len(samples) / SAMPLE_RATE)
+
+        start = time.perf_counter()
+        if result.audio_seconds <= WHISPER_WINDOW_S:
+            regions = [SpeechRegion(0, len(samples))] if len(samples) else []
+        else:
+            regions = detect_speech(samples, SAMPLE_RATE, max_segment_s=self.max_segment_s)
+        timings["vad_ms"] = _elapsed_ms(start)
+        result.speech_seconds = sum(region.seconds() for region in regions)
+
+        start = time.perf_counter()
+        pipe = self.pipe if regions else None
+        timings["model_ms"] = _elapsed_ms(start)
+
+        start = time.perf_counter()
+        for batch_index, first in enumerate(range(0, len(regions), self.batch_size)):
+            batch = regions[first:first + self.batch_size]
+            batch_start = time.perf_counter()
+            # The pipeline consumes its input dicts, so build fresh ones per call
+            inputs = [{"raw": samples[region.start:region.end], "sampling_rate": SAMPLE_RATE} for region in batch]
+            outputs = pipe(inputs, batch_size=len(inputs))
+            batch_ms = _elapsed_ms(batch_start)
+            batch_seconds = sum(region.seconds() for region in batch) or 1.0
+            for region, output in zip(batch, outputs):
+                result.segments.append(TranscriptSegment(
+                    start=region.start / SAMPLE_RATE,
+                    end=region.end / SAMPLE_RATE,
+                    text=output["text"].strip(),
+                    batch=batch_index,
+                    asr_ms=batch_ms * region.seconds() / batch_seconds,
+                ))
+        timings["asr_ms"] = _elapsed_ms(start)
+
+        result.text = " ".join(segment.text for segment in result.segments if segment.text)
+        timings["total_ms"] = _elapsed_ms(total_start)
+        result.timings = timings
+        return result
+
+
+# Global SpeechToText instance
+_stt_instance: Optional[SpeechToText] = None
+
+def get_stt(**settings) -> SpeechToText:
+    """Get the global SpeechToText instance; `settings` apply when it is first created."""
+    global _stt_instance
+    if _stt_instance is None:
+        _stt_instance = SpeechToText(**settings)
+    return _stt_instance
@@ -1,46 +1,78 @@
 # Text-to-Speech using HuggingFace SpeechT5
-import torch
-import scipy.io.wavfile as wav
-from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+from typing import Optional
+from runtime import apply_torch_threads, get_precision, get_registry, quantize_int8
+from .audio import encode_wav
+from .streaming import SAMPLE_RATE
+
+def _load_speecht5():
+    # torch and transformers are imported on first load, not when the app starts
+    import torch
+    from transformers import SpeechT5Processor, SpeechT5ForTextToSpeech, SpeechT5HifiGan
+
+    apply_torch_threads()
+    model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
+    if get_precision("speecht5") == "int8":
+        # The HiFi-GAN vocoder is convolutional, so only the transformer is quantized
+        model = quantize_int8(model)
+    return {
+        "processor": SpeechT5Processor.from_pretrained("microsoft/speecht5_tts"),
+        "model": model,
+        "vocoder": SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan"),
+        # Use a fixed random speaker embedding (works without external dataset)
+        "speaker_embedding": torch.randn(1, 512, generator=torch.Generator().manual_seed(42)),
+    }
+
+get_registry().register("speecht5", _load_speecht5)
 
 class TextToSpeech:
-    """Text-to-speech using HuggingFace SpeechT5 with random speaker embedding."""
-
-    def __init__(self):
-        self._processor = None
-        self._model = None
-        self._vocoder = None
-        self._speaker_embedding = None
-
-    def _load_models(self):
-        if self._model is None:
-            print("🔄 Loading TTS model...")
-            self._processor = SpeechT5Processor.from_pretrained("microsoft/speecht5_tts")
-            self._model = SpeechT5ForTextToSpeech.from_pretrained("microsoft/speecht5_tts")
-            self._vocoder = SpeechT5HifiGan.from_pretrained("microsoft/speecht5_hifigan")
-            # Use a fixed random speaker embedding (works without external dataset)
-            torch.manual_seed(42)
-            self._speaker_embedding = torch.randn(1, 512)
-            print("✅ TTS model loaded")
+    """Text-to-speech using HuggingFace SpeechT5 with random speaker embedding.
+
+    The processor, model, vocoder and speaker embedding are shared through
+    the model registry; they are looked up per call so the registry is free
+    to unload them. Creating an instance imports nothing, so it is safe on
+    the event loop.
+    """
+
+    def _load_models(self) -> dict:
+        return get_registry().get("speecht5")
 
     @property
     def pipe(self):
-        self._load_models()
-        return self._model
+        return self._load_models()["model"]
 
-    def synthesize(self, text: str, output_path: str = "output.wav") -> str:
-        self._load_models()
+    def synthesize_array(self, text: str):
+        """Waveform (float32 numpy array at SAMPLE_RATE) for one short text, e.g. a sentence."""
+        import torch
 
-        # Truncate text if too long (SpeechT5 has limits)
-        if len(text) > 400:
-            text = text[:400] + '...'
+        models = self._load_models()
 
         # Process text
-        inputs = self._processor(text=text, return_tensors="pt")
+        inputs = models["processor"](text=text, return_tensors="pt")
 
         # Generate speech
-        speech = self._model.generate_speech(inputs["input_ids"], self._speaker_embedding, vocoder=self._vocoder)
+        with torch.no_grad():
+            speech = models["model"].generate_speech(inputs["input_ids"], models["speaker_embedding"], vocoder=models["vocoder"])
+        return speech.numpy()
 
-        # Save to file
-        wav.write(output_path, rate=16000, data=speech.numpy())
+    def synthesize_wav(self, text: str) -> bytes:
+        """WAV file bytes for `text`, built in memory."""
+        # Truncate text if too long (SpeechT5 has limits); the streaming mode speaks full answers sentence by sentence
+        if len(text) > 400:
+            text = text[:400] + '...'
+        return encode_wav(self.synthesize_array(text), SAMPLE_RATE)
+
+    def synthesize(self, text: str, output_path: str = "output.wav") -> str:
+        with open(output_path, "wb") as f:
+            f.write(self.synthesize_wav(text))
         return output_path
+
+
+# Global TextToSpeech instance
+_tts_instance: Optional[TextToSpeech] = None
+
+def get_tts() -> TextToSpeech:
+    """Get the global TextToSpeech instance."""
+    global _tts_instance
+    if _tts_instance is None:
+        _tts_instance = TextToSpeech()
+    return _tts_instance
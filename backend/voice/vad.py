@@ -0,0 +1,75 @@
+# Energy-based voice activity detection for splitting long recordings
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+from .streaming import SAMPLE_RATE
+
+@dataclass
+class SpeechRegion:
+    start: int  # sample offsets into the original audio
+    end: int
+
+    def seconds(self, sample_rate: int = SAMPLE_RATE) -> float:
+        return (self.end - self.start) / sample_rate
+
+def frame_energy_db(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level in dBFS of consecutive `frame`-sample windows."""
+    count = len(samples) // frame
+    if count == 0:
+        return np.empty(0, dtype=np.float32)
+    frames = samples[:count * frame].reshape(count, frame).astype(np.float32)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+def detect_speech(samples: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30, min_silence_ms: int = 300,
+                  min_speech_ms: int = 250, pad_ms: int = 200, max_segment_s: float = 28.0) -> List[SpeechRegion]:
+    """Speech regions of a mono waveform, each at most `max_segment_s` long.
+
+    A frame is speech when its energy is 10 dB above the noise floor (10th
+    percentile of frame energies) and within 45 dB of the loudest frame.
+    Pauses shorter than `min_silence_ms` are bridged, blips shorter than
+    `min_speech_ms` dropped. Neighbouring regions are merged while they
+    fit in one segment, and longer ones are cut at their quietest frame,
+    so Whisper sees few, full-length windows without long silences.
+    """
+    frame = max(1, sample_rate * frame_ms // 1000)
+    energy = frame_energy_db(samples, frame)
+    if not len(energy):
+        return []
+    threshold = max(np.percentile(energy, 10) + 10, energy.max() - 45, -60)
+    active = energy > threshold
+
+    # Runs of speech frames as [start, end) frame indices
+    padded = np.concatenate(([False], active, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    runs = [[int(a), int(b)] for a, b in zip(edges[::2], edges[1::2])]
+    bridged: List[List[int]] = []
+    for run in runs:
+        if bridged and (run[0] - bridged[-1][1]) * frame_ms < min_silence_ms:
+            bridged[-1][1] = run[1]
+        else:
+            bridged.append(run)
+    runs = [run for run in bridged if (run[1] - run[0]) * frame_ms >= min_speech_ms]
+
+    pad = pad_ms // frame_ms
+    max_frames = int(max_segment_s * 1000 // frame_ms)
+    # Split overlong runs at the quietest frame in the second half of each window
+    pieces: List[List[int]] = []
+    for start, end in runs:
+        start, end = max(0, start - pad), min(len(energy), end + pad)
+        while end - start > max_frames:
+            window = energy[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            pieces.append([start, cut])
+            start = cut
+        pieces.append([start, end])
+
+    # Merge neighbours while the combined span still fits in one segment
+    merged: List[List[int]] = []
+    for start, end in pieces:
+        if merged and end - merged[-1][0] <= max_frames and (start - merged[-1][1]) * frame_ms < 1000:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            # Padding may overlap the previous segment; never transcribe audio twice
+            merged.append([max(start, merged[-1][1]) if merged else start, end])
+    return [SpeechRegion(start=start * frame, end=min(len(samples), end * frame)) for start, end in merged]